@@ -1,13 +1,14 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from uuid import UUID
 import os
 import logging
 
 from app.config import settings
-from services.database import DatabaseService
-from services.compression import CompressionService
+from models.job import Job
+from models.video import Video
+from services.async_database import AsyncDatabaseService
 
 logger = logging.getLogger(__name__)
 
@@ -18,12 +19,17 @@ class CompressionRequest(BaseModel):
     video_id: str
     filename: str
     video_url_base: str = "https://example.com/videos"
+    segmented: Optional[bool] = None
+    force: bool = False
+    priority: Optional[int] = None
 
 
 class CompressionResponse(BaseModel):
     success: bool
     message: str
     video_id: Optional[str] = None
+    job_id: Optional[str] = None
+    job_status: Optional[str] = None
     error: Optional[str] = None
 
 
@@ -45,20 +51,74 @@ class VideoQualityResponse(BaseModel):
     updated_at: str
 
 
+class VideoManifestResponse(BaseModel):
+    format: str
+    url: str
+    qualities: List[str]
+    segment_duration: Optional[float]
+    updated_at: str
+
+
 class VideoQualitiesResponse(BaseModel):
     success: bool
     qualities: List[VideoQualityResponse]
+    manifests: List[VideoManifestResponse] = []
+
+
+def _job_priority(requested: Optional[int], default_priority: int) -> int:
+    """
+    Priority for a new job: the endpoint's level, or a client-requested one clamped
+    between JOB_PRIORITY_BATCH and that level, so a client can lower its jobs but
+    never jump the queue ahead of the fair-share order.
+    """
+    if requested is None:
+        return default_priority
+    return max(min(requested, default_priority), min(settings.JOB_PRIORITY_BATCH, default_priority))
+
+
+async def _submit_compression(video_id: UUID, video: Video, request: CompressionRequest,
+                              default_priority: int) -> Tuple[Optional[Job], bool, str]:
+    """
+    Enqueue a compression job, coalescing repeated requests for the same video.
+    
+    Returns:
+        (job, created, message): the job now responsible for the video, or
+        None if it could not be enqueued, whether that job was created by
+        this request, and a message saying so
+    """
+    if not request.force and video.status == 'published':
+        # A retry after the video finished is a no-op; force re-encodes it
+        latest = await AsyncDatabaseService.get_latest_job(video_id)
+        if latest and latest.status == 'completed' and latest.filename == request.filename:
+            return latest, False, "Video already processed"
+    
+    # Workers (python -m services.worker) pick the job up from the queue
+    job, created = await AsyncDatabaseService.enqueue_job(
+        video_id=video_id,
+        filename=request.filename,
+        video_url_base=request.video_url_base,
+        segmented=request.segmented,
+        user_id=video.user_id,
+        priority=_job_priority(request.priority, default_priority),
+        force=request.force
+    )
+    if not job:
+        return None, False, "Failed to enqueue compression job"
+    if not created:
+        return job, False, "Compression already in progress"
+    
+    if not (request.force and video.status == 'published'):
+        # A forced re-encode keeps serving the published renditions until the new ones land
+        await AsyncDatabaseService.update_video_status(video_id, 'processing')
+    return job, True, "Compression job queued"
 
 
 @router.post("/compress", response_model=CompressionResponse)
-async def compress_video(
-    request: CompressionRequest,
-    background_tasks: BackgroundTasks
-):
+async def compress_video(request: CompressionRequest):
     try:
         video_id = UUID(request.video_id)
         
-        video = DatabaseService.get_video_by_id(video_id)
+        video = await AsyncDatabaseService.get_video_by_id(video_id)
         if not video:
             raise HTTPException(status_code=404, detail="Video not found")
         
@@ -69,20 +129,22 @@ async def compress_video(
                 detail=f"Video file not found in pending directory: {request.filename}"
             )
         
-        background_tasks.add_task(
-            CompressionService.process_pending_video,
-            video_id=video_id,
-            filename=request.filename,
-            video_url_base=request.video_url_base
+        # Single uploads are interactive and jump ahead of bulk batches
+        job, _, message = await _submit_compression(
+            video_id, video, request, settings.JOB_PRIORITY_INTERACTIVE
         )
-        
-        DatabaseService.update_video_status(video_id, 'processing')
+        if not job:
+            raise HTTPException(status_code=500, detail=message)
         
         return CompressionResponse(
             success=True,
-            message="Compression job started",
-            video_id=str(video_id)
+            message=message,
+            video_id=str(video_id),
+            job_id=str(job.id),
+            job_status=job.status
         )
+    except HTTPException:
+        raise
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid video_id format")
     except Exception as e:
@@ -95,7 +157,7 @@ async def get_video_qualities(video_id: str):
     try:
         video_uuid = UUID(video_id)
         
-        qualities = DatabaseService.get_video_qualities(video_uuid)
+        qualities = await AsyncDatabaseService.get_video_qualities(video_uuid)
         
         quality_responses = [
             VideoQualityResponse(
@@ -118,9 +180,22 @@ async def get_video_qualities(video_id: str):
             for q in qualities
         ]
         
+        manifests = await AsyncDatabaseService.get_video_manifests(video_uuid)
+        manifest_responses = [
+            VideoManifestResponse(
+                format=m.format,
+                url=m.url,
+                qualities=m.qualities,
+                segment_duration=m.segment_duration,
+                updated_at=m.updated_at.isoformat()
+            )
+            for m in manifests
+        ]
+        
         return VideoQualitiesResponse(
             success=True,
-            qualities=quality_responses
+            qualities=quality_responses,
+            manifests=manifest_responses
         )
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid video_id format")
@@ -134,21 +209,24 @@ async def get_video_status(video_id: str):
     try:
         video_uuid = UUID(video_id)
         
-        video = DatabaseService.get_video_by_id(video_uuid)
+        video = await AsyncDatabaseService.get_video_by_id(video_uuid)
         if not video:
             raise HTTPException(status_code=404, detail="Video not found")
         
-        qualities = DatabaseService.get_video_qualities(video_uuid)
+        qualities = await AsyncDatabaseService.get_video_qualities(video_uuid)
         
         quality_statuses = {
             q.quality: q.status for q in qualities
         }
         
+        progress = await AsyncDatabaseService.get_video_qualities_progress(video_uuid)
+        
         return {
             "success": True,
             "video_id": str(video_id),
             "video_status": video.status,
-            "qualities": quality_statuses
+            "qualities": quality_statuses,
+            "progress": progress
         }
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid video_id format")
@@ -159,27 +237,25 @@ async def get_video_status(video_id: str):
 
 class BatchCompressionRequest(BaseModel):
     videos: List[CompressionRequest]
-    max_workers: int = 4
 
 
 class BatchCompressionResponse(BaseModel):
     success: bool
     total: int
-    success_count: int
-    failed_count: int
+    queued_count: int
+    existing_count: int
+    skipped_count: int
     results: List[dict]
 
 
 @router.post("/compress/batch", response_model=BatchCompressionResponse)
-async def compress_videos_batch(
-    request: BatchCompressionRequest,
-    background_tasks: BackgroundTasks
-):
+async def compress_videos_batch(request: BatchCompressionRequest):
     try:
-        video_tasks = []
+        queued = []
+        queued_count = 0
         for video_req in request.videos:
             video_id = UUID(video_req.video_id)
-            video = DatabaseService.get_video_by_id(video_id)
+            video = await AsyncDatabaseService.get_video_by_id(video_id)
             if not video:
                 continue
             
@@ -187,30 +263,35 @@ async def compress_videos_batch(
             if not os.path.exists(input_path):
                 continue
             
-            video_tasks.append({
-                'video_id': video_id,
+            job, created, message = await _submit_compression(
+                video_id, video, video_req, settings.JOB_PRIORITY_BATCH
+            )
+            if not job:
+                continue
+            if created:
+                queued_count += 1
+            
+            queued.append({
+                'video_id': str(video_id),
                 'filename': video_req.filename,
-                'video_url_base': video_req.video_url_base
+                'job_id': str(job.id),
+                'job_status': job.status,
+                'message': message
             })
-            
-            DatabaseService.update_video_status(video_id, 'processing')
         
-        if not video_tasks:
+        if not queued:
             raise HTTPException(status_code=400, detail="No valid videos to process")
         
-        background_tasks.add_task(
-            CompressionService.process_batch,
-            video_tasks=video_tasks,
-            max_workers=request.max_workers
-        )
-        
         return BatchCompressionResponse(
             success=True,
-            total=len(video_tasks),
-            success_count=0,
-            failed_count=0,
-            results=[]
+            total=len(queued),
+            queued_count=queued_count,
+            existing_count=len(queued) - queued_count,
+            skipped_count=len(request.videos) - len(queued),
+            results=queued
         )
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid video_id format: {e}")
     except Exception as e:
@@ -221,8 +302,7 @@ async def compress_videos_batch(
 @router.get("/health")
 async def health_check():
     try:
-        conn = DatabaseService.get_connection()
-        DatabaseService.put_connection(conn)
+        await AsyncDatabaseService.ping()
         return {
             "status": "healthy",
             "database": "connected",
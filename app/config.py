@@ -10,6 +10,10 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = os.getenv("POSTGRES_PASSWORD", "")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "lambrk")
     
+    # Connection pool size for the async (API) database layer
+    ASYNC_DB_POOL_MIN: int = int(os.getenv("ASYNC_DB_POOL_MIN", "1"))
+    ASYNC_DB_POOL_MAX: int = int(os.getenv("ASYNC_DB_POOL_MAX", "20"))
+    
     PENDING_DIR: str = os.getenv("PENDING_DIR", "/Volumes/Expansion/Lambrk/pending")
     COMPLETED_DIR: str = os.getenv("COMPLETED_DIR", "/Volumes/Expansion/Lambrk/completed")
     
@@ -25,6 +29,84 @@ class Settings(BaseSettings):
     AWS_S3_BUCKET: str = os.getenv("AWS_S3_BUCKET", "lam-brk")
     AWS_S3_BASE_URL: str = os.getenv("AWS_S3_BASE_URL", "https://lam-brk.s3.ap-south-1.amazonaws.com")
     AWS_S3_VIDEOS_PREFIX: str = os.getenv("AWS_S3_VIDEOS_PREFIX", "videos")
+    # Custom endpoint for S3-compatible storage (e.g. MinIO for local testing)
+    AWS_S3_ENDPOINT_URL: str = os.getenv("AWS_S3_ENDPOINT_URL", "")
+    
+    # S3 transfer tuning (multipart part size / threshold in MB, threads per file)
+    S3_MULTIPART_THRESHOLD_MB: int = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "64"))
+    S3_MULTIPART_CHUNKSIZE_MB: int = int(os.getenv("S3_MULTIPART_CHUNKSIZE_MB", "64"))
+    S3_MAX_CONCURRENCY: int = int(os.getenv("S3_MAX_CONCURRENCY", "8"))
+    S3_MAX_POOL_CONNECTIONS: int = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "50"))
+    UPLOAD_WORKERS: int = int(os.getenv("UPLOAD_WORKERS", "4"))
+    UPLOAD_QUEUE_SIZE: int = int(os.getenv("UPLOAD_QUEUE_SIZE", "8"))
+    
+    # Encoding Configuration
+    STREAM_COPY_ENABLED: bool = os.getenv("STREAM_COPY_ENABLED", "true").lower() == "true"
+    LADDER_ENCODING: bool = os.getenv("LADDER_ENCODING", "true").lower() == "true"
+    SEGMENT_ENCODING: bool = os.getenv("SEGMENT_ENCODING", "false").lower() == "true"
+    SEGMENT_MIN_DURATION: int = int(os.getenv("SEGMENT_MIN_DURATION", "600"))
+    SEGMENT_DURATION: int = int(os.getenv("SEGMENT_DURATION", "30"))
+    SEGMENT_WORKERS: int = int(os.getenv("SEGMENT_WORKERS", "0"))
+    ENCODE_CPU_BUDGET: int = int(os.getenv("ENCODE_CPU_BUDGET", "0"))
+    MAX_CONCURRENT_ENCODES: int = int(os.getenv("MAX_CONCURRENT_ENCODES", "0"))
+    MAX_BATCH_WORKERS: int = int(os.getenv("MAX_BATCH_WORKERS", "8"))
+    PROGRESS_UPDATE_INTERVAL: float = float(os.getenv("PROGRESS_UPDATE_INTERVAL", "5"))
+    FFMPEG_STDERR_LINES: int = int(os.getenv("FFMPEG_STDERR_LINES", "200"))
+    # Encode audio once per bitrate (or copy a suitable AAC source) and mux it into every rendition
+    SHARED_AUDIO_ENABLED: bool = os.getenv("SHARED_AUDIO_ENABLED", "true").lower() == "true"
+    # Pipe fragmented MP4 from ffmpeg straight into S3 multipart uploads
+    STREAM_TO_S3: bool = os.getenv("STREAM_TO_S3", "false").lower() == "true"
+    KEEP_LOCAL_COPY: bool = os.getenv("KEEP_LOCAL_COPY", "false").lower() == "true"
+    # Move the original out of PENDING_DIR when it can't be hardlinked or reflinked
+    MOVE_ORIGINAL: bool = os.getenv("MOVE_ORIGINAL", "false").lower() == "true"
+    # Encode one quick rendition first, publish it, then fill in the rest of the ladder
+    PROGRESSIVE_PUBLISH: bool = os.getenv("PROGRESSIVE_PUBLISH", "false").lower() == "true"
+    PROGRESSIVE_FIRST_QUALITY: str = os.getenv("PROGRESSIVE_FIRST_QUALITY", "360p")
+    PROGRESSIVE_FIRST_PRESET: str = os.getenv("PROGRESSIVE_FIRST_PRESET", "veryfast")
+    # Adaptive streaming: fMP4 HLS and/or DASH with keyframe-aligned segments across renditions
+    ADAPTIVE_STREAMING: bool = os.getenv("ADAPTIVE_STREAMING", "false").lower() == "true"
+    ADAPTIVE_STREAMING_FORMATS: str = os.getenv("ADAPTIVE_STREAMING_FORMATS", "hls,dash")
+    ADAPTIVE_SEGMENT_DURATION: int = int(os.getenv("ADAPTIVE_SEGMENT_DURATION", "4"))
+    
+    # Job queue / worker configuration
+    WORKER_CONCURRENCY: int = int(os.getenv("WORKER_CONCURRENCY", "2"))
+    WORKER_POLL_INTERVAL: float = float(os.getenv("WORKER_POLL_INTERVAL", "2"))
+    JOB_LEASE_TIMEOUT: int = int(os.getenv("JOB_LEASE_TIMEOUT", "300"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_DELAY: int = int(os.getenv("JOB_RETRY_DELAY", "60"))
+    # Fair share: higher priority is claimed first; within a priority, the owner with
+    # the fewest running jobs per unit of weight goes next. 0 = no per-user cap on running jobs
+    JOB_PRIORITY_INTERACTIVE: int = int(os.getenv("JOB_PRIORITY_INTERACTIVE", "10"))
+    JOB_PRIORITY_BATCH: int = int(os.getenv("JOB_PRIORITY_BATCH", "0"))
+    JOB_MAX_RUNNING_PER_USER: int = int(os.getenv("JOB_MAX_RUNNING_PER_USER", "0"))
+    # Comma-separated user_id:weight pairs; unlisted owners weigh 1
+    JOB_USER_WEIGHTS: str = os.getenv("JOB_USER_WEIGHTS", "")
+    # Port for the worker's own Prometheus endpoint (0 disables it)
+    WORKER_METRICS_PORT: int = int(os.getenv("WORKER_METRICS_PORT", "0"))
+    
+    # Rendition ladder: JSON file of quality -> {height, bitrate, maxrate, bufsize}
+    # (height is the short side) and/or a comma-separated subset of qualities to encode
+    QUALITY_LADDER_FILE: str = os.getenv("QUALITY_LADDER_FILE", "")
+    QUALITY_LADDER: str = os.getenv("QUALITY_LADDER", "")
+    # Never encode above the source's video bitrate, and skip rungs that would not be
+    # at least this fraction smaller than the rung above
+    CAP_TO_SOURCE_BITRATE: bool = os.getenv("CAP_TO_SOURCE_BITRATE", "true").lower() == "true"
+    RENDITION_MIN_SAVINGS: float = float(os.getenv("RENDITION_MIN_SAVINGS", "0.25"))
+    # Per-title complexity: short CRF probe encodes scale every rendition's bitrate by
+    # (probe bits per pixel / COMPLEXITY_REFERENCE_BPP), clamped to the min/max factor
+    COMPLEXITY_ANALYSIS_ENABLED: bool = os.getenv("COMPLEXITY_ANALYSIS_ENABLED", "false").lower() == "true"
+    COMPLEXITY_SAMPLES: int = int(os.getenv("COMPLEXITY_SAMPLES", "3"))
+    COMPLEXITY_SAMPLE_DURATION: float = float(os.getenv("COMPLEXITY_SAMPLE_DURATION", "4"))
+    COMPLEXITY_REFERENCE_BPP: float = float(os.getenv("COMPLEXITY_REFERENCE_BPP", "0.1"))
+    COMPLEXITY_MIN_FACTOR: float = float(os.getenv("COMPLEXITY_MIN_FACTOR", "0.5"))
+    COMPLEXITY_MAX_FACTOR: float = float(os.getenv("COMPLEXITY_MAX_FACTOR", "1.25"))
+    
+    # Reuse renditions of byte-identical earlier uploads (SHA-256 of the source)
+    SOURCE_DEDUP_ENABLED: bool = os.getenv("SOURCE_DEDUP_ENABLED", "true").lower() == "true"
+    
+    # ffprobe metadata cache
+    PROBE_CACHE_SIZE: int = int(os.getenv("PROBE_CACHE_SIZE", "1024"))
+    PROBE_CACHE_DIR: str = os.getenv("PROBE_CACHE_DIR", "")
     
     @property
     def database_url(self) -> str:
@@ -1,9 +1,10 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 import sys
 
 from app.config import settings
+from app.metrics import render_latest
 from api.routes import router
 
 logging.basicConfig(
@@ -47,8 +48,8 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down Lambrk Compression Service")
-    from services.database import DatabaseService
-    DatabaseService.close_all()
+    from services.async_database import AsyncDatabaseService
+    await AsyncDatabaseService.close_all()
 
 
 @app.get("/")
@@ -60,6 +61,13 @@ async def root():
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics; aggregates worker processes when PROMETHEUS_MULTIPROC_DIR is set."""
+    content, content_type = render_latest()
+    return Response(content=content, headers={"Content-Type": content_type})
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,156 @@
+"""
+Prometheus metrics for the compression pipeline.
+
+The API and the workers run as separate processes. Point PROMETHEUS_MULTIPROC_DIR
+at a shared, empty directory before starting both and the API's /metrics
+endpoint aggregates every process on the host; otherwise each process only
+reports its own metrics (workers can expose theirs on WORKER_METRICS_PORT).
+"""
+
+import functools
+import os
+from typing import Callable, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Encodes and uploads of multi-GB files run for minutes, far beyond the default buckets
+LONG_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+SPEED_BUCKETS = (0.1, 0.25, 0.5, 1, 1.5, 2, 3, 5, 8, 12, 20, 50)
+
+PROBE_SECONDS = Histogram(
+    'lambrk_probe_seconds',
+    'ffprobe latency for cache misses'
+)
+
+ENCODE_SECONDS = Histogram(
+    'lambrk_encode_seconds',
+    'Wall time to produce one rendition (ladder renditions share one ffmpeg run)',
+    ['quality', 'mode'],
+    buckets=LONG_BUCKETS
+)
+
+ENCODE_SPEED = Histogram(
+    'lambrk_encode_speed_ratio',
+    'Encode speed as a multiple of realtime (source duration / encode time)',
+    ['quality', 'mode'],
+    buckets=SPEED_BUCKETS
+)
+
+TIME_TO_FIRST_PLAYABLE = Histogram(
+    'lambrk_time_to_first_playable_seconds',
+    'Time from the start of processing until the video is published with a ready default',
+    buckets=LONG_BUCKETS
+)
+
+COMPLEXITY_ANALYSIS_SECONDS = Histogram(
+    'lambrk_complexity_analysis_seconds',
+    'Wall time of the per-title complexity probe encodes',
+    buckets=LONG_BUCKETS
+)
+
+COMPLEXITY_FACTOR = Histogram(
+    'lambrk_complexity_factor',
+    'Bitrate scale factor chosen by complexity analysis',
+    buckets=(0.25, 0.5, 0.6, 0.7, 0.8, 0.9, 1, 1.1, 1.25, 1.5, 2)
+)
+
+PACKAGING_SECONDS = Histogram(
+    'lambrk_packaging_seconds',
+    'Wall time of packaging renditions into HLS/DASH segments',
+    buckets=LONG_BUCKETS
+)
+
+FFMPEG_PROCESSES = Gauge(
+    'lambrk_ffmpeg_processes',
+    'ffmpeg processes currently running',
+    multiprocess_mode='livesum'
+)
+
+S3_UPLOAD_SECONDS = Histogram(
+    'lambrk_s3_upload_seconds',
+    'S3 transfer latency per object',
+    ['quality', 'method'],
+    buckets=LONG_BUCKETS
+)
+
+UPLOAD_QUEUE_DEPTH = Gauge(
+    'lambrk_upload_queue_depth',
+    'Files queued or uploading in the upload pipeline',
+    multiprocess_mode='livesum'
+)
+
+DB_WRITE_SECONDS = Histogram(
+    'lambrk_db_write_seconds',
+    'Latency of DatabaseService write operations, including pool checkout',
+    ['operation']
+)
+
+DB_POOL_IN_USE = Gauge(
+    'lambrk_db_pool_connections_in_use',
+    'Connections currently checked out of the DatabaseService pool',
+    multiprocess_mode='livesum'
+)
+
+DB_POOL_SIZE = Gauge(
+    'lambrk_db_pool_connections_max',
+    'Maximum size of the DatabaseService pool; in_use / max is saturation',
+    multiprocess_mode='livesum'
+)
+
+DB_POOL_EXHAUSTED = Counter(
+    'lambrk_db_pool_exhausted_total',
+    'Checkouts that failed because every pooled connection was in use'
+)
+
+BYTES_IN = Counter(
+    'lambrk_bytes_in_total',
+    'Source bytes read to produce each quality',
+    ['quality']
+)
+
+BYTES_OUT = Counter(
+    'lambrk_bytes_out_total',
+    'Output bytes produced per quality',
+    ['quality']
+)
+
+
+def observe_encode(quality: str, mode: str, seconds: float, source_duration=None) -> None:
+    """Record one rendition's encode time and, when the source duration is known, its speed."""
+    ENCODE_SECONDS.labels(quality=quality, mode=mode).observe(seconds)
+    if source_duration and seconds > 0:
+        ENCODE_SPEED.labels(quality=quality, mode=mode).observe(source_duration / seconds)
+
+
+def timed_db_write(func: Callable) -> Callable:
+    """Decorator recording a DatabaseService write under its method name."""
+    timer = DB_WRITE_SECONDS.labels(operation=func.__name__)
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with timer.time():
+            return func(*args, **kwargs)
+    
+    return wrapper
+
+
+def get_registry() -> CollectorRegistry:
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """Serialize current metrics in the Prometheus text format."""
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
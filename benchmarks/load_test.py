@@ -0,0 +1,515 @@
+"""
+End-to-end load generator for the compression API.
+
+Seeds `videos` rows and synthetic pending files, optionally starts the API
+and compression workers, then drives a weighted mix of /compress,
+/compress/batch, /status and /qualities requests from concurrent clients.
+Reports p50/p95/p99 latency per endpoint and job completion throughput
+over time.
+
+Requires a reachable Postgres (POSTGRES_* settings) with migrations applied.
+Point AWS_S3_ENDPOINT_URL (or --s3-endpoint) at a local S3 stand-in such as
+MinIO so workers don't upload to AWS.
+
+Usage:
+    python -m benchmarks.load_test [--videos 50] [--duration 60] [--concurrency 32]
+                                   [--mix compress=1,batch=1,status=10,qualities=10]
+                                   [--start-server] [--workers 2]
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from uuid import UUID, uuid4
+
+from psycopg2.extras import execute_values
+
+from app.config import settings
+from benchmarks.sources import SOURCE_RESOLUTIONS, generate_source
+from services.database import DatabaseService
+from utils.file_utils import link_or_copy
+
+logger = logging.getLogger(__name__)
+
+ENDPOINTS = ('compress', 'batch', 'status', 'qualities')
+API_PREFIX = '/api/compression'
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def seed_videos(count: int, source_path: str, pending_dir: str,
+                user_id: UUID) -> List[Tuple[UUID, str]]:
+    """
+    Insert `count` draft videos and place a pending file for each.
+    
+    Pending files are hardlinked to one generated source where possible, so
+    seeding many videos costs almost no disk. They are byte-identical, so the
+    workers must run with SOURCE_DEDUP_ENABLED=false for every job to encode.
+    
+    Returns:
+        List of (video_id, pending filename)
+    """
+    video_ids = [uuid4() for _ in range(count)]
+    videos = [(video_id, f"loadtest_{video_id}.mp4") for video_id in video_ids]
+    
+    os.makedirs(pending_dir, exist_ok=True)
+    for _, filename in videos:
+        link_or_copy(source_path, os.path.join(pending_dir, filename))
+    
+    conn = DatabaseService.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            execute_values(
+                cursor,
+                """
+                INSERT INTO videos (id, title, url, user_id, status)
+                VALUES %s
+                """,
+                [
+                    (str(video_id), 'loadtest', filename, str(user_id), 'draft')
+                    for video_id, filename in videos
+                ]
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        DatabaseService.put_connection(conn)
+    
+    return videos
+
+
+def cleanup_videos(videos: List[Tuple[UUID, str]], pending_dir: str) -> None:
+    # jobs has no foreign key to videos, so its rows are deleted explicitly; video_qualities,
+    # source_fingerprints, video_complexity and video_manifests go with the videos (ON DELETE CASCADE)
+    video_ids = [str(video_id) for video_id, _ in videos]
+    conn = DatabaseService.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM jobs WHERE video_id = ANY(%s::uuid[])", (video_ids,))
+            cursor.execute("DELETE FROM videos WHERE id = ANY(%s::uuid[])", (video_ids,))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error deleting load test videos: {e}")
+    finally:
+        DatabaseService.put_connection(conn)
+    
+    for _, filename in videos:
+        try:
+            os.remove(os.path.join(pending_dir, filename))
+        except OSError:
+            pass
+
+
+def count_jobs(video_ids: List[UUID]) -> Dict[str, int]:
+    conn = DatabaseService.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT status, COUNT(*)
+                FROM jobs
+                WHERE video_id = ANY(%s::uuid[])
+                GROUP BY status
+                """,
+                ([str(video_id) for video_id in video_ids],)
+            )
+            counts = dict(cursor.fetchall())
+        conn.commit()
+        return counts
+    finally:
+        DatabaseService.put_connection(conn)
+
+
+class LoadRun:
+    """Shared state of one load test: videos left to submit and recorded latencies."""
+    
+    def __init__(self, base_url: str, videos: List[Tuple[UUID, str]],
+                 mix: Dict[str, float], batch_size: int, video_url_base: str):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.videos = videos
+        self.mix = mix
+        self.batch_size = batch_size
+        self.video_url_base = video_url_base
+        self._unsubmitted = deque(videos)
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.first_submit: Optional[float] = None
+    
+    def _take_unsubmitted(self, count: int) -> List[Tuple[UUID, str]]:
+        with self._lock:
+            taken = [self._unsubmitted.popleft() for _ in range(min(count, len(self._unsubmitted)))]
+            if taken and self.first_submit is None:
+                self.first_submit = time.monotonic()
+            return taken
+    
+    def _weights(self) -> Dict[str, float]:
+        # Once every video has been submitted only read traffic remains
+        with self._lock:
+            exhausted = not self._unsubmitted
+        return {
+            endpoint: weight for endpoint, weight in self.mix.items()
+            if weight > 0 and not (exhausted and endpoint in ('compress', 'batch'))
+        }
+    
+    def _compress_body(self, video_id: UUID, filename: str) -> Dict:
+        return {
+            'video_id': str(video_id),
+            'filename': filename,
+            'video_url_base': self.video_url_base
+        }
+    
+    def build_request(self, rng: random.Random) -> Optional[Tuple[str, str, str, Optional[Dict]]]:
+        """Pick an endpoint by weight; returns (endpoint, method, path, body) or None when idle."""
+        weights = self._weights()
+        if not weights:
+            return None
+        endpoint = rng.choices(list(weights), weights=list(weights.values()))[0]
+        
+        if endpoint == 'compress':
+            taken = self._take_unsubmitted(1)
+            if not taken:
+                return None
+            return endpoint, 'POST', f'{API_PREFIX}/compress', self._compress_body(*taken[0])
+        if endpoint == 'batch':
+            taken = self._take_unsubmitted(self.batch_size)
+            if not taken:
+                return None
+            return endpoint, 'POST', f'{API_PREFIX}/compress/batch', {
+                'videos': [self._compress_body(*video) for video in taken]
+            }
+        
+        video_id, _ = rng.choice(self.videos)
+        if endpoint == 'status':
+            return endpoint, 'GET', f'{API_PREFIX}/video/{video_id}/status', None
+        return endpoint, 'GET', f'{API_PREFIX}/video/{video_id}/qualities', None
+    
+    def record(self, endpoint: str, seconds: float, status: Optional[int]) -> None:
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if status is None or status >= 400:
+                self.errors[endpoint] += 1
+            self.statuses[endpoint][status or 0] += 1
+    
+    def client(self, seed: int, deadline: float, stop: threading.Event) -> None:
+        rng = random.Random(seed)
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            while time.monotonic() < deadline and not stop.is_set():
+                request = self.build_request(rng)
+                if not request:
+                    stop.wait(0.05)
+                    continue
+                endpoint, method, path, body = request
+                
+                start = time.perf_counter()
+                try:
+                    conn.request(
+                        method, path,
+                        body=json.dumps(body) if body is not None else None,
+                        headers={'Content-Type': 'application/json'}
+                    )
+                    response = conn.getresponse()
+                    response.read()
+                    status = response.status
+                except (OSError, http.client.HTTPException):
+                    status = None
+                    conn.close()
+                    conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+                self.record(endpoint, time.perf_counter() - start, status)
+        finally:
+            conn.close()
+    
+    def summary(self, elapsed: float) -> Dict[str, Dict]:
+        summary = {}
+        for endpoint in ENDPOINTS:
+            samples = self.latencies.get(endpoint, [])
+            if not samples:
+                continue
+            summary[endpoint] = {
+                'requests': len(samples),
+                'errors': self.errors.get(endpoint, 0),
+                'statuses': {str(code): n for code, n in self.statuses[endpoint].items()},
+                'p50_ms': round(percentile(samples, 50) * 1000, 1),
+                'p95_ms': round(percentile(samples, 95) * 1000, 1),
+                'p99_ms': round(percentile(samples, 99) * 1000, 1),
+                'max_ms': round(max(samples) * 1000, 1),
+                'requests_per_second': round(len(samples) / elapsed, 2) if elapsed > 0 else None
+            }
+        return summary
+
+
+def sample_jobs(video_ids: List[UUID], start: float, interval: float,
+                stop: threading.Event, timeline: List[Dict]) -> None:
+    while True:
+        try:
+            counts = count_jobs(video_ids)
+            timeline.append({
+                'elapsed_seconds': round(time.monotonic() - start, 1),
+                'queued': counts.get('queued', 0),
+                'running': counts.get('running', 0),
+                'completed': counts.get('completed', 0),
+                'failed': counts.get('failed', 0)
+            })
+        except Exception as e:
+            logger.error(f"Error sampling job counts: {e}")
+        if stop.wait(interval):
+            return
+
+
+def wait_for_api(base_url: str, timeout: float) -> bool:
+    parsed = urlparse(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=5)
+        try:
+            conn.request('GET', f'{API_PREFIX}/health')
+            if conn.getresponse().status == 200:
+                return True
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            conn.close()
+        time.sleep(0.5)
+    return False
+
+
+def start_processes(args: argparse.Namespace, pending_dir: str) -> List[subprocess.Popen]:
+    # Seeded sources are identical; with dedup on, only the first job would encode
+    env = dict(os.environ, PENDING_DIR=pending_dir, SOURCE_DEDUP_ENABLED='false')
+    if args.s3_endpoint:
+        env['AWS_S3_ENDPOINT_URL'] = args.s3_endpoint
+    
+    processes = []
+    if args.start_server:
+        parsed = urlparse(args.base_url)
+        processes.append(subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'app.main:app',
+             '--host', parsed.hostname, '--port', str(parsed.port or 80),
+             '--workers', str(args.server_workers), '--log-level', 'warning'],
+            env=env
+        ))
+    for _ in range(args.workers):
+        processes.append(subprocess.Popen([sys.executable, '-m', 'services.worker'], env=env))
+    return processes
+
+
+def stop_processes(processes: List[subprocess.Popen]) -> None:
+    # Workers finish their in-flight job on SIGTERM; don't wait forever for it
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def _print_report(summary: Dict[str, Dict], timeline: List[Dict], throughput: Optional[float]) -> None:
+    print(f"\n{'Endpoint':<12}{'Requests':>10}{'Errors':>8}{'p50 ms':>10}"
+          f"{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'req/s':>9}")
+    for endpoint, stats in summary.items():
+        print(f"{endpoint:<12}{stats['requests']:>10}{stats['errors']:>8}{stats['p50_ms']:>10}"
+              f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['max_ms']:>10}"
+              f"{stats['requests_per_second']:>9}")
+    
+    if timeline:
+        print("\nJob progress:")
+        previous = None
+        for sample in timeline:
+            rate = ''
+            if previous:
+                span = sample['elapsed_seconds'] - previous['elapsed_seconds']
+                if span > 0:
+                    rate = f" ({(sample['completed'] - previous['completed']) / span:.2f} jobs/s)"
+            print(f"  +{sample['elapsed_seconds']:>6}s  queued={sample['queued']} "
+                  f"running={sample['running']} completed={sample['completed']} "
+                  f"failed={sample['failed']}{rate}")
+            previous = sample
+    
+    if throughput is not None:
+        print(f"\nJob throughput: {throughput * 60:.2f} jobs/min")
+
+
+def _mix(value: str) -> Dict[str, float]:
+    mix = {endpoint: 0.0 for endpoint in ENDPOINTS}
+    for item in value.split(','):
+        endpoint, sep, weight = item.partition('=')
+        endpoint = endpoint.strip()
+        if not sep or endpoint not in mix:
+            raise argparse.ArgumentTypeError(f"Expected endpoint=weight with endpoint in {ENDPOINTS}")
+        mix[endpoint] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lambrk compression API load generator")
+    parser.add_argument('--base-url', default=f"http://127.0.0.1:{settings.API_PORT}",
+                        help="API base URL")
+    parser.add_argument('--start-server', action='store_true',
+                        help="Start uvicorn for the duration of the test")
+    parser.add_argument('--server-workers', type=int, default=1,
+                        help="uvicorn worker processes when --start-server is set")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Compression worker processes to start (0 = use already running workers)")
+    parser.add_argument('--s3-endpoint', default=None,
+                        help="S3-compatible endpoint passed to started processes (e.g. http://127.0.0.1:9000)")
+    parser.add_argument('--pending-dir', default=settings.PENDING_DIR,
+                        help="Directory seeded with synthetic pending files")
+    parser.add_argument('--work-dir', default='.benchmarks',
+                        help="Directory for the generated source video")
+    parser.add_argument('--source-resolution', default='360p', choices=list(SOURCE_RESOLUTIONS),
+                        help="Resolution of the seeded source video")
+    parser.add_argument('--source-duration', type=int, default=10,
+                        help="Length of the seeded source video in seconds")
+    parser.add_argument('--videos', type=int, default=50,
+                        help="Number of videos to seed")
+    parser.add_argument('--user-id', type=UUID, default=None,
+                        help="Owner of the seeded videos (needed if videos.user_id references users)")
+    parser.add_argument('--duration', type=float, default=60,
+                        help="Seconds of request traffic")
+    parser.add_argument('--concurrency', type=int, default=32,
+                        help="Concurrent HTTP clients")
+    parser.add_argument('--mix', type=_mix, default=_mix('compress=1,batch=1,status=10,qualities=10'),
+                        help="Relative endpoint weights, e.g. compress=1,batch=1,status=10,qualities=10")
+    parser.add_argument('--batch-size', type=int, default=5,
+                        help="Videos per /compress/batch request")
+    parser.add_argument('--sample-interval', type=float, default=5,
+                        help="Seconds between job progress samples")
+    parser.add_argument('--drain-timeout', type=float, default=0,
+                        help="After traffic stops, wait up to this many seconds for queued jobs to finish")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Random seed for the request mix")
+    parser.add_argument('--output', default=None,
+                        help="Also write the report as JSON to this path")
+    parser.add_argument('--keep-data', action='store_true',
+                        help="Keep seeded videos and pending files afterwards")
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+    
+    pending_dir = os.path.abspath(args.pending_dir)
+    source = generate_source(
+        os.path.abspath(args.work_dir), args.source_resolution, 'landscape',
+        duration=args.source_duration
+    )
+    videos = seed_videos(args.videos, source['path'], pending_dir, args.user_id or uuid4())
+    video_ids = [video_id for video_id, _ in videos]
+    print(f"Seeded {len(videos)} video(s) from {source['name']}")
+    
+    processes = start_processes(args, pending_dir)
+    try:
+        if not wait_for_api(args.base_url, timeout=60):
+            print(f"✗ API at {args.base_url} did not become healthy")
+            sys.exit(1)
+        
+        run = LoadRun(args.base_url, videos, args.mix, args.batch_size,
+                      video_url_base='http://loadtest.local/videos')
+        timeline: List[Dict] = []
+        start = time.monotonic()
+        deadline = start + args.duration
+        
+        sampler_stop = threading.Event()
+        sampler = threading.Thread(
+            target=sample_jobs,
+            args=(video_ids, start, args.sample_interval, sampler_stop, timeline),
+            daemon=True
+        )
+        sampler.start()
+        
+        clients_stop = threading.Event()
+        clients = [
+            threading.Thread(target=run.client, args=(args.seed + i, deadline, clients_stop),
+                             name=f"client-{i}")
+            for i in range(args.concurrency)
+        ]
+        print(f"Running {args.concurrency} client(s) for {args.duration:g}s against {args.base_url}")
+        try:
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+        except KeyboardInterrupt:
+            clients_stop.set()
+            for client in clients:
+                client.join()
+        traffic_elapsed = time.monotonic() - start
+        
+        if args.drain_timeout > 0:
+            drain_deadline = time.monotonic() + args.drain_timeout
+            while time.monotonic() < drain_deadline:
+                counts = count_jobs(video_ids)
+                if not counts.get('queued') and not counts.get('running'):
+                    break
+                time.sleep(args.sample_interval)
+        
+        sampler_stop.set()
+        sampler.join()
+        
+        throughput = None
+        if timeline and run.first_submit is not None:
+            busy = time.monotonic() - run.first_submit
+            if busy > 0:
+                throughput = timeline[-1]['completed'] / busy
+        
+        summary = run.summary(traffic_elapsed)
+        _print_report(summary, timeline, throughput)
+        
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({
+                    'config': {
+                        'base_url': args.base_url,
+                        'videos': args.videos,
+                        'duration': args.duration,
+                        'concurrency': args.concurrency,
+                        'mix': args.mix,
+                        'batch_size': args.batch_size,
+                        'workers': args.workers,
+                        'source': source['name']
+                    },
+                    'endpoints': summary,
+                    'jobs': timeline,
+                    'jobs_per_minute': round(throughput * 60, 2) if throughput is not None else None
+                }, f, indent=2)
+            print(f"Wrote report to {args.output}")
+    finally:
+        stop_processes(processes)
+        if not args.keep_data:
+            cleanup_videos(videos, pending_dir)
+        DatabaseService.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Encode benchmarks for CompressionService.
+
+Runs compress_video for every quality/preset/thread combination and the full
+process_video_qualities ladder against deterministic lavfi sources, with the
+database and S3 stubbed in-process, and writes the measurements as JSON.
+
+Usage:
+    python -m benchmarks.run_benchmarks run [--output results.json] [--resolutions 360p,1080p]
+    python -m benchmarks.run_benchmarks compare BASELINE CURRENT [--threshold 0.10]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from app.config import settings
+from benchmarks.sources import ORIENTATIONS, PATTERNS, SOURCE_RESOLUTIONS, generate_sources
+from benchmarks.stubs import encoder_overrides, stubbed_backends
+from services.compression import CompressionService
+from utils.video_utils import get_hardware_encoder, get_supported_qualities, get_video_info
+
+logger = logging.getLogger(__name__)
+
+# Larger is worse for these; fps is the one metric where a drop is a regression
+LOWER_IS_BETTER = ('wall_seconds', 'cpu_seconds', 'output_bytes')
+HIGHER_IS_BETTER = ('fps',)
+
+
+def _cpu_seconds() -> float:
+    # ffmpeg runs as a child process; it is counted once it has been waited on
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def _measure(func: Callable) -> Tuple[object, float, float]:
+    cpu_start = _cpu_seconds()
+    wall_start = time.perf_counter()
+    result = func()
+    wall = time.perf_counter() - wall_start
+    return result, wall, _cpu_seconds() - cpu_start
+
+
+def _case_record(kind: str, source: Dict, quality: str, preset: Optional[str], threads: int,
+                 success: bool, wall: float, cpu: float, output_bytes: int) -> Dict:
+    return {
+        'id': f"{kind}/{source['name']}/{quality}/{preset or 'default'}/t{threads}",
+        'kind': kind,
+        'source': source['name'],
+        'width': source['width'],
+        'height': source['height'],
+        'pattern': source['pattern'],
+        'quality': quality,
+        'preset': preset or 'default',
+        'threads': threads,
+        'success': success,
+        'wall_seconds': round(wall, 3),
+        'cpu_seconds': round(cpu, 3),
+        'fps': round(source['frame_count'] / wall, 2) if wall > 0 else None,
+        'speed': round(source['duration'] / wall, 3) if wall > 0 else None,
+        'output_bytes': output_bytes
+    }
+
+
+def bench_compress_video(source: Dict, source_info: Dict, quality: str, preset: Optional[str],
+                         threads: int, output_dir: str) -> Dict:
+    output_path = os.path.join(output_dir, f"{source['name']}_{quality}.mp4")
+    with encoder_overrides(preset, threads):
+        result, wall, cpu = _measure(lambda: CompressionService.compress_video(
+            input_path=source['path'],
+            output_path=output_path,
+            quality=quality,
+            width=source['width'],
+            height=source['height'],
+            source_info=source_info
+        ))
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    success = bool(result and result.get('success'))
+    return _case_record(
+        'compress_video', source, quality, preset, threads,
+        success, wall, cpu, result['file_size'] if success else 0
+    )
+
+
+def bench_process_video_qualities(source: Dict, preset: Optional[str], threads: int,
+                                  completed_dir: str) -> Dict:
+    video_id = uuid4()
+    with stubbed_backends(completed_dir), encoder_overrides(preset, threads):
+        result, wall, cpu = _measure(lambda: CompressionService.process_video_qualities(
+            video_id=video_id,
+            input_path=source['path'],
+            video_url_base='http://benchmark.local/videos'
+        ))
+    shutil.rmtree(os.path.join(completed_dir, str(video_id)), ignore_errors=True)
+    
+    outputs = {
+        r['quality']: r.get('file_size') or 0
+        for r in result.get('results', [])
+    }
+    record = _case_record(
+        'process_video_qualities', source, 'ladder', preset, threads,
+        bool(result.get('success')), wall, cpu, sum(outputs.values())
+    )
+    record['outputs'] = outputs
+    return record
+
+
+def _environment() -> Dict:
+    encoder, encoder_type = get_hardware_encoder()
+    try:
+        ffmpeg_version = subprocess.run(
+            ['ffmpeg', '-version'], capture_output=True, text=True, check=True
+        ).stdout.splitlines()[0]
+    except (OSError, subprocess.CalledProcessError, IndexError):
+        ffmpeg_version = None
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'commit': commit,
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'ffmpeg': ffmpeg_version,
+        'encoder': encoder,
+        'encoder_type': encoder_type,
+        'settings': {
+            'LADDER_ENCODING': settings.LADDER_ENCODING,
+            'SEGMENT_ENCODING': settings.SEGMENT_ENCODING,
+            'STREAM_COPY_ENABLED': settings.STREAM_COPY_ENABLED,
+            'STREAM_TO_S3': settings.STREAM_TO_S3,
+            'SHARED_AUDIO_ENABLED': settings.SHARED_AUDIO_ENABLED,
+            'ADAPTIVE_STREAMING': settings.ADAPTIVE_STREAMING,
+            'COMPLEXITY_ANALYSIS_ENABLED': settings.COMPLEXITY_ANALYSIS_ENABLED,
+            'ENCODE_CPU_BUDGET': settings.ENCODE_CPU_BUDGET,
+            'MAX_CONCURRENT_ENCODES': settings.MAX_CONCURRENT_ENCODES
+        }
+    }
+
+
+def run(args: argparse.Namespace) -> int:
+    work_dir = os.path.abspath(args.work_dir)
+    output_dir = os.path.join(work_dir, 'outputs')
+    os.makedirs(output_dir, exist_ok=True)
+    
+    sources = generate_sources(
+        work_dir, args.resolutions, args.orientations, args.patterns, args.duration
+    )
+    results = []
+    
+    for source in sources:
+        source_info = get_video_info(source['path'])
+        if not source_info:
+            print(f"✗ Could not probe {source['path']}")
+            return 1
+        
+        qualities = get_supported_qualities(source['height'], source['width'])
+        if args.qualities:
+            qualities = [q for q in qualities if q in args.qualities]
+        
+        for preset in args.presets:
+            for threads in args.threads:
+                if not args.skip_compress_video:
+                    for quality in qualities:
+                        record = bench_compress_video(
+                            source, source_info, quality, preset, threads, output_dir
+                        )
+                        results.append(record)
+                        print(f"{record['id']}: {record['wall_seconds']}s wall, "
+                              f"{record['fps']} fps, {record['output_bytes']} bytes")
+                if not args.skip_pipeline:
+                    record = bench_process_video_qualities(source, preset, threads, output_dir)
+                    results.append(record)
+                    print(f"{record['id']}: {record['wall_seconds']}s wall, "
+                          f"{record['fps']} fps, {record['output_bytes']} bytes")
+    
+    report = {'environment': _environment(), 'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    
+    failed = [r['id'] for r in results if not r['success']]
+    print(f"\nWrote {len(results)} result(s) to {args.output}")
+    if failed:
+        print(f"✗ {len(failed)} case(s) failed: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+def find_regressions(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """
+    Compare two result files case by case.
+    
+    Args:
+        baseline: Parsed JSON of the stored baseline run
+        current: Parsed JSON of the run under test
+        threshold: Allowed relative change before a metric counts as a regression
+    
+    Returns:
+        One human-readable line per regression
+    """
+    baseline_cases = {r['id']: r for r in baseline.get('results', [])}
+    regressions = []
+    
+    for case in current.get('results', []):
+        base = baseline_cases.get(case['id'])
+        if not base:
+            continue
+        if base['success'] and not case['success']:
+            regressions.append(f"{case['id']}: failed (passed in baseline)")
+            continue
+        if not case['success']:
+            continue
+        
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            old, new = base.get(metric), case.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if metric in HIGHER_IS_BETTER:
+                change = -change
+            if change > threshold:
+                regressions.append(f"{case['id']}: {metric} {old} -> {new} ({change:+.1%} worse)")
+    
+    return regressions
+
+
+def compare(args: argparse.Namespace) -> int:
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    
+    for key in ('encoder', 'cpu_count', 'ffmpeg'):
+        old = baseline.get('environment', {}).get(key)
+        new = current.get('environment', {}).get(key)
+        if old != new:
+            print(f"! Environment differs ({key}: {old} -> {new}); timings may not be comparable")
+    
+    regressions = find_regressions(baseline, current, args.threshold)
+    if regressions:
+        print(f"✗ {len(regressions)} regression(s) above {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    
+    print(f"✓ No regressions above {args.threshold:.0%}")
+    return 0
+
+
+def _csv(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lambrk compression benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    run_parser = subparsers.add_parser('run', help="Run the benchmarks and write JSON results")
+    run_parser.add_argument('--output', default='benchmark-results.json',
+                            help="Where to write the JSON results")
+    run_parser.add_argument('--work-dir', default='.benchmarks',
+                            help="Directory for generated sources and encoded outputs")
+    run_parser.add_argument('--resolutions', type=_csv, default=list(SOURCE_RESOLUTIONS),
+                            help="Comma-separated source resolutions (360p,1080p,2160p)")
+    run_parser.add_argument('--orientations', type=_csv, default=list(ORIENTATIONS),
+                            help="Comma-separated orientations (landscape,portrait)")
+    run_parser.add_argument('--patterns', type=_csv, default=[PATTERNS[0]],
+                            help="Comma-separated lavfi generators (testsrc2,mandelbrot)")
+    run_parser.add_argument('--duration', type=int, default=10,
+                            help="Source length in seconds")
+    run_parser.add_argument('--qualities', type=_csv, default=None,
+                            help="Only benchmark these qualities with compress_video")
+    run_parser.add_argument('--presets', type=_csv, default=['fast'],
+                            help="Comma-separated x264 presets")
+    run_parser.add_argument('--threads', type=lambda v: [int(t) for t in _csv(v)], default=[0],
+                            help="Comma-separated encoder thread counts (0 = scheduler default)")
+    run_parser.add_argument('--skip-compress-video', action='store_true',
+                            help="Only benchmark process_video_qualities")
+    run_parser.add_argument('--skip-pipeline', action='store_true',
+                            help="Only benchmark compress_video")
+    run_parser.set_defaults(func=run)
+    
+    compare_parser = subparsers.add_parser('compare', help="Flag regressions against a baseline")
+    compare_parser.add_argument('baseline', help="Baseline results JSON")
+    compare_parser.add_argument('current', help="Results JSON to check")
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help="Allowed relative slowdown or size increase (0.10 = 10%%)")
+    compare_parser.set_defaults(func=compare)
+    
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+    
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
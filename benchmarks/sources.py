@@ -0,0 +1,92 @@
+"""
+Deterministic synthetic sources for the encode benchmarks.
+
+Sources are rendered from ffmpeg lavfi generators with bit-exact flags, so the
+same parameters always produce the same input file and results stay
+comparable across runs and machines.
+"""
+
+import os
+import subprocess
+from typing import Dict, List, Tuple
+
+# Landscape dimensions; portrait sources swap width and height
+SOURCE_RESOLUTIONS = {
+    '360p': (640, 360),
+    '1080p': (1920, 1080),
+    '2160p': (3840, 2160),
+}
+ORIENTATIONS = ('landscape', 'portrait')
+PATTERNS = ('testsrc2', 'mandelbrot')
+
+SOURCE_FPS = 30
+
+
+def source_dimensions(resolution: str, orientation: str) -> Tuple[int, int]:
+    width, height = SOURCE_RESOLUTIONS[resolution]
+    if orientation == 'portrait':
+        return height, width
+    return width, height
+
+
+def source_name(resolution: str, orientation: str, pattern: str, duration: int) -> str:
+    return f"{pattern}_{resolution}_{orientation}_{duration}s"
+
+
+def generate_source(work_dir: str, resolution: str, orientation: str,
+                    pattern: str = 'testsrc2', duration: int = 10) -> Dict:
+    """
+    Render a synthetic test source, reusing it if it already exists.
+    
+    Args:
+        work_dir: Benchmark working directory; sources go in work_dir/sources
+        resolution: Key of SOURCE_RESOLUTIONS
+        orientation: 'landscape' or 'portrait'
+        pattern: lavfi video generator, 'testsrc2' (easy) or 'mandelbrot' (detailed)
+        duration: Length in seconds
+    
+    Returns:
+        Dict with name, path, width, height, pattern, duration and frame_count
+    """
+    width, height = source_dimensions(resolution, orientation)
+    name = source_name(resolution, orientation, pattern, duration)
+    path = os.path.join(work_dir, 'sources', f"{name}.mp4")
+    
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.mp4"
+        cmd = [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f'{pattern}=size={width}x{height}:rate={SOURCE_FPS}',
+            '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000',
+            '-t', str(duration),
+            '-map', '0:v', '-map', '1:a',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '18',
+            '-pix_fmt', 'yuv420p', '-g', str(SOURCE_FPS * 2),
+            '-c:a', 'aac', '-b:a', '192k', '-ac', '2',
+            '-fflags', '+bitexact', '-flags:v', '+bitexact', '-flags:a', '+bitexact',
+            '-map_metadata', '-1',
+            '-y', tmp_path
+        ]
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        os.replace(tmp_path, path)
+    
+    return {
+        'name': name,
+        'path': path,
+        'width': width,
+        'height': height,
+        'pattern': pattern,
+        'duration': duration,
+        'frame_count': duration * SOURCE_FPS
+    }
+
+
+def generate_sources(work_dir: str, resolutions: List[str], orientations: List[str],
+                     patterns: List[str], duration: int) -> List[Dict]:
+    return [
+        generate_source(work_dir, resolution, orientation, pattern, duration)
+        for pattern in patterns
+        for resolution in resolutions
+        for orientation in orientations
+    ]
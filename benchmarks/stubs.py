@@ -0,0 +1,146 @@
+"""
+In-process stand-ins for Postgres and S3 used by the benchmarks.
+
+Only the encode path is measured, so database writes are recorded in memory
+and uploads are discarded (streamed uploads are still read to EOF so ffmpeg
+never blocks on its output pipes).
+"""
+
+import os
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional
+from unittest.mock import patch
+from uuid import UUID, uuid4
+
+from app.config import settings
+from models.video import Video, VideoQuality
+from services.compression import CompressionService
+from services.database import DatabaseService
+from services.encode_scheduler import EncodeScheduler
+from services.s3_service import S3Service
+
+
+def _stub_url(video_id: UUID, filename: str, quality: str) -> str:
+    return f"stub://{S3Service.get_s3_key(video_id, filename, quality)}"
+
+
+@contextmanager
+def stubbed_backends(completed_dir: str) -> Iterator[Dict[str, List]]:
+    """
+    Replace DatabaseService and S3Service I/O with in-memory fakes.
+    
+    Args:
+        completed_dir: Directory used as COMPLETED_DIR while the stubs are active
+    
+    Yields:
+        Dict of recorded calls: 'finalized' (finalize_video_qualities kwargs)
+        and 'uploads' (S3 keys that would have been written)
+    """
+    records: Dict[str, List] = {'finalized': [], 'uploads': []}
+    
+    def get_video_by_id(video_id: UUID) -> Optional[Video]:
+        now = datetime.now()
+        return Video(
+            id=video_id, title='benchmark', description=None, url='', thumbnail_url=None,
+            duration=None, user_id=uuid4(), views=0, likes=0, status='processing',
+            created_at=now, updated_at=now
+        )
+    
+    def create_video_qualities(video_id: UUID, qualities: List[Dict],
+                               keep_ready: bool = False) -> Dict[str, VideoQuality]:
+        now = datetime.now()
+        return {
+            row['quality']: VideoQuality(
+                id=uuid4(), video_id=video_id, quality=row['quality'], url=row.get('url'),
+                file_size=row.get('file_size'), bitrate=None, resolution_width=None,
+                resolution_height=None, codec=None, container=None, duration=None,
+                is_default=False, status=row.get('status', 'processing'),
+                created_at=now, updated_at=now
+            )
+            for row in qualities
+        }
+    
+    def finalize_video_qualities(video_id: UUID, updates: List[Dict],
+                                 default_quality: Optional[str] = None,
+                                 video_status: Optional[str] = None) -> bool:
+        records['finalized'].append({
+            'video_id': video_id,
+            'updates': updates,
+            'default_quality': default_quality,
+            'video_status': video_status
+        })
+        return True
+    
+    def upload_file(local_file_path: str, video_id: UUID, filename: str, quality: str) -> Optional[str]:
+        records['uploads'].append(S3Service.get_s3_key(video_id, filename, quality))
+        return _stub_url(video_id, filename, quality)
+    
+    def upload_stream(stream: BinaryIO, video_id: UUID, filename: str, quality: str) -> Optional[str]:
+        while stream.read(1024 * 1024):
+            pass
+        records['uploads'].append(S3Service.get_s3_key(video_id, filename, quality))
+        return _stub_url(video_id, filename, quality)
+    
+    def upload_stream_package(local_dir: str, video_id: UUID, filename: str) -> Optional[str]:
+        prefix = S3Service.get_stream_prefix(video_id, filename)
+        records['uploads'].extend(f"{prefix}/{name}" for name in sorted(os.listdir(local_dir)))
+        return f"http://benchmark.local/{prefix}"
+    
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(settings, 'COMPLETED_DIR', completed_dir))
+        for name, fake in [
+            ('get_video_by_id', get_video_by_id),
+            ('get_video_quality_states', lambda video_id, lease_seconds: {}),
+            ('create_video_qualities', create_video_qualities),
+            ('finalize_video_qualities', finalize_video_qualities),
+            ('update_video_qualities_progress', lambda **kwargs: True),
+            ('update_video_status', lambda video_id, status: True),
+            # Re-analysed on every run so COMPLEXITY_ANALYSIS_ENABLED cases include its cost
+            ('get_video_complexity', lambda video_id, filename: None),
+            ('save_video_complexity', lambda video_id, filename, analysis: True),
+            ('save_video_manifests', lambda video_id, manifests: True),
+        ]:
+            stack.enter_context(patch.object(DatabaseService, name, staticmethod(fake)))
+        stack.enter_context(patch.object(S3Service, 'upload_file', staticmethod(upload_file)))
+        stack.enter_context(patch.object(S3Service, 'upload_stream', staticmethod(upload_stream)))
+        stack.enter_context(patch.object(
+            S3Service, 'upload_stream_package', staticmethod(upload_stream_package)
+        ))
+        stack.enter_context(patch.object(
+            S3Service, 'file_exists', staticmethod(lambda video_id, filename, quality: False)
+        ))
+        yield records
+
+
+@contextmanager
+def encoder_overrides(preset: Optional[str] = None, threads: int = 0) -> Iterator[None]:
+    """
+    Force the x264 preset and per-encode thread count for one benchmark case.
+    
+    Args:
+        preset: x264 preset replacing the one CompressionService picks (None keeps it)
+        threads: Threads granted to every encode (0 keeps EncodeScheduler's sizing)
+    """
+    build_video_args = CompressionService._build_video_args
+    
+    def build_with_preset(*args, **kwargs) -> List[str]:
+        video_args = build_video_args(*args, **kwargs)
+        if preset and '-preset' in video_args:
+            video_args[video_args.index('-preset') + 1] = preset
+        return video_args
+    
+    with ExitStack() as stack:
+        if preset:
+            stack.enter_context(patch.object(
+                CompressionService, '_build_video_args', staticmethod(build_with_preset)
+            ))
+        if threads:
+            stack.enter_context(patch.object(
+                EncodeScheduler, 'threads_for', classmethod(lambda cls, width, height: threads)
+            ))
+            # Make sure the scheduler can actually grant what was asked for
+            stack.enter_context(patch.object(
+                settings, 'ENCODE_CPU_BUDGET', max(threads, EncodeScheduler.get_cpu_budget())
+            ))
+        yield
@@ -0,0 +1,9 @@
+-- Add live encoding progress fields to video_qualities table
+-- Updated periodically from FFmpeg -progress output while a quality is processing
+
+ALTER TABLE video_qualities 
+ADD COLUMN IF NOT EXISTS progress_percent DECIMAL(5, 2),
+ADD COLUMN IF NOT EXISTS encode_fps DECIMAL(10, 2),
+ADD COLUMN IF NOT EXISTS encode_speed DECIMAL(10, 3),
+ADD COLUMN IF NOT EXISTS eta_seconds INTEGER,
+ADD COLUMN IF NOT EXISTS progress_updated_at TIMESTAMP;
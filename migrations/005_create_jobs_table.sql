@@ -0,0 +1,33 @@
+-- Compression Jobs Table
+-- Durable work queue: the API enqueues, workers (python -m services.worker) claim
+-- jobs with SELECT ... FOR UPDATE SKIP LOCKED
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    video_id UUID NOT NULL,
+    filename TEXT NOT NULL,
+    video_url_base TEXT NOT NULL,
+    segmented BOOLEAN,
+    status VARCHAR(20) DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+    attempts INTEGER DEFAULT 0,
+    max_attempts INTEGER DEFAULT 3,
+    error TEXT,
+    worker_id VARCHAR(255),
+    run_after TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP,
+    completed_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Indexes
+CREATE INDEX IF NOT EXISTS idx_jobs_video_id ON jobs(video_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_queued ON jobs(run_after, created_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_running ON jobs(locked_at) WHERE status = 'running';
+
+-- Trigger for updated_at
+DROP TRIGGER IF EXISTS update_jobs_updated_at ON jobs;
+CREATE TRIGGER update_jobs_updated_at 
+    BEFORE UPDATE ON jobs
+    FOR EACH ROW 
+    EXECUTE FUNCTION update_updated_at_column();
@@ -0,0 +1,37 @@
+-- Source Fingerprints Table
+-- Content-addressed index of processed uploads: SHA-256 of the source file ->
+-- the video whose renditions can be reused for identical re-uploads
+
+CREATE TABLE IF NOT EXISTS source_fingerprints (
+    fingerprint CHAR(64) PRIMARY KEY,
+    video_id UUID NOT NULL,
+    filename TEXT NOT NULL,
+    file_size BIGINT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Add foreign key constraint if videos table exists and constraint doesn't exist
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.tables WHERE table_name = 'videos') THEN
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.table_constraints 
+            WHERE constraint_name = 'source_fingerprints_video_id_fkey'
+        ) THEN
+            ALTER TABLE source_fingerprints 
+            ADD CONSTRAINT source_fingerprints_video_id_fkey 
+            FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE;
+        END IF;
+    END IF;
+END $$;
+
+-- Indexes
+CREATE INDEX IF NOT EXISTS idx_source_fingerprints_video_id ON source_fingerprints(video_id);
+
+-- Trigger for updated_at
+DROP TRIGGER IF EXISTS update_source_fingerprints_updated_at ON source_fingerprints;
+CREATE TRIGGER update_source_fingerprints_updated_at 
+    BEFORE UPDATE ON source_fingerprints
+    FOR EACH ROW 
+    EXECUTE FUNCTION update_updated_at_column();
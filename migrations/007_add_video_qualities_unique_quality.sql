@@ -0,0 +1,16 @@
+-- One row per (video, quality)
+-- Lets retried jobs reuse their rendition rows instead of inserting duplicates
+
+-- Collapse duplicates left by earlier retries: keep the ready, default or most recent row
+DELETE FROM video_qualities vq
+USING (
+    SELECT id, ROW_NUMBER() OVER (
+        PARTITION BY video_id, quality
+        ORDER BY (status = 'ready') DESC, is_default DESC, updated_at DESC
+    ) AS row_rank
+    FROM video_qualities
+) ranked
+WHERE vq.id = ranked.id AND ranked.row_rank > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_video_qualities_video_quality
+ON video_qualities(video_id, quality);
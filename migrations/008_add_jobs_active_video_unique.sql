@@ -0,0 +1,30 @@
+-- At most one queued or running job per video
+-- Duplicate /compress requests coalesce onto the active job instead of starting a second ladder
+
+-- Retire surplus active jobs left by earlier duplicate requests: keep the running or oldest one
+UPDATE jobs j
+SET status = 'failed',
+    error = 'Superseded by a duplicate job for the same video',
+    worker_id = NULL,
+    locked_at = NULL,
+    completed_at = CURRENT_TIMESTAMP
+FROM (
+    SELECT id, ROW_NUMBER() OVER (
+        PARTITION BY video_id
+        ORDER BY (status = 'running') DESC, created_at
+    ) AS row_rank
+    FROM jobs
+    WHERE status IN ('queued', 'running')
+) ranked
+WHERE j.id = ranked.id AND ranked.row_rank > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_video
+ON jobs(video_id) WHERE status IN ('queued', 'running');
+
+-- SHA-256 of the source, recorded by the worker once hashed, so a running job can be
+-- found by content and identical uploads of different videos wait for it instead of
+-- encoding the same source twice
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS fingerprint CHAR(64);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_running_fingerprint
+ON jobs(fingerprint) WHERE status = 'running';
@@ -0,0 +1,20 @@
+-- Per-tenant fair-share scheduling
+-- Workers claim the highest priority first, then the job whose owner has the fewest
+-- jobs running, so one uploader's backfill can't take every worker
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS user_id UUID;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS priority INTEGER DEFAULT 0;
+
+-- Jobs queued before this migration belong to their video's owner
+UPDATE jobs j
+SET user_id = v.user_id
+FROM videos v
+WHERE j.video_id = v.id AND j.user_id IS NULL;
+
+UPDATE jobs SET priority = 0 WHERE priority IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_jobs_queued_priority
+ON jobs(priority DESC, created_at) WHERE status = 'queued';
+
+CREATE INDEX IF NOT EXISTS idx_jobs_running_user_id
+ON jobs(user_id) WHERE status = 'running';
@@ -0,0 +1,36 @@
+-- Video Complexity Table
+-- Per-title complexity measured by short CRF probe encodes; scales each rendition's
+-- bitrate so easy content gets smaller files and retries reuse the same ladder
+
+CREATE TABLE IF NOT EXISTS video_complexity (
+    video_id UUID PRIMARY KEY,
+    filename TEXT NOT NULL,
+    complexity REAL NOT NULL,
+    bits_per_pixel REAL,
+    samples INTEGER,
+    analysis_time REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Add foreign key constraint if videos table exists and constraint doesn't exist
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.tables WHERE table_name = 'videos') THEN
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.table_constraints 
+            WHERE constraint_name = 'video_complexity_video_id_fkey'
+        ) THEN
+            ALTER TABLE video_complexity 
+            ADD CONSTRAINT video_complexity_video_id_fkey 
+            FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE;
+        END IF;
+    END IF;
+END $$;
+
+-- Trigger for updated_at
+DROP TRIGGER IF EXISTS update_video_complexity_updated_at ON video_complexity;
+CREATE TRIGGER update_video_complexity_updated_at 
+    BEFORE UPDATE ON video_complexity
+    FOR EACH ROW 
+    EXECUTE FUNCTION update_updated_at_column();
@@ -0,0 +1,39 @@
+-- Video Manifests Table
+-- Adaptive-streaming (fMP4 HLS/DASH) packages of a video's renditions; one row per
+-- format, next to the progressive MP4s in video_qualities
+
+CREATE TABLE IF NOT EXISTS video_manifests (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    video_id UUID NOT NULL,
+    format VARCHAR(10) NOT NULL CHECK (format IN ('hls', 'dash')),
+    url TEXT NOT NULL,
+    qualities TEXT[] NOT NULL,
+    segment_duration REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_video_manifests_video_format
+ON video_manifests(video_id, format);
+
+-- Add foreign key constraint if videos table exists and constraint doesn't exist
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.tables WHERE table_name = 'videos') THEN
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.table_constraints 
+            WHERE constraint_name = 'video_manifests_video_id_fkey'
+        ) THEN
+            ALTER TABLE video_manifests 
+            ADD CONSTRAINT video_manifests_video_id_fkey 
+            FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE;
+        END IF;
+    END IF;
+END $$;
+
+-- Trigger for updated_at
+DROP TRIGGER IF EXISTS update_video_manifests_updated_at ON video_manifests;
+CREATE TRIGGER update_video_manifests_updated_at 
+    BEFORE UPDATE ON video_manifests
+    FOR EACH ROW 
+    EXECUTE FUNCTION update_updated_at_column();
@@ -0,0 +1,7 @@
+-- Forced re-encodes
+-- A forced job ignores renditions already ready in S3 and the identical-source reuse,
+-- so it encodes the whole ladder again
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS force BOOLEAN DEFAULT false;
+
+UPDATE jobs SET force = false WHERE force IS NULL;
@@ -1,4 +1,4 @@
-from .video import Video, VideoQuality
-
-__all__ = ["Video", "VideoQuality"]
+from .video import Video, VideoQuality, VideoManifest
+from .job import Job
 
+__all__ = ["Video", "VideoQuality", "VideoManifest", "Job"]
@@ -0,0 +1,49 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+
+@dataclass
+class Job:
+    id: UUID
+    video_id: UUID
+    filename: str
+    video_url_base: str
+    segmented: Optional[bool]
+    status: str
+    attempts: int
+    max_attempts: int
+    error: Optional[str]
+    worker_id: Optional[str]
+    run_after: datetime
+    locked_at: Optional[datetime]
+    completed_at: Optional[datetime]
+    created_at: datetime
+    updated_at: datetime
+    user_id: Optional[UUID] = None
+    priority: int = 0
+    force: bool = False
+    
+    @classmethod
+    def from_db_row(cls, row: tuple):
+        return cls(
+            id=row[0],
+            video_id=row[1],
+            filename=row[2],
+            video_url_base=row[3],
+            segmented=row[4],
+            status=row[5],
+            attempts=row[6],
+            max_attempts=row[7],
+            error=row[8],
+            worker_id=row[9],
+            run_after=row[10],
+            locked_at=row[11],
+            completed_at=row[12],
+            created_at=row[13],
+            updated_at=row[14],
+            user_id=row[15],
+            priority=row[16] or 0,
+            force=bool(row[17])
+        )
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 
 
@@ -75,3 +75,28 @@ class VideoQuality:
             updated_at=row[14]
         )
 
+
+
+@dataclass
+class VideoManifest:
+    id: UUID
+    video_id: UUID
+    format: str
+    url: str
+    qualities: List[str]
+    segment_duration: Optional[float]
+    created_at: datetime
+    updated_at: datetime
+    
+    @classmethod
+    def from_db_row(cls, row: tuple):
+        return cls(
+            id=row[0],
+            video_id=row[1],
+            format=row[2],
+            url=row[3],
+            qualities=list(row[4] or []),
+            segment_duration=row[5],
+            created_at=row[6],
+            updated_at=row[7]
+        )
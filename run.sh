@@ -162,5 +162,27 @@ else
     exit 1
 fi
 
+# Start the compression worker (processes jobs queued by the API)
+echo -e "${YELLOW}Starting compression worker...${NC}"
+if [ -f "compression_worker.pid" ] && ps -p "$(cat compression_worker.pid)" > /dev/null 2>&1; then
+    echo -e "${YELLOW}⚠ Worker is already running with PID: $(cat compression_worker.pid)${NC}"
+else
+    nohup python3 -m services.worker > compression_worker.log 2>&1 &
+    WORKER_PID=$!
+    echo $WORKER_PID > compression_worker.pid
+    
+    sleep 1
+    
+    if ps -p "$WORKER_PID" > /dev/null 2>&1; then
+        echo -e "${GREEN}✓ Compression worker started successfully${NC}"
+        echo -e "${GREEN}  PID: $WORKER_PID${NC}"
+        echo -e "${GREEN}  Logs: compression_worker.log${NC}"
+    else
+        echo -e "${RED}✗ Failed to start compression worker${NC}"
+        echo -e "${YELLOW}Check compression_worker.log for details${NC}"
+        rm -f compression_worker.pid
+    fi
+fi
+
 echo -e "\n${GREEN}=== Service is running ===${NC}"
 
@@ -1,6 +1,7 @@
 from .database import DatabaseService
+from .async_database import AsyncDatabaseService
 from .compression import CompressionService
 from .s3_service import S3Service
 
-__all__ = ["DatabaseService", "CompressionService", "S3Service"]
+__all__ = ["DatabaseService", "AsyncDatabaseService", "CompressionService", "S3Service"]
 
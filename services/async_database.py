@@ -0,0 +1,241 @@
+import asyncio
+import asyncpg
+from typing import Optional, List, Dict, Any, Tuple
+import logging
+from uuid import UUID
+
+from app.config import settings
+from models.video import Video, VideoQuality, VideoManifest
+from models.job import Job
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabaseService:
+    """
+    Non-blocking counterpart of DatabaseService for async FastAPI routes.
+    
+    Exposes the same method surface on top of an asyncpg pool so request
+    handlers never block the event loop. Worker threads keep using the
+    synchronous DatabaseService.
+    """
+    _pool: Optional[asyncpg.Pool] = None
+    _pool_lock: Optional[asyncio.Lock] = None
+    
+    _JOB_COLUMNS = """
+        id, video_id, filename, video_url_base, segmented, status, attempts,
+        max_attempts, error, worker_id, run_after, locked_at, completed_at,
+        created_at, updated_at, user_id, priority, force
+    """
+    
+    @classmethod
+    async def get_pool(cls) -> asyncpg.Pool:
+        if cls._pool is None:
+            if cls._pool_lock is None:
+                cls._pool_lock = asyncio.Lock()
+            async with cls._pool_lock:
+                if cls._pool is None:
+                    cls._pool = await asyncpg.create_pool(
+                        min_size=settings.ASYNC_DB_POOL_MIN,
+                        max_size=settings.ASYNC_DB_POOL_MAX,
+                        host=settings.POSTGRES_HOST,
+                        port=settings.POSTGRES_PORT,
+                        user=settings.POSTGRES_USER,
+                        password=settings.POSTGRES_PASSWORD or None,
+                        database=settings.POSTGRES_DB
+                    )
+        return cls._pool
+    
+    @classmethod
+    async def close_all(cls):
+        if cls._pool:
+            await cls._pool.close()
+            cls._pool = None
+    
+    @staticmethod
+    async def ping() -> bool:
+        pool = await AsyncDatabaseService.get_pool()
+        async with pool.acquire() as conn:
+            await conn.fetchval("SELECT 1")
+        return True
+    
+    @staticmethod
+    async def get_video_by_id(video_id: UUID) -> Optional[Video]:
+        try:
+            pool = await AsyncDatabaseService.get_pool()
+            row = await pool.fetchrow(
+                """
+                SELECT id, title, description, url, thumbnail_url, duration,
+                       user_id, views, likes, status, created_at, updated_at
+                FROM videos
+                WHERE id = $1
+                """,
+                video_id
+            )
+            if row:
+                return Video.from_db_row(row)
+            return None
+        except Exception as e:
+            logger.error(f"Error fetching video {video_id}: {e}")
+            return None
+    
+    @staticmethod
+    async def get_video_qualities(video_id: UUID) -> List[VideoQuality]:
+        try:
+            pool = await AsyncDatabaseService.get_pool()
+            rows = await pool.fetch(
+                """
+                SELECT id, video_id, quality, url, file_size, bitrate,
+                       resolution_width, resolution_height, codec, container,
+                       duration, is_default, status, created_at, updated_at
+                FROM video_qualities
+                WHERE video_id = $1
+                ORDER BY
+                    CASE quality
+                        WHEN '2160p' THEN 1
+                        WHEN '1440p' THEN 2
+                        WHEN '1080p' THEN 3
+                        WHEN '720p' THEN 4
+                        WHEN '480p' THEN 5
+                        WHEN '360p' THEN 6
+                        WHEN '240p' THEN 7
+                        WHEN '144p' THEN 8
+                        WHEN 'original' THEN 9
+                    END
+                """,
+                video_id
+            )
+            return [VideoQuality.from_db_row(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error fetching video qualities: {e}")
+            return []
+    
+    @staticmethod
+    async def get_video_manifests(video_id: UUID) -> List[VideoManifest]:
+        try:
+            pool = await AsyncDatabaseService.get_pool()
+            rows = await pool.fetch(
+                """
+                SELECT id, video_id, format, url, qualities, segment_duration,
+                       created_at, updated_at
+                FROM video_manifests
+                WHERE video_id = $1
+                ORDER BY format
+                """,
+                video_id
+            )
+            return [VideoManifest.from_db_row(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error fetching video manifests: {e}")
+            return []
+    
+    @staticmethod
+    async def get_video_qualities_progress(video_id: UUID) -> Dict[str, Dict[str, Any]]:
+        try:
+            pool = await AsyncDatabaseService.get_pool()
+            rows = await pool.fetch(
+                """
+                SELECT quality, progress_percent, encode_fps, encode_speed,
+                       eta_seconds, progress_updated_at
+                FROM video_qualities
+                WHERE video_id = $1 AND status = 'processing'
+                """,
+                video_id
+            )
+            return {
+                row[0]: {
+                    'percent': float(row[1]) if row[1] is not None else None,
+                    'fps': float(row[2]) if row[2] is not None else None,
+                    'speed': float(row[3]) if row[3] is not None else None,
+                    'eta_seconds': row[4],
+                    'updated_at': row[5].isoformat() if row[5] else None
+                }
+                for row in rows
+            }
+        except Exception as e:
+            logger.error(f"Error fetching video quality progress: {e}")
+            return {}
+    
+    @staticmethod
+    async def update_video_status(video_id: UUID, status: str) -> bool:
+        try:
+            pool = await AsyncDatabaseService.get_pool()
+            result = await pool.execute(
+                """
+                UPDATE videos
+                SET status = $1
+                WHERE id = $2
+                """,
+                status, video_id
+            )
+            return not result.endswith(' 0')
+        except Exception as e:
+            logger.error(f"Error updating video status: {e}")
+            return False
+    
+    @staticmethod
+    async def enqueue_job(video_id: UUID, filename: str, video_url_base: str,
+                          segmented: Optional[bool] = None, user_id: Optional[UUID] = None,
+                          priority: int = 0, force: bool = False) -> Tuple[Optional[Job], bool]:
+        """Queue a job or return the video's active one; see DatabaseService.enqueue_job."""
+        try:
+            pool = await AsyncDatabaseService.get_pool()
+            async with pool.acquire() as conn:
+                # The active job can finish between the conflict and the lookup; retry once
+                for _ in range(2):
+                    row = await conn.fetchrow(
+                        f"""
+                        INSERT INTO jobs (video_id, filename, video_url_base, segmented, max_attempts,
+                                          user_id, priority, force)
+                        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                        ON CONFLICT (video_id) WHERE status IN ('queued', 'running') DO NOTHING
+                        RETURNING {AsyncDatabaseService._JOB_COLUMNS}
+                        """,
+                        video_id, filename, video_url_base, segmented, settings.JOB_MAX_ATTEMPTS,
+                        user_id, priority, force
+                    )
+                    if row:
+                        return Job.from_db_row(row), True
+                    
+                    if force:
+                        # A job that has not started yet picks the force up; a running one is left alone
+                        await conn.execute(
+                            "UPDATE jobs SET force = true WHERE video_id = $1 AND status = 'queued'",
+                            video_id
+                        )
+                    
+                    row = await conn.fetchrow(
+                        f"""
+                        SELECT {AsyncDatabaseService._JOB_COLUMNS}
+                        FROM jobs
+                        WHERE video_id = $1 AND status IN ('queued', 'running')
+                        """,
+                        video_id
+                    )
+                    if row:
+                        return Job.from_db_row(row), False
+            return None, False
+        except Exception as e:
+            logger.error(f"Error enqueueing job for video {video_id}: {e}")
+            return None, False
+    
+    @staticmethod
+    async def get_latest_job(video_id: UUID) -> Optional[Job]:
+        try:
+            pool = await AsyncDatabaseService.get_pool()
+            row = await pool.fetchrow(
+                f"""
+                SELECT {AsyncDatabaseService._JOB_COLUMNS}
+                FROM jobs
+                WHERE video_id = $1
+                ORDER BY created_at DESC
+                LIMIT 1
+                """,
+                video_id
+            )
+            if row:
+                return Job.from_db_row(row)
+            return None
+        except Exception as e:
+            logger.error(f"Error fetching latest job for video {video_id}: {e}")
+            return None
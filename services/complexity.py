@@ -0,0 +1,141 @@
+import time
+import subprocess
+import logging
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.metrics import COMPLEXITY_ANALYSIS_SECONDS, COMPLEXITY_FACTOR
+from services.encode_scheduler import EncodeScheduler
+from utils.ffmpeg_utils import PipeOutput, run_ffmpeg
+from utils.video_utils import calculate_resolution
+
+logger = logging.getLogger(__name__)
+
+
+class ComplexityAnalyzer:
+    """
+    Per-title content complexity from quick constant-quality probe encodes.
+    
+    A few short windows of the source are encoded at low resolution with a
+    fixed CRF. The bits per pixel the encoder needed, relative to
+    COMPLEXITY_REFERENCE_BPP, is the factor every rendition's bitrate is scaled
+    by: static screen recordings come out well below 1, sports and film grain
+    above it.
+    """
+    _PROBE_SHORT_SIDE = 240
+    _PROBE_CRF = 23
+    _PROBE_PRESET = 'veryfast'
+    _PROBE_THREADS = 2
+    
+    @staticmethod
+    def sample_windows(duration: float, samples: int, window: float) -> List[float]:
+        """Start times of `samples` windows spread evenly over the source, away from the ends."""
+        if duration <= window * samples:
+            return [0.0]
+        return [
+            max(0.0, min(duration * (i + 1) / (samples + 1) - window / 2, duration - window))
+            for i in range(samples)
+        ]
+    
+    @staticmethod
+    def _count_bytes(stream: PipeOutput) -> int:
+        total = 0
+        while True:
+            chunk = stream.read(1024 * 1024)
+            if not chunk:
+                return total
+            total += len(chunk)
+    
+    @staticmethod
+    def _probe_window(input_path: str, start: float, window: float,
+                      width: int, height: int, threads: int) -> Optional[Dict]:
+        frames = {}
+        
+        def on_progress(progress: Dict) -> None:
+            if progress.get('frame') is not None:
+                frames['count'] = progress['frame']
+        
+        # Output is only counted, never stored
+        target = 'complexity-probe.h264'
+        cmd = [
+            'ffmpeg', '-ss', f'{start:.3f}', '-t', f'{window:.3f}', '-i', input_path,
+            '-map', '0:v:0', '-an', '-sn',
+            '-vf', f'scale={width}:{height}',
+            '-c:v', 'libx264', '-preset', ComplexityAnalyzer._PROBE_PRESET,
+            '-crf', str(ComplexityAnalyzer._PROBE_CRF),
+            '-threads', str(threads),
+            '-f', 'h264', target
+        ]
+        outputs = run_ffmpeg(
+            cmd,
+            progress_callback=on_progress,
+            output_sinks={target: ComplexityAnalyzer._count_bytes}
+        )
+        if not frames.get('count') or not outputs.get(target):
+            return None
+        return {'bytes': outputs[target], 'frames': frames['count']}
+    
+    @staticmethod
+    def analyze(input_path: str, video_info: Dict) -> Optional[Dict]:
+        """
+        Estimate how hard a source is to encode.
+        
+        Args:
+            input_path: Path to the source video
+            video_info: Probed source metadata (width, height, duration)
+        
+        Returns:
+            Dict with complexity (bitrate scale factor, clamped to
+            COMPLEXITY_MIN_FACTOR..COMPLEXITY_MAX_FACTOR), bits_per_pixel,
+            samples and analysis_time, or None if the source could not be sampled
+        """
+        width, height = video_info.get('width'), video_info.get('height')
+        duration = video_info.get('duration') or 0
+        if not width or not height:
+            return None
+        
+        probe_width, probe_height = calculate_resolution(
+            width, height, ComplexityAnalyzer._PROBE_SHORT_SIDE
+        )
+        windows = ComplexityAnalyzer.sample_windows(
+            duration, settings.COMPLEXITY_SAMPLES, settings.COMPLEXITY_SAMPLE_DURATION
+        )
+        
+        analysis_start = time.time()
+        total_bytes = 0
+        total_frames = 0
+        try:
+            with EncodeScheduler.slot(ComplexityAnalyzer._PROBE_THREADS) as threads:
+                for start in windows:
+                    probe = ComplexityAnalyzer._probe_window(
+                        input_path, start, settings.COMPLEXITY_SAMPLE_DURATION,
+                        probe_width, probe_height, threads
+                    )
+                    if probe:
+                        total_bytes += probe['bytes']
+                        total_frames += probe['frames']
+        except (subprocess.CalledProcessError, IOError) as e:
+            logger.warning(f"Complexity probe failed for {input_path}: {getattr(e, 'stderr', None) or e}")
+            return None
+        
+        if not total_frames:
+            return None
+        
+        elapsed = time.time() - analysis_start
+        COMPLEXITY_ANALYSIS_SECONDS.observe(elapsed)
+        
+        bits_per_pixel = total_bytes * 8 / (total_frames * probe_width * probe_height)
+        complexity = min(
+            max(bits_per_pixel / settings.COMPLEXITY_REFERENCE_BPP, settings.COMPLEXITY_MIN_FACTOR),
+            settings.COMPLEXITY_MAX_FACTOR
+        )
+        COMPLEXITY_FACTOR.observe(complexity)
+        
+        logger.info(f"Complexity of {input_path}: {complexity:.2f} "
+                    f"({bits_per_pixel:.4f} bpp over {len(windows)} window(s) in {elapsed:.1f}s)")
+        return {
+            'complexity': round(complexity, 3),
+            'bits_per_pixel': round(bits_per_pixel, 5),
+            'samples': len(windows),
+            'analysis_time': round(elapsed, 2)
+        }
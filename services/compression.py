@@ -1,23 +1,37 @@
 import subprocess
 import os
 import logging
-from typing import Optional, List, Dict
+import math
+from typing import Optional, List, Dict, Callable, Tuple
 from uuid import UUID
 import shutil
+import tempfile
 import time
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 
 from app.config import settings
+from app.metrics import BYTES_IN, BYTES_OUT, TIME_TO_FIRST_PLAYABLE, observe_encode
+from models.video import VideoQuality
 from services.database import DatabaseService
-from services.s3_service import S3Service
+from services.upload_pipeline import UploadPipeline
+from services.s3_service import S3Service, S3StreamUpload
+from services.encode_scheduler import EncodeScheduler
+from services.complexity import ComplexityAnalyzer
+from services.packager import StreamPackager
 from utils.video_utils import (
     get_video_info, 
     get_quality_config, 
     get_supported_qualities,
     calculate_resolution,
-    get_hardware_encoder
+    get_hardware_encoder,
+    can_stream_copy,
+    rendition_config,
+    source_video_bitrate
 )
+from utils.ffmpeg_utils import run_ffmpeg
+from utils.file_utils import file_sha256, link_or_copy
 
 logger = logging.getLogger(__name__)
 
@@ -25,9 +39,281 @@ logger = logging.getLogger(__name__)
 class CompressionService:
     
     @staticmethod
-    def compress_video(input_path: str, output_path: str, quality: str, 
-                      width: int, height: int, start_time: Optional[datetime] = None) -> Optional[Dict]:
+    def _keyframe_args(encoder_type: str) -> List[str]:
+        """Force keyframes on the segment grid so HLS/DASH segments line up across renditions."""
+        if not settings.ADAPTIVE_STREAMING:
+            return []
+        args = ['-force_key_frames', f'expr:gte(t,n_forced*{settings.ADAPTIVE_SEGMENT_DURATION})']
+        if encoder_type != 'videotoolbox':
+            # Scene-cut keyframes differ per resolution; keep the GOP structure identical
+            args.extend(['-sc_threshold', '0'])
+        return args
+    
+    @staticmethod
+    def _build_video_args(config: Dict, encoder: str, encoder_type: str,
+                          is_original_quality: bool, width: int, height: int,
+                          preset: Optional[str] = None) -> List[str]:
+        return (
+            CompressionService._build_rate_args(
+                config, encoder, encoder_type, is_original_quality, width, height, preset
+            )
+            + CompressionService._keyframe_args(encoder_type)
+        )
+    
+    @staticmethod
+    def _build_rate_args(config: Dict, encoder: str, encoder_type: str,
+                         is_original_quality: bool, width: int, height: int,
+                         preset: Optional[str] = None) -> List[str]:
+        if encoder_type == 'videotoolbox':
+            if is_original_quality:
+                # Higher quality settings for original quality
+                adaptive_bitrate = max(int(width * height * 0.15), 5000)  # Minimum 5Mbps
+                if config.get('source_bitrate'):
+                    adaptive_bitrate = min(adaptive_bitrate, config['source_bitrate'])
+                return [
+                    '-c:v', encoder,
+                    '-b:v', f'{adaptive_bitrate}k',
+                    '-maxrate', f'{int(adaptive_bitrate * 1.5)}k',
+                    '-bufsize', f'{int(adaptive_bitrate * 2)}k'
+                ]
+            return [
+                '-c:v', encoder,
+                '-b:v', config['bitrate'],
+                '-maxrate', config['maxrate'],
+                '-bufsize', config['bufsize']
+            ]
+        
+        if is_original_quality:
+            # Higher quality settings for original quality
+            args = [
+                '-c:v', encoder,
+                '-preset', 'slow',
+                '-crf', '18'  # Higher quality (lower CRF = better)
+            ]
+            if config.get('source_bitrate'):
+                # Never let a same-size re-encode outgrow its source
+                args.extend([
+                    '-maxrate', f"{config['source_bitrate']}k",
+                    '-bufsize', f"{config['source_bitrate'] * 2}k"
+                ])
+            return args
+        return [
+            '-c:v', encoder,
+            '-preset', preset or 'fast',
+            '-crf', '23',
+            '-b:v', config['bitrate'],
+            '-maxrate', config['maxrate'],
+            '-bufsize', config['bufsize']
+        ]
+    
+    @staticmethod
+    def _audio_bitrate(is_original_quality: bool) -> int:
+        return 192 if is_original_quality else 128
+    
+    @staticmethod
+    def _build_audio_args(is_original_quality: bool) -> List[str]:
+        return ['-c:a', 'aac', '-b:a', f'{CompressionService._audio_bitrate(is_original_quality)}k']
+    
+    @staticmethod
+    def _build_codec_args(config: Dict, encoder: str, encoder_type: str,
+                          is_original_quality: bool, width: int, height: int,
+                          preset: Optional[str] = None) -> List[str]:
+        return (
+            CompressionService._build_video_args(
+                config, encoder, encoder_type, is_original_quality, width, height, preset
+            )
+            + CompressionService._build_audio_args(is_original_quality)
+        )
+    
+    @staticmethod
+    def _shared_audio_track(audio_tracks: Optional[Dict[int, Dict]],
+                            is_original_quality: bool) -> Optional[Dict]:
+        if not audio_tracks:
+            return None
+        return audio_tracks.get(CompressionService._audio_bitrate(is_original_quality))
+    
+    @staticmethod
+    def _rendition_audio_bitrate(audio_tracks: Optional[Dict[int, Dict]],
+                                 is_original_quality: bool) -> int:
+        track = CompressionService._shared_audio_track(audio_tracks, is_original_quality)
+        return track['bitrate'] if track else CompressionService._audio_bitrate(is_original_quality)
+    
+    @staticmethod
+    def prepare_audio_tracks(input_path: str, work_dir: str, source_info: Optional[Dict],
+                             bitrates: List[int]) -> Optional[Dict[int, Dict]]:
+        """
+        Encode the source's audio once per bitrate so renditions can mux it instead of re-encoding.
+        
+        An AAC source at or below a target bitrate is stream-copied for that
+        target. All tracks come from one ffmpeg run, so the audio is decoded once.
+        
+        Args:
+            input_path: Path to input video
+            work_dir: Directory for the audio-only .m4a tracks
+            source_info: Probed source metadata
+            bitrates: AAC bitrates (kbps) the renditions use
+        
+        Returns:
+            Dict mapping each bitrate to {'path', 'bitrate', 'copied'}; empty if
+            the source has no audio; None if preparing failed and renditions
+            should encode their own audio
+        """
+        if not source_info or not source_info.get('audio_codec'):
+            return {}
+        
+        source_bitrate = source_info.get('audio_bitrate')
+        copy_suitable = source_info.get('audio_codec') == 'aac' and source_bitrate
+        
+        tracks = {}
+        cmd = ['ffmpeg', '-i', input_path]
+        copy_track = None
+        for bitrate in sorted(set(bitrates)):
+            if copy_suitable and source_bitrate <= bitrate:
+                if not copy_track:
+                    copy_track = {
+                        'path': os.path.join(work_dir, 'audio_copy.m4a'),
+                        'bitrate': source_bitrate,
+                        'copied': True
+                    }
+                    cmd.extend(['-map', '0:a:0', '-vn', '-sn', '-c:a', 'copy', '-y', copy_track['path']])
+                tracks[bitrate] = copy_track
+                continue
+            
+            tracks[bitrate] = {
+                'path': os.path.join(work_dir, f'audio_{bitrate}k.m4a'),
+                'bitrate': bitrate,
+                'copied': False
+            }
+            cmd.extend(['-map', '0:a:0', '-vn', '-sn', '-c:a', 'aac', '-b:a', f'{bitrate}k',
+                        '-y', tracks[bitrate]['path']])
+        
+        if not tracks:
+            return {}
+        
+        os.makedirs(work_dir, exist_ok=True)
+        try:
+            start = time.time()
+            run_ffmpeg(cmd, duration=source_info.get('duration'))
+            logger.info(f"Prepared shared audio ({', '.join(f'{b}k' for b in sorted(tracks))}"
+                        f"{', copied from source' if copy_track else ''}) in {time.time() - start:.1f}s")
+            return tracks
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Could not prepare shared audio, renditions will encode their own: {e.stderr}")
+            return None
+        except Exception as e:
+            logger.warning(f"Could not prepare shared audio, renditions will encode their own: {e}")
+            return None
+    
+    @staticmethod
+    def _movflags(streaming: bool = False) -> List[str]:
+        # faststart rewrites the file after encoding, which a pipe can't do;
+        # fragmented MP4 is playable as it is written
+        if streaming:
+            return ['-movflags', 'frag_keyframe+empty_moov+default_base_moof']
+        return ['-movflags', '+faststart']
+    
+    @staticmethod
+    def _build_output_args(encoder_type: str, threads: int = 0, streaming: bool = False) -> List[str]:
+        if encoder_type == 'videotoolbox':
+            return ['-allow_sw', '1'] + CompressionService._movflags(streaming)
+        return CompressionService._movflags(streaming) + ['-threads', str(threads)]
+    
+    @staticmethod
+    def _output_target(output_path: str, streaming: bool = False) -> List[str]:
+        # Streamed outputs keep output_path as a placeholder that run_ffmpeg swaps for a pipe
+        if streaming:
+            return ['-f', 'mp4', output_path]
+        return ['-y', output_path]
+    
+    @staticmethod
+    def _build_result(output_path: str, target_width: int, target_height: int,
+                      encoding_time: int, source_info: Optional[Dict] = None,
+                      audio_bitrate: Optional[int] = None,
+                      upload: Optional[S3StreamUpload] = None) -> Optional[Dict]:
+        if upload:
+            # Streamed straight to S3; there may be no local file to inspect
+            if upload.file_size is None:
+                return None
+            file_size = upload.file_size
+        elif os.path.exists(output_path):
+            file_size = os.path.getsize(output_path)
+        else:
+            return None
+        
+        # The encoder keeps frame rate, frame count, colour tags and audio layout of
+        # the source, so only probe the output when the source doesn't tell us enough
+        if source_info and source_info.get('pixel_format') == 'yuv420p':
+            duration = source_info.get('duration')
+            divisor = math.gcd(target_width, target_height) or 1
+            has_audio = bool(source_info.get('audio_codec'))
+            return {
+                'success': True,
+                'output_path': output_path,
+                'url': upload.url if upload else None,
+                'width': target_width,
+                'height': target_height,
+                'file_size': file_size,
+                'bitrate': int(file_size * 8 / duration / 1000) if duration else None,
+                'codec': 'h264',
+                'container': 'mp4',
+                'fps': source_info.get('fps'),
+                'pixel_format': source_info.get('pixel_format'),
+                'color_space': source_info.get('color_space'),
+                'color_range': source_info.get('color_range'),
+                'aspect_ratio': f"{target_width // divisor}:{target_height // divisor}",
+                'frame_count': source_info.get('frame_count'),
+                'audio_codec': 'aac' if has_audio else None,
+                'audio_bitrate': audio_bitrate if has_audio else None,
+                'audio_sample_rate': source_info.get('audio_sample_rate') if has_audio else None,
+                'audio_channels': source_info.get('audio_channels') if has_audio else None,
+                'encoding_time': encoding_time
+            }
+        
+        info = get_video_info(output_path) if os.path.exists(output_path) else None
+        return {
+            'success': True,
+            'output_path': output_path,
+            'url': upload.url if upload else None,
+            'width': target_width,
+            'height': target_height,
+            'file_size': file_size,
+            'bitrate': info.get('bitrate') if info else None,
+            'codec': 'h264',
+            'container': 'mp4',
+            'fps': info.get('fps') if info else None,
+            'pixel_format': info.get('pixel_format') if info else None,
+            'color_space': info.get('color_space') if info else None,
+            'color_range': info.get('color_range') if info else None,
+            'aspect_ratio': info.get('aspect_ratio') if info else None,
+            'frame_count': info.get('frame_count') if info else None,
+            'audio_codec': info.get('audio_codec') if info else None,
+            'audio_bitrate': info.get('audio_bitrate') if info else None,
+            'audio_sample_rate': info.get('audio_sample_rate') if info else None,
+            'audio_channels': info.get('audio_channels') if info else None,
+            'encoding_time': encoding_time
+        }
+    
+    @staticmethod
+    def should_stream_copy(quality: str, width: int, height: int,
+                           source_info: Optional[Dict]) -> bool:
+        # A remuxed source keeps its own GOP, which would not line up with the packaged segments
+        if not settings.STREAM_COPY_ENABLED or settings.ADAPTIVE_STREAMING or not source_info:
+            return False
         config = get_quality_config(quality)
+        if not config:
+            return False
+        target_width, target_height = calculate_resolution(width, height, config['height'])
+        return can_stream_copy(source_info, quality, target_width, target_height)
+    
+    @staticmethod
+    def compress_video(input_path: str, output_path: str, quality: str, 
+                      width: int, height: int, start_time: Optional[datetime] = None,
+                      source_info: Optional[Dict] = None,
+                      progress_callback: Optional[Callable[[Dict], None]] = None,
+                      upload: Optional[S3StreamUpload] = None,
+                      preset: Optional[str] = None,
+                      audio_tracks: Optional[Dict[int, Dict]] = None) -> Optional[Dict]:
+        config = rendition_config(quality, source_info)
         if not config:
             logger.error(f"Unsupported quality: {quality}")
             return None
@@ -41,6 +327,9 @@ class CompressionService:
         
         encoder, encoder_type = get_hardware_encoder()
         
+        # Source already meets this quality's spec: remux instead of transcoding
+        stream_copy = CompressionService.should_stream_copy(quality, width, height, source_info)
+        
         # Build scale filter that maintains aspect ratio and orientation
         # Only scale if dimensions are different
         if target_width == width and target_height == height:
@@ -51,109 +340,491 @@ class CompressionService:
             # This preserves portrait/landscape orientation
             scale_filter = f'scale={target_width}:{target_height}'
         
-        if encoder_type == 'videotoolbox':
-            cmd = ['ffmpeg', '-hwaccel', 'videotoolbox', '-i', input_path]
+        # Remuxing is I/O bound; encodes wait for CPU budget from the scheduler
+        if stream_copy:
+            encode_slot = nullcontext(0)
+        else:
+            encode_slot = EncodeScheduler.slot(
+                EncodeScheduler.threads_for(target_width, target_height)
+            )
+        
+        try:
+            with encode_slot as threads:
+                if stream_copy:
+                    cmd = [
+                        'ffmpeg', '-i', input_path,
+                        '-map', '0:v:0', '-map', '0:a:0?',
+                        '-c', 'copy'
+                    ]
+                    cmd.extend(CompressionService._movflags(upload is not None))
+                    cmd.extend(CompressionService._output_target(output_path, upload is not None))
+                    audio_bitrate = source_info.get('audio_bitrate')
+                else:
+                    if encoder_type == 'videotoolbox':
+                        cmd = ['ffmpeg', '-hwaccel', 'videotoolbox', '-i', input_path]
+                    else:
+                        cmd = ['ffmpeg', '-i', input_path]
+                    
+                    audio_track = CompressionService._shared_audio_track(audio_tracks, is_original_quality)
+                    if audio_track:
+                        # Mux the audio prepared once for the whole ladder
+                        cmd.extend(['-i', audio_track['path'], '-map', '0:v:0', '-map', '1:a:0'])
+                        cmd.extend(CompressionService._build_video_args(
+                            config, encoder, encoder_type, is_original_quality, width, height, preset
+                        ))
+                        cmd.extend(['-c:a', 'copy'])
+                    else:
+                        cmd.extend(CompressionService._build_codec_args(
+                            config, encoder, encoder_type, is_original_quality, width, height, preset
+                        ))
+                    
+                    if scale_filter:
+                        cmd.extend(['-vf', scale_filter])
+                    
+                    cmd.extend(CompressionService._build_output_args(
+                        encoder_type, threads, streaming=upload is not None
+                    ))
+                    cmd.extend(CompressionService._output_target(output_path, upload is not None))
+                    if audio_track:
+                        audio_bitrate = audio_track['bitrate']
+                    else:
+                        audio_bitrate = CompressionService._audio_bitrate(is_original_quality)
+                
+                encoding_start = time.time()
+                
+                run_ffmpeg(
+                    cmd,
+                    duration=source_info.get('duration') if source_info else None,
+                    progress_callback=progress_callback,
+                    output_sinks={output_path: upload} if upload else None
+                )
+                
+                elapsed = time.time() - encoding_start
+                encoding_time = int(elapsed)
             
-            if is_original_quality:
-                # Higher quality settings for original quality
-                adaptive_bitrate = max(int(width * height * 0.15), 5000)  # Minimum 5Mbps
-                cmd.extend([
-                    '-c:v', encoder,
-                    '-b:v', f'{adaptive_bitrate}k',
-                    '-maxrate', f'{int(adaptive_bitrate * 1.5)}k',
-                    '-bufsize', f'{int(adaptive_bitrate * 2)}k',
-                    '-c:a', 'aac',
-                    '-b:a', '192k'
-                ])
-            else:
-                cmd.extend([
-                    '-c:v', encoder,
-                    '-b:v', config['bitrate'],
-                    '-maxrate', config['maxrate'],
-                    '-bufsize', config['bufsize'],
-                    '-c:a', 'aac',
-                    '-b:a', '128k'
-                ])
+            observe_encode(
+                quality, 'copy' if stream_copy else 'encode', elapsed,
+                source_info.get('duration') if source_info else None
+            )
+            if stream_copy:
+                logger.info(f"Remuxed {quality} with stream copy (source already meets spec)")
             
-            if scale_filter:
-                cmd.extend(['-vf', scale_filter])
+            return CompressionService._build_result(
+                output_path, target_width, target_height, encoding_time,
+                source_info=source_info,
+                audio_bitrate=audio_bitrate,
+                upload=upload
+            )
+        except subprocess.CalledProcessError as e:
+            logger.error(f"FFmpeg error for {quality}: {e.stderr}")
+            return None
+        except Exception as e:
+            logger.error(f"Error compressing video to {quality}: {e}")
+            return None
+    
+    @staticmethod
+    def _plan_renditions(outputs: Dict[str, str], width: int, height: int,
+                         source_info: Optional[Dict] = None) -> List[Dict]:
+        renditions = []
+        for quality, output_path in outputs.items():
+            config = rendition_config(quality, source_info)
+            if not config:
+                logger.error(f"Unsupported quality: {quality}")
+                continue
             
-            cmd.extend(['-allow_sw', '1', '-movflags', '+faststart', '-y', output_path])
+            target_width, target_height = calculate_resolution(width, height, config['height'])
+            renditions.append({
+                'quality': quality,
+                'output_path': output_path,
+                'config': config,
+                'width': target_width,
+                'height': target_height,
+                'is_original_quality': (target_width == width and target_height == height) or quality == 'original'
+            })
+        return renditions
+    
+    @staticmethod
+    def _ladder_threads(renditions: List[Dict]) -> int:
+        return sum(EncodeScheduler.threads_for(r['width'], r['height']) for r in renditions)
+    
+    @staticmethod
+    def _build_ladder_cmd(input_path: str, renditions: List[Dict], output_paths: List[str],
+                          width: int, height: int, include_audio: bool = True,
+                          threads: int = 0, streaming: bool = False,
+                          audio_tracks: Optional[Dict[int, Dict]] = None) -> List[str]:
+        encoder, encoder_type = get_hardware_encoder()
+        
+        # Share the granted threads between outputs in proportion to their size
+        wanted = [EncodeScheduler.threads_for(r['width'], r['height']) for r in renditions]
+        if threads:
+            output_threads = [max(1, round(threads * w / sum(wanted))) for w in wanted]
+        else:
+            output_threads = [0] * len(renditions)
+        
+        # One decoder feeding N scalers: [0:v]split=N[s0][s1]...;[s0]scale=w:h[v0]...
+        split_labels = ''.join(f'[s{i}]' for i in range(len(renditions)))
+        filters = [f'[0:v]split={len(renditions)}{split_labels}']
+        for i, rendition in enumerate(renditions):
+            if rendition['width'] == width and rendition['height'] == height:
+                filters.append(f'[s{i}]null[v{i}]')
+            else:
+                filters.append(f"[s{i}]scale={rendition['width']}:{rendition['height']}[v{i}]")
+        
+        if encoder_type == 'videotoolbox':
+            cmd = ['ffmpeg', '-hwaccel', 'videotoolbox', '-i', input_path]
         else:
             cmd = ['ffmpeg', '-i', input_path]
-            
-            if is_original_quality:
-                # Higher quality settings for original quality
-                cmd.extend([
-                    '-c:v', encoder,
-                    '-preset', 'slow',
-                    '-crf', '18',  # Higher quality (lower CRF = better)
-                    '-c:a', 'aac',
-                    '-b:a', '192k'
-                ])
+        
+        # Shared audio tracks become extra inputs, each muxed into every rendition that uses it
+        audio_inputs = {}
+        if include_audio:
+            for rendition in renditions:
+                track = CompressionService._shared_audio_track(audio_tracks, rendition['is_original_quality'])
+                if track and track['path'] not in audio_inputs:
+                    audio_inputs[track['path']] = len(audio_inputs) + 1
+                    cmd.extend(['-i', track['path']])
+        
+        cmd.extend(['-filter_complex', ';'.join(filters)])
+        
+        for i, (rendition, output_path) in enumerate(zip(renditions, output_paths)):
+            cmd.extend(['-map', f'[v{i}]'])
+            cmd.extend(CompressionService._build_video_args(
+                rendition['config'], encoder, encoder_type,
+                rendition['is_original_quality'], width, height
+            ))
+            track = CompressionService._shared_audio_track(audio_tracks, rendition['is_original_quality'])
+            if include_audio and track:
+                cmd.extend(['-map', f"{audio_inputs[track['path']]}:a:0", '-c:a', 'copy'])
+            elif include_audio:
+                cmd.extend(['-map', '0:a:0?'])
+                cmd.extend(CompressionService._build_audio_args(rendition['is_original_quality']))
             else:
-                cmd.extend([
-                    '-c:v', encoder,
-                    '-preset', 'fast',
-                    '-crf', '23',
-                    '-b:v', config['bitrate'],
-                    '-maxrate', config['maxrate'],
-                    '-bufsize', config['bufsize'],
-                    '-c:a', 'aac',
-                    '-b:a', '128k'
-                ])
-            
-            if scale_filter:
-                cmd.extend(['-vf', scale_filter])
-            
-            cmd.extend(['-movflags', '+faststart', '-threads', '0', '-y', output_path])
+                cmd.append('-an')
+            cmd.extend(CompressionService._build_output_args(encoder_type, output_threads[i], streaming))
+            cmd.extend(CompressionService._output_target(output_path, streaming))
         
+        return cmd
+    
+    @staticmethod
+    def compress_ladder(input_path: str, outputs: Dict[str, str], width: int, height: int,
+                        start_time: Optional[datetime] = None,
+                        source_info: Optional[Dict] = None,
+                        progress_callback: Optional[Callable[[Dict], None]] = None,
+                        uploads: Optional[Dict[str, S3StreamUpload]] = None,
+                        audio_tracks: Optional[Dict[int, Dict]] = None) -> Dict[str, Optional[Dict]]:
+        """
+        Encode several qualities from a single decode of the source.
+        
+        The decoded video is fanned out with a split/scale filter graph so one
+        ffmpeg process writes every rendition.
+        
+        Args:
+            input_path: Path to input video
+            outputs: Mapping of quality name to output path
+            width: Original video width
+            height: Original video height
+            start_time: Processing start time
+            source_info: Probed source metadata, used to describe outputs without re-probing
+            progress_callback: Called with live progress (percent, fps, speed, eta_seconds)
+            uploads: Per-quality S3 sinks; when given, every output is streamed
+                to S3 instead of written to its output path
+            audio_tracks: Shared audio from prepare_audio_tracks(), muxed
+                instead of encoding audio per rendition
+        
+        Returns:
+            Dict mapping each quality to the same result dict compress_video
+            returns, or None for qualities that failed
+        """
+        results: Dict[str, Optional[Dict]] = {quality: None for quality in outputs}
+        uploads = uploads or {}
+        
+        renditions = CompressionService._plan_renditions(outputs, width, height, source_info)
+        if not renditions:
+            return results
+        
+        for rendition in renditions:
+            os.makedirs(os.path.dirname(rendition['output_path']), exist_ok=True)
+        
+        qualities = ', '.join(r['quality'] for r in renditions)
+        output_sinks = {
+            r['output_path']: uploads[r['quality']] for r in renditions if r['quality'] in uploads
+        }
+        
+        try:
+            with EncodeScheduler.slot(CompressionService._ladder_threads(renditions)) as threads:
+                cmd = CompressionService._build_ladder_cmd(
+                    input_path, renditions, [r['output_path'] for r in renditions],
+                    width, height, threads=threads, streaming=bool(output_sinks),
+                    audio_tracks=audio_tracks
+                )
+                encoding_start = time.time()
+                run_ffmpeg(
+                    cmd,
+                    duration=source_info.get('duration') if source_info else None,
+                    progress_callback=progress_callback,
+                    output_sinks=output_sinks or None
+                )
+                # Every rendition shares the single ffmpeg run, so they share its wall time
+                elapsed = time.time() - encoding_start
+                encoding_time = int(elapsed)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"FFmpeg ladder error for {qualities}: {e.stderr}")
+            return results
+        except Exception as e:
+            logger.error(f"Error compressing ladder {qualities}: {e}")
+            return results
+        
+        for rendition in renditions:
+            observe_encode(
+                rendition['quality'], 'ladder', elapsed,
+                source_info.get('duration') if source_info else None
+            )
+            results[rendition['quality']] = CompressionService._build_result(
+                rendition['output_path'], rendition['width'], rendition['height'], encoding_time,
+                source_info=source_info,
+                audio_bitrate=CompressionService._rendition_audio_bitrate(
+                    audio_tracks, rendition['is_original_quality']
+                ),
+                upload=uploads.get(rendition['quality'])
+            )
+        
+        return results
+    
+    @staticmethod
+    def split_segments(input_path: str, work_dir: str, segment_duration: int) -> List[str]:
+        """
+        Split the source video stream into keyframe-aligned chunks without re-encoding.
+        
+        The segment muxer only cuts on keyframes, so each chunk starts with a
+        keyframe and is at least segment_duration seconds long.
+        
+        Returns:
+            Sorted list of chunk paths (empty if splitting failed)
+        """
+        os.makedirs(work_dir, exist_ok=True)
+        cmd = [
+            'ffmpeg', '-i', input_path,
+            '-map', '0:v:0',
+            '-c', 'copy',
+            '-f', 'segment',
+            '-segment_time', str(segment_duration),
+            '-reset_timestamps', '1',
+            '-y', os.path.join(work_dir, 'source_%05d.mkv')
+        ]
+        
+        try:
+            run_ffmpeg(cmd)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"FFmpeg segment split error for {input_path}: {e.stderr}")
+            return []
+        
+        return sorted(
+            os.path.join(work_dir, name)
+            for name in os.listdir(work_dir)
+            if name.startswith('source_')
+        )
+    
+    @staticmethod
+    def compress_segmented(input_path: str, outputs: Dict[str, str], width: int, height: int,
+                           start_time: Optional[datetime] = None,
+                           source_info: Optional[Dict] = None,
+                           progress_callback: Optional[Callable[[Dict], None]] = None,
+                           uploads: Optional[Dict[str, S3StreamUpload]] = None,
+                           audio_tracks: Optional[Dict[int, Dict]] = None) -> Dict[str, Optional[Dict]]:
+        """
+        Encode qualities by splitting the source at keyframes and encoding chunks in parallel.
+        
+        Each chunk runs the whole ladder in its own ffmpeg process, and the
+        encoded chunks are concatenated per quality with stream copy. Audio is
+        taken from the full source (or the shared audio track) during the
+        concat so chunk boundaries do not introduce audio gaps.
+        
+        Args:
+            input_path: Path to input video
+            outputs: Mapping of quality name to output path
+            width: Original video width
+            height: Original video height
+            start_time: Processing start time
+            source_info: Probed source metadata, used to describe outputs without re-probing
+            progress_callback: Called with live progress (percent, fps, speed, eta_seconds)
+            uploads: Per-quality S3 sinks the final concat streams into instead
+                of writing the output path (chunks still go to a temp dir)
+            audio_tracks: Shared audio from prepare_audio_tracks(), muxed during
+                the concat instead of encoding audio per quality
+        
+        Returns:
+            Dict mapping each quality to the same result dict compress_video
+            returns, or None for qualities that failed
+        """
+        results: Dict[str, Optional[Dict]] = {quality: None for quality in outputs}
+        uploads = uploads or {}
+        
+        renditions = CompressionService._plan_renditions(outputs, width, height, source_info)
+        if not renditions:
+            return results
+        
+        for rendition in renditions:
+            os.makedirs(os.path.dirname(rendition['output_path']), exist_ok=True)
+        
+        work_dir = tempfile.mkdtemp(
+            prefix='segments_',
+            dir=os.path.dirname(renditions[0]['output_path'])
+        )
+        qualities = ', '.join(r['quality'] for r in renditions)
         encoding_start = time.time()
         
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
+            segments = CompressionService.split_segments(
+                input_path, work_dir, settings.SEGMENT_DURATION
             )
+            if not segments:
+                return results
             
-            encoding_time = int(time.time() - encoding_start)
+            # Parallelism comes from running chunks side by side, so each chunk asks for
+            # its share of the budget rather than the whole ladder's thread count
+            max_workers = settings.SEGMENT_WORKERS or os.cpu_count() or 1
+            concurrent_chunks = min(
+                max_workers, len(segments), EncodeScheduler.get_max_concurrent_encodes()
+            )
+            chunk_threads = min(
+                CompressionService._ladder_threads(renditions),
+                max(1, EncodeScheduler.get_cpu_budget() // concurrent_chunks)
+            )
             
-            if os.path.exists(output_path):
-                info = get_video_info(output_path)
-                return {
-                    'success': True,
-                    'output_path': output_path,
-                    'width': target_width,
-                    'height': target_height,
-                    'file_size': os.path.getsize(output_path),
-                    'bitrate': info.get('bitrate') if info else None,
-                    'codec': 'h264',
-                    'container': 'mp4',
-                    'fps': info.get('fps') if info else None,
-                    'pixel_format': info.get('pixel_format') if info else None,
-                    'color_space': info.get('color_space') if info else None,
-                    'color_range': info.get('color_range') if info else None,
-                    'aspect_ratio': info.get('aspect_ratio') if info else None,
-                    'frame_count': info.get('frame_count') if info else None,
-                    'audio_codec': info.get('audio_codec') if info else None,
-                    'audio_bitrate': info.get('audio_bitrate') if info else None,
-                    'audio_sample_rate': info.get('audio_sample_rate') if info else None,
-                    'audio_channels': info.get('audio_channels') if info else None,
-                    'encoding_time': encoding_time
-                }
-            return None
+            def encode_segment(index: int, segment_path: str) -> None:
+                chunk_paths = [
+                    os.path.join(work_dir, f"{r['quality']}_{index:05d}.mp4")
+                    for r in renditions
+                ]
+                with EncodeScheduler.slot(chunk_threads) as threads:
+                    cmd = CompressionService._build_ladder_cmd(
+                        segment_path, renditions, chunk_paths, width, height,
+                        include_audio=False, threads=threads
+                    )
+                    run_ffmpeg(cmd)
+            
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(encode_segment, index, segment_path)
+                    for index, segment_path in enumerate(segments)
+                ]
+                for completed, future in enumerate(as_completed(futures), start=1):
+                    future.result()
+                    if progress_callback:
+                        elapsed = time.time() - encoding_start
+                        remaining = len(segments) - completed
+                        progress_callback({
+                            'percent': round(completed / len(segments) * 100, 2),
+                            'fps': None,
+                            'speed': None,
+                            'eta_seconds': int(elapsed / completed * remaining)
+                        })
+            
+            concatenated = []
+            for rendition in renditions:
+                quality = rendition['quality']
+                concat_list = os.path.join(work_dir, f'{quality}_concat.txt')
+                with open(concat_list, 'w') as f:
+                    for index in range(len(segments)):
+                        chunk_path = os.path.join(work_dir, f'{quality}_{index:05d}.mp4')
+                        escaped_path = chunk_path.replace("'", "'\\''")
+                        f.write(f"file '{escaped_path}'\n")
+                
+                track = CompressionService._shared_audio_track(audio_tracks, rendition['is_original_quality'])
+                cmd = [
+                    'ffmpeg',
+                    '-f', 'concat', '-safe', '0', '-i', concat_list,
+                    '-i', track['path'] if track else input_path,
+                    '-map', '0:v:0', '-map', '1:a:0?',
+                    '-c:v', 'copy'
+                ]
+                if track:
+                    cmd.extend(['-c:a', 'copy'])
+                else:
+                    cmd.extend(CompressionService._build_audio_args(rendition['is_original_quality']))
+                
+                upload = uploads.get(quality)
+                cmd.extend(CompressionService._movflags(upload is not None))
+                cmd.extend(CompressionService._output_target(rendition['output_path'], upload is not None))
+                
+                try:
+                    run_ffmpeg(cmd, output_sinks={rendition['output_path']: upload} if upload else None)
+                    concatenated.append(rendition)
+                except subprocess.CalledProcessError as e:
+                    logger.error(f"FFmpeg concat error for {quality}: {e.stderr}")
+            
+            elapsed = time.time() - encoding_start
+            encoding_time = int(elapsed)
+            
+            for rendition in concatenated:
+                observe_encode(
+                    rendition['quality'], 'segmented', elapsed,
+                    source_info.get('duration') if source_info else None
+                )
+                results[rendition['quality']] = CompressionService._build_result(
+                    rendition['output_path'], rendition['width'], rendition['height'], encoding_time,
+                    source_info=source_info,
+                    audio_bitrate=CompressionService._rendition_audio_bitrate(
+                        audio_tracks, rendition['is_original_quality']
+                    ),
+                    upload=uploads.get(rendition['quality'])
+                )
+            
+            return results
         except subprocess.CalledProcessError as e:
-            logger.error(f"FFmpeg error for {quality}: {e.stderr}")
-            return None
+            logger.error(f"FFmpeg segment encode error for {qualities}: {e.stderr}")
+            return results
         except Exception as e:
-            logger.error(f"Error compressing video to {quality}: {e}")
-            return None
+            logger.error(f"Error compressing segments for {qualities}: {e}")
+            return results
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _progress_reporter(quality_ids: List[UUID]) -> Callable[[Dict], None]:
+        """Build a progress callback that writes to video_qualities at most every PROGRESS_UPDATE_INTERVAL seconds."""
+        last_update = [0.0]
+        
+        def report(progress: Dict) -> None:
+            now = time.time()
+            if now - last_update[0] < settings.PROGRESS_UPDATE_INTERVAL and progress.get('percent') != 100.0:
+                return
+            last_update[0] = now
+            DatabaseService.update_video_qualities_progress(
+                quality_ids=quality_ids,
+                progress_percent=progress.get('percent'),
+                encode_fps=progress.get('fps'),
+                encode_speed=progress.get('speed'),
+                eta_seconds=progress.get('eta_seconds')
+            )
+        
+        return report
     
     @staticmethod
     def process_video_qualities(video_id: UUID, input_path: str, 
-                                video_url_base: str) -> Dict:
+                                video_url_base: str, segmented: Optional[bool] = None,
+                                on_start: Optional[Callable[[], None]] = None,
+                                job_id: Optional[UUID] = None, force: bool = False) -> Dict:
+        """
+        Encode and publish every supported rendition of a video.
+        
+        Args:
+            video_id: Video database ID
+            input_path: Path to the source video
+            video_url_base: Base URL for fallback rendition URLs
+            segmented: Encode keyframe-aligned chunks in parallel (default: SEGMENT_ENCODING)
+            on_start: Called once the video has passed its checks and its rendition
+                rows are claimed, before anything is encoded
+            job_id: Queue job running this call; it is the video's only active job,
+                so rows still marked as being processed are reclaimed instead of
+                rejecting the attempt
+            force: Re-encode every rendition, including ones already ready in S3.
+                A published video keeps serving its ready renditions until the
+                new ones replace them, and keeps any whose re-encode fails
+        
+        Returns:
+            Dict with success, results per quality and video_info, or an error
+        """
         video_info = get_video_info(input_path)
         if not video_info:
             logger.error(f"Could not get video info for {input_path}")
@@ -161,7 +832,6 @@ class CompressionService:
         
         original_width = video_info['width']
         original_height = video_info['height']
-        supported_qualities = get_supported_qualities(original_height, original_width)
         
         video = DatabaseService.get_video_by_id(video_id)
         if not video:
@@ -169,183 +839,634 @@ class CompressionService:
         
         input_filename = os.path.basename(input_path)
         base_name = os.path.splitext(input_filename)[0]
+        # A forced re-encode must not take a published video offline while it runs
+        replacing = force and video.status == 'published'
+        
+        if settings.COMPLEXITY_ANALYSIS_ENABLED:
+            # Every encode of this video reads the factor from video_info
+            video_info['complexity'] = CompressionService._complexity_factor(
+                video_id, input_path, video_info
+            )
+        
+        # Rungs above the source bitrate, or barely smaller than the next one up, are skipped
+        supported_qualities = get_supported_qualities(
+            original_height, original_width, source_video_bitrate(video_info),
+            video_info.get('complexity')
+        )
         
         results = []
         
         processing_start = datetime.now()
         
+        # A retry only redoes renditions that are not already ready in S3; rows an
+        # interrupted attempt left in 'processing' are reclaimed once their lease expires.
+        # A queue job holds the video's only active job (idx_jobs_active_video), so rows that
+        # still look live can only be its own crashed attempt's and are reclaimed right away
+        existing = DatabaseService.get_video_quality_states(video_id, settings.JOB_LEASE_TIMEOUT)
+        if job_id is None and any(
+            existing[quality]['active'] for quality in supported_qualities if quality in existing
+        ):
+            return {'success': False, 'error': 'Video is already being processed'}
+        
+        output_paths = {}
+        pending_rows = []
+        
         for quality in supported_qualities:
+            state = existing.get(quality)
+            if (not force and state and state['status'] == 'ready'
+                    and S3Service.file_exists(video_id, input_filename, quality)):
+                results.append({'quality': quality, 'status': 'ready', 'file_size': state['file_size']})
+                continue
+            
             output_filename = f"{base_name}_{quality}.mp4"
-            output_path = os.path.join(settings.COMPLETED_DIR, str(video_id), output_filename)
+            output_paths[quality] = os.path.join(settings.COMPLETED_DIR, str(video_id), output_filename)
             
             # Create quality record with temporary URL (will be updated after S3 upload)
-            temp_url = f"{video_url_base}/{str(video_id)}/{output_filename}"
-            
-            quality_record = DatabaseService.create_video_quality(
+            pending_rows.append({
+                'quality': quality,
+                'url': f"{video_url_base}/{str(video_id)}/{output_filename}",
+                'status': 'processing',
+                'processing_started_at': processing_start
+            })
+        
+        if results:
+            logger.info(f"Resuming video {video_id}: {len(results)} rendition(s) already ready, "
+                        f"{len(pending_rows)} to encode")
+        
+        # One insert for the whole ladder instead of a round trip per rendition
+        quality_records = {}
+        if pending_rows:
+            quality_records = DatabaseService.create_video_qualities(
+                video_id, pending_rows, keep_ready=replacing
+            )
+            if not quality_records:
+                logger.error(f"Failed to create quality records for video {video_id}")
+                return {'success': False, 'error': 'Could not create quality records'}
+        
+        if on_start:
+            on_start()
+        
+        if segmented is None:
+            segmented = settings.SEGMENT_ENCODING
+        # Only long sources are worth splitting into chunks
+        segmented = segmented and (video_info.get('duration') or 0) >= settings.SEGMENT_MIN_DURATION
+        
+        # Qualities the source already satisfies are remuxed individually, not encoded
+        encode_paths = {
+            quality: output_path for quality, output_path in output_paths.items()
+            if not CompressionService.should_stream_copy(
+                quality, original_width, original_height, video_info
+            )
+        }
+        
+        # Progressive mode: one quick rendition is encoded and published before the rest of the ladder
+        # (a resumed or re-encoded published video already has something playable).
+        # Segmented chunks restart their keyframe grid at every cut, so for adaptive streaming
+        # all renditions must come from the same chunks and the whole-source first rendition is skipped
+        first_quality = None
+        if (settings.PROGRESSIVE_PUBLISH and len(quality_records) > 1 and not results
+                and not replacing and not (settings.ADAPTIVE_STREAMING and segmented)):
+            first_quality = CompressionService._first_playable_quality(list(quality_records))
+            encode_paths.pop(first_quality, None)
+        encode_ids = [quality_records[quality].id for quality in encode_paths]
+        
+        # Zero-disk mode: ffmpeg pipes each rendition straight into an S3 multipart upload
+        stream_uploads = {}
+        if settings.STREAM_TO_S3:
+            stream_uploads = {
+                quality: S3StreamUpload(
+                    video_id, input_filename, quality,
+                    local_copy_path=output_paths[quality] if settings.KEEP_LOCAL_COPY else None
+                )
+                for quality in quality_records
+            }
+        
+        compression_results = {}
+        pending_uploads = {}
+        quality_updates = []
+        ready_qualities = [r['quality'] for r in results]
+        kept_qualities = []
+        collected = set()
+        published = [False]
+        
+        def collect(quality: str) -> None:
+            update, result = CompressionService._rendition_update(
+                quality, quality_records[quality], compression_results.get(quality),
+                pending_uploads.get(quality), quality in stream_uploads, video_info
+            )
+            results.append(result)
+            collected.add(quality)
+            if result['status'] == 'ready':
+                quality_updates.append(update)
+                ready_qualities.append(quality)
+            elif replacing and quality_records[quality].status == 'ready':
+                # The previous rendition is still in place; keep serving it
+                logger.warning(f"Re-encoding {quality} of video {video_id} failed, keeping the previous rendition")
+                kept_qualities.append(quality)
+            else:
+                quality_updates.append(update)
+        
+        def publish() -> None:
+            # Persist what has landed so far and move the default to the best ready rendition
+            if not ready_qualities:
+                return
+            if DatabaseService.finalize_video_qualities(
                 video_id=video_id,
-                quality=quality,
-                url=temp_url,
-                status='processing',
-                processing_started_at=processing_start
+                updates=quality_updates,
+                default_quality=CompressionService._pick_default_quality(ready_qualities),
+                video_status='published'
+            ):
+                del quality_updates[:]
+                if not published[0]:
+                    published[0] = True
+                    elapsed = (datetime.now() - processing_start).total_seconds()
+                    TIME_TO_FIRST_PLAYABLE.observe(elapsed)
+                    logger.info(f"Published video {video_id} with {', '.join(ready_qualities)} after {elapsed:.1f}s")
+        
+        if first_quality:
+            compression_results[first_quality] = CompressionService.compress_video(
+                input_path=input_path,
+                output_path=output_paths[first_quality],
+                quality=first_quality,
+                width=original_width,
+                height=original_height,
+                start_time=processing_start,
+                source_info=video_info,
+                progress_callback=CompressionService._progress_reporter([quality_records[first_quality].id]),
+                upload=stream_uploads.get(first_quality),
+                preset=settings.PROGRESSIVE_FIRST_PRESET
             )
-            
-            if not quality_record:
-                logger.error(f"Failed to create quality record for {quality}")
-                continue
-            
-            compression_result = CompressionService.compress_video(
+            if (compression_results[first_quality] and compression_results[first_quality].get('success')
+                    and first_quality not in stream_uploads):
+                pending_uploads[first_quality] = UploadPipeline.submit(
+                    output_paths[first_quality], video_id, input_filename, first_quality
+                )
+            collect(first_quality)
+            publish()
+        
+        # Audio is identical across renditions: encode it once per bitrate and mux it into each
+        audio_tracks = None
+        audio_dir = None
+        if settings.SHARED_AUDIO_ENABLED and len(encode_paths) > 1 and video_info.get('audio_codec'):
+            renditions = CompressionService._plan_renditions(
+                encode_paths, original_width, original_height, video_info
+            )
+            output_dir = os.path.dirname(next(iter(encode_paths.values())))
+            os.makedirs(output_dir, exist_ok=True)
+            audio_dir = tempfile.mkdtemp(prefix='audio_', dir=output_dir)
+            audio_tracks = CompressionService.prepare_audio_tracks(
+                input_path, audio_dir, video_info,
+                [CompressionService._audio_bitrate(r['is_original_quality']) for r in renditions]
+            )
+        
+        # Long sources are split at keyframes and encoded chunk-parallel;
+        # otherwise decode the source once for the whole ladder when there is more than one rendition
+        ladder_results = None
+        if segmented and encode_paths:
+            ladder_results = CompressionService.compress_segmented(
+                input_path=input_path,
+                outputs=encode_paths,
+                width=original_width,
+                height=original_height,
+                start_time=processing_start,
+                source_info=video_info,
+                progress_callback=CompressionService._progress_reporter(encode_ids),
+                uploads=stream_uploads,
+                audio_tracks=audio_tracks
+            )
+        elif settings.LADDER_ENCODING and len(encode_paths) > 1:
+            ladder_results = CompressionService.compress_ladder(
                 input_path=input_path,
-                output_path=output_path,
-                quality=quality,
+                outputs=encode_paths,
                 width=original_width,
                 height=original_height,
-                start_time=processing_start
+                start_time=processing_start,
+                source_info=video_info,
+                progress_callback=CompressionService._progress_reporter(encode_ids),
+                uploads=stream_uploads,
+                audio_tracks=audio_tracks
             )
+        
+        # Finished renditions go straight onto the upload queue so the next encode
+        # doesn't wait on the network
+        for quality, quality_record in quality_records.items():
+            if quality == first_quality:
+                continue
+            output_path = output_paths[quality]
             
-            if compression_result and compression_result.get('success'):
-                # Upload compressed video to S3
-                s3_url = S3Service.upload_file(output_path, video_id, input_filename, quality)
-                if s3_url:
-                    video_quality_url = s3_url
-                    logger.info(f"Uploaded {quality} to S3: {s3_url}")
-                else:
-                    # Fallback to local URL if S3 upload fails
-                    video_quality_url = temp_url
-                    logger.warning(f"S3 upload failed for {quality}, using local URL")
-                
-                # Update with S3 URL if available
-                DatabaseService.update_video_quality(
-                    quality_id=quality_record.id,
-                    url=video_quality_url,
-                    file_size=compression_result['file_size'],
-                    bitrate=compression_result['bitrate'],
-                    resolution_width=compression_result['width'],
-                    resolution_height=compression_result['height'],
-                    codec=compression_result['codec'],
-                    container=compression_result['container'],
-                    duration=video_info.get('duration'),
-                    status='ready',
-                    fps=compression_result.get('fps'),
-                    pixel_format=compression_result.get('pixel_format'),
-                    color_space=compression_result.get('color_space'),
-                    color_range=compression_result.get('color_range'),
-                    audio_codec=compression_result.get('audio_codec'),
-                    audio_bitrate=compression_result.get('audio_bitrate'),
-                    audio_sample_rate=compression_result.get('audio_sample_rate'),
-                    audio_channels=compression_result.get('audio_channels'),
-                    aspect_ratio=compression_result.get('aspect_ratio'),
-                    frame_count=compression_result.get('frame_count'),
-                    encoding_time=compression_result.get('encoding_time'),
-                    processing_completed_at=datetime.now()
-                )
-                results.append({
-                    'quality': quality,
-                    'status': 'ready',
-                    'file_size': compression_result['file_size']
-                })
+            if ladder_results is not None and quality in ladder_results:
+                compression_result = ladder_results.get(quality)
             else:
-                DatabaseService.update_video_quality_status(
-                    quality_id=quality_record.id,
-                    status='failed'
+                compression_result = CompressionService.compress_video(
+                    input_path=input_path,
+                    output_path=output_path,
+                    quality=quality,
+                    width=original_width,
+                    height=original_height,
+                    start_time=processing_start,
+                    source_info=video_info,
+                    progress_callback=CompressionService._progress_reporter([quality_record.id]),
+                    upload=stream_uploads.get(quality),
+                    audio_tracks=audio_tracks
                 )
-                results.append({
-                    'quality': quality,
-                    'status': 'failed'
-                })
-        
-        ready_qualities = [r for r in results if r.get('status') == 'ready']
-        if ready_qualities:
-            preferred_defaults = ['720p', '1080p', '480p', '360p']
-            default_quality_name = None
-            for pref in preferred_defaults:
-                if pref in supported_qualities:
-                    default_quality_name = pref
-                    break
-            if not default_quality_name and supported_qualities:
-                default_quality_name = supported_qualities[0]
             
-            if default_quality_name:
-                default_qualities = DatabaseService.get_video_qualities(video_id)
-                for vq in default_qualities:
-                    if vq.quality == default_quality_name and vq.status == 'ready':
-                        DatabaseService.set_default_quality(video_id, vq.id)
-                        break
-        
-        all_failed = all(r.get('status') == 'failed' for r in results)
+            compression_results[quality] = compression_result
+            if compression_result and compression_result.get('success') and quality not in stream_uploads:
+                pending_uploads[quality] = UploadPipeline.submit(output_path, video_id, input_filename, quality)
+            
+            if first_quality:
+                # Publish renditions whose upload has already finished; never wait on one here
+                landed = [
+                    q for q in compression_results
+                    if q not in collected and (q not in pending_uploads or pending_uploads[q].done())
+                ]
+                for q in landed:
+                    collect(q)
+                if landed:
+                    publish()
+        
+        if audio_dir:
+            shutil.rmtree(audio_dir, ignore_errors=True)
+        
+        for quality in quality_records:
+            if quality not in collected:
+                collect(quality)
+        
+        manifests = []
+        if settings.ADAPTIVE_STREAMING and ready_qualities:
+            manifests = CompressionService._package_streams(
+                video_id, input_filename,
+                [quality for quality in supported_qualities if quality in ready_qualities],
+                video_info
+            )
+        
+        all_failed = not ready_qualities
+        if all_failed:
+            # Failing a re-encode leaves a published video as it was
+            video_status = None if replacing else 'draft'
+        else:
+            video_status = 'published'
+        finalized = DatabaseService.finalize_video_qualities(
+            video_id=video_id,
+            updates=quality_updates,
+            default_quality=CompressionService._pick_default_quality(ready_qualities + kept_qualities),
+            video_status=video_status
+        )
+        if not finalized:
+            # A progressively published video stays playable with what already landed
+            if not published[0] and not replacing:
+                DatabaseService.update_video_status(video_id, 'draft')
+            return {'success': False, 'error': 'Could not save compression results', 'results': results}
+        if not all_failed and not published[0] and not replacing:
+            TIME_TO_FIRST_PLAYABLE.observe((datetime.now() - processing_start).total_seconds())
         if all_failed:
-            DatabaseService.update_video_status(video_id, 'draft')
             return {'success': False, 'error': 'All compressions failed', 'results': results}
         else:
-            DatabaseService.update_video_status(video_id, 'published')
-            return {'success': True, 'results': results}
+            return {'success': True, 'results': results, 'video_info': video_info, 'manifests': manifests}
+    
+    @staticmethod
+    def _package_streams(video_id: UUID, input_filename: str, qualities: List[str],
+                         video_info: Dict) -> List[Dict]:
+        """
+        Package ready renditions as HLS/DASH, upload the package and record its manifests.
+        
+        Args:
+            video_id: Video database ID
+            input_filename: Source filename, used for the rendition and S3 names
+            qualities: Ready qualities, lowest first
+            video_info: Probed source metadata
+        
+        Returns:
+            The saved manifest rows (empty if packaging was skipped or failed;
+            the progressive renditions are unaffected either way)
+        """
+        base_name = os.path.splitext(input_filename)[0]
+        completed_dir = os.path.join(settings.COMPLETED_DIR, str(video_id))
+        
+        # Renditions kept from an earlier attempt are packaged too, as long as their file is still local
+        renditions = [
+            {'quality': quality, 'path': os.path.join(completed_dir, f"{base_name}_{quality}.mp4")}
+            for quality in qualities
+        ]
+        renditions = [r for r in renditions if os.path.exists(r['path'])]
+        if not renditions:
+            logger.warning(f"No local renditions to package for video {video_id} "
+                           f"(STREAM_TO_S3 without KEEP_LOCAL_COPY?)")
+            return []
+        
+        package_dir = os.path.join(completed_dir, f"{base_name}_stream")
+        shutil.rmtree(package_dir, ignore_errors=True)
+        package = StreamPackager.package(renditions, package_dir, video_info)
+        if not package:
+            return []
+        
+        base_url = S3Service.upload_stream_package(package_dir, video_id, input_filename)
+        if not base_url:
+            logger.warning(f"Stream package upload failed for video {video_id}, manifests not published")
+            return []
+        
+        manifests = [
+            {
+                'format': fmt,
+                'url': f"{base_url}/{manifest}",
+                'qualities': package['qualities'],
+                'segment_duration': package['segment_duration']
+            }
+            for fmt, manifest in package['manifests'].items()
+        ]
+        if not DatabaseService.save_video_manifests(video_id, manifests):
+            return []
+        return manifests
+    
+    @staticmethod
+    def _complexity_factor(video_id: UUID, input_path: str, video_info: Dict) -> Optional[float]:
+        """Complexity factor for a video: the stored one for this source, else a fresh analysis."""
+        filename = os.path.basename(input_path)
+        stored = DatabaseService.get_video_complexity(video_id, filename)
+        if stored is not None:
+            return stored
+        
+        analysis = ComplexityAnalyzer.analyze(input_path, video_info)
+        if not analysis:
+            return None
+        DatabaseService.save_video_complexity(video_id, filename, analysis)
+        return analysis['complexity']
+    
+    @staticmethod
+    def _first_playable_quality(qualities: List[str]) -> str:
+        """Quality encoded first in progressive mode: PROGRESSIVE_FIRST_QUALITY or the closest one below it."""
+        target = get_quality_config(settings.PROGRESSIVE_FIRST_QUALITY)
+        if target:
+            candidates = [
+                quality for quality in qualities
+                if get_quality_config(quality) and get_quality_config(quality)['height'] <= target['height']
+            ]
+            if candidates:
+                return candidates[-1]
+        return qualities[0]
+    
+    @staticmethod
+    def _pick_default_quality(ready_qualities: List[str]) -> Optional[str]:
+        if not ready_qualities:
+            return None
+        preferred_defaults = ['720p', '1080p', '480p', '360p']
+        for pref in preferred_defaults:
+            if pref in ready_qualities:
+                return pref
+        return ready_qualities[0]
+    
+    @staticmethod
+    def _rendition_update(quality: str, quality_record: VideoQuality,
+                          compression_result: Optional[Dict], pending_upload: Optional[Future],
+                          streamed: bool, video_info: Dict) -> Tuple[Dict, Dict]:
+        """
+        Wait for a rendition's upload and build its video_qualities update.
+        
+        Returns:
+            (update for finalize_video_qualities, entry for the results list)
+        """
+        temp_url = quality_record.url
+        
+        # A rendition streamed to S3 without a local copy has nothing to fall back to
+        if (compression_result and compression_result.get('success')
+                and streamed and not compression_result.get('url')
+                and not settings.KEEP_LOCAL_COPY):
+            logger.error(f"Streaming {quality} to S3 failed and no local copy was kept")
+            compression_result = None
+        
+        if not (compression_result and compression_result.get('success')):
+            return (
+                {'quality_id': quality_record.id, 'status': 'failed'},
+                {'quality': quality, 'status': 'failed'}
+            )
+        
+        BYTES_IN.labels(quality=quality).inc(video_info.get('file_size') or 0)
+        BYTES_OUT.labels(quality=quality).inc(compression_result['file_size'])
+        s3_url = compression_result.get('url') or UploadPipeline.result(pending_upload, quality)
+        if s3_url:
+            video_quality_url = s3_url
+            logger.info(f"Uploaded {quality} to S3: {s3_url}")
+        else:
+            # Fallback to local URL if S3 upload fails
+            video_quality_url = temp_url
+            logger.warning(f"S3 upload failed for {quality}, using local URL")
+        
+        update = {
+            'quality_id': quality_record.id,
+            'url': video_quality_url,
+            'file_size': compression_result['file_size'],
+            'bitrate': compression_result['bitrate'],
+            'resolution_width': compression_result['width'],
+            'resolution_height': compression_result['height'],
+            'codec': compression_result['codec'],
+            'container': compression_result['container'],
+            'duration': video_info.get('duration'),
+            'status': 'ready',
+            'fps': compression_result.get('fps'),
+            'pixel_format': compression_result.get('pixel_format'),
+            'color_space': compression_result.get('color_space'),
+            'color_range': compression_result.get('color_range'),
+            'audio_codec': compression_result.get('audio_codec'),
+            'audio_bitrate': compression_result.get('audio_bitrate'),
+            'audio_sample_rate': compression_result.get('audio_sample_rate'),
+            'audio_channels': compression_result.get('audio_channels'),
+            'aspect_ratio': compression_result.get('aspect_ratio'),
+            'frame_count': compression_result.get('frame_count'),
+            'encoding_time': compression_result.get('encoding_time'),
+            'processing_completed_at': datetime.now()
+        }
+        return update, {
+            'quality': quality,
+            'status': 'ready',
+            'file_size': compression_result['file_size']
+        }
+    
+    @staticmethod
+    def _needs_stream_package() -> bool:
+        """Whether processed videos get an HLS/DASH package, which identical-source reuse cannot copy."""
+        return settings.ADAPTIVE_STREAMING and bool(StreamPackager.formats())
     
     @staticmethod
-    def process_pending_video(video_id: UUID, filename: str, video_url_base: str) -> Dict:
+    def reuse_identical_source(video_id: UUID, filename: str, fingerprint: str) -> Optional[Dict]:
+        """
+        Publish a video by copying the renditions of an earlier, byte-identical upload.
+        
+        Renditions are copied server-side in S3 and their rows cloned in one
+        transaction, so nothing is encoded or uploaded. With adaptive streaming
+        on the video also needs its own HLS/DASH package and manifests, which are
+        not copied, so it is encoded normally instead.
+        
+        Args:
+            video_id: Video being processed
+            filename: Its original filename
+            fingerprint: SHA-256 of its source file
+        
+        Returns:
+            Processing result dict, or None if there is nothing to reuse and
+            the video should be encoded normally
+        """
+        if CompressionService._needs_stream_package():
+            return None
+        
+        match = DatabaseService.get_source_fingerprint(fingerprint)
+        if not match or str(match['video_id']) == str(video_id):
+            return None
+        
+        source_video_id = match['video_id']
+        source_qualities = [
+            vq for vq in DatabaseService.get_video_qualities(source_video_id)
+            if vq.status == 'ready'
+        ]
+        if not source_qualities:
+            return None
+        
+        urls = {}
+        for vq in source_qualities:
+            url = S3Service.copy_file(source_video_id, match['filename'], video_id, filename, vq.quality)
+            if not url:
+                # Partial reuse would leave a ladder that differs from a normal encode
+                logger.warning(f"Could not copy {vq.quality} from video {source_video_id}, encoding instead")
+                return None
+            urls[vq.quality] = url
+        
+        copied = DatabaseService.copy_video_qualities(
+            source_video_id, video_id, urls, video_status='published'
+        )
+        if not copied:
+            return None
+        
+        logger.info(f"Video {video_id} is identical to {source_video_id}; reused {copied} renditions")
+        return {
+            'success': True,
+            'deduplicated_from': str(source_video_id),
+            'results': [
+                {'quality': vq.quality, 'status': 'ready', 'file_size': vq.file_size}
+                for vq in source_qualities if vq.quality != 'original'
+            ]
+        }
+    
+    @staticmethod
+    def process_pending_video(video_id: UUID, filename: str, video_url_base: str,
+                              segmented: Optional[bool] = None,
+                              job_id: Optional[UUID] = None, force: bool = False) -> Dict:
         input_path = os.path.join(settings.PENDING_DIR, filename)
         
         if not os.path.exists(input_path):
             return {'success': False, 'error': f'Video file not found: {input_path}'}
         
         try:
+            # Identical re-uploads skip encoding entirely, unless a re-encode was forced
+            # or the video needs a stream package of its own
+            fingerprint = file_sha256(input_path) if settings.SOURCE_DEDUP_ENABLED else None
+            if fingerprint and not force and not CompressionService._needs_stream_package():
+                reused = CompressionService.reuse_identical_source(video_id, filename, fingerprint)
+                if reused:
+                    return reused
+                if job_id:
+                    # An identical upload of another video is encoding right now; wait and reuse it
+                    owner = DatabaseService.claim_job_fingerprint(job_id, fingerprint)
+                    if owner:
+                        return {
+                            'success': False,
+                            'deferred': True,
+                            'error': f'Identical source is being processed by job {owner}'
+                        }
+            
+            # A retry keeps an original that already made it to S3
+            original_state = DatabaseService.get_video_quality_states(
+                video_id, settings.JOB_LEASE_TIMEOUT
+            ).get('original')
+            original_done = (
+                not force and original_state is not None and original_state['status'] == 'ready'
+                and S3Service.file_exists(video_id, filename, 'original')
+            )
+            
+            # Upload the original straight from the pending directory while the ladder encodes,
+            # but only once the video has passed its checks so a rejected attempt uploads nothing
+            original_upload = []
+            
+            def start_original_upload() -> None:
+                original_upload.append(UploadPipeline.submit(input_path, video_id, filename, 'original'))
+            
             result = CompressionService.process_video_qualities(
                 video_id=video_id,
                 input_path=input_path,
-                video_url_base=video_url_base
+                video_url_base=video_url_base,
+                segmented=segmented,
+                on_start=None if original_done else start_original_upload,
+                job_id=job_id,
+                force=force
             )
             
             if result.get('success'):
-                completed_dir = os.path.join(settings.COMPLETED_DIR, str(video_id))
-                os.makedirs(completed_dir, exist_ok=True)
-                original_output = os.path.join(completed_dir, filename)
-                
-                if not os.path.exists(original_output):
-                    shutil.copy2(input_path, original_output)
+                # The source was already probed for the ladder; the original is byte-identical
+                original_info = result.get('video_info') or get_video_info(input_path)
+                original_in_s3 = original_done
                 
-                # Upload original to S3
-                original_s3_url = S3Service.upload_file(original_output, video_id, filename, 'original')
-                if not original_s3_url:
-                    # Fallback to local URL if S3 upload fails
-                    original_url = f"{video_url_base}/{str(video_id)}/{filename}"
-                    logger.warning("S3 upload failed for original, using local URL")
-                else:
-                    original_url = original_s3_url
-                
-                original_info = get_video_info(original_output)
-                if original_info:
-                    original_quality = DatabaseService.create_video_quality(
-                        video_id=video_id,
-                        quality='original',
-                        url=original_url,
-                        file_size=original_info.get('file_size'),
-                        bitrate=original_info.get('bitrate'),
-                        resolution_width=original_info.get('width'),
-                        resolution_height=original_info.get('height'),
-                        codec=original_info.get('codec'),
-                        container=original_info.get('container'),
-                        duration=original_info.get('duration'),
-                        status='ready',
-                        processing_started_at=datetime.now()
+                if not original_done:
+                    original_s3_url = UploadPipeline.result(
+                        original_upload[0] if original_upload else None, 'original'
                     )
-                    if original_quality:
-                        DatabaseService.update_video_quality(
-                            quality_id=original_quality.id,
-                            fps=original_info.get('fps'),
-                            pixel_format=original_info.get('pixel_format'),
-                            color_space=original_info.get('color_space'),
-                            color_range=original_info.get('color_range'),
-                            audio_codec=original_info.get('audio_codec'),
-                            audio_bitrate=original_info.get('audio_bitrate'),
-                            audio_sample_rate=original_info.get('audio_sample_rate'),
-                            audio_channels=original_info.get('audio_channels'),
-                            aspect_ratio=original_info.get('aspect_ratio'),
-                            frame_count=original_info.get('frame_count'),
-                            processing_completed_at=datetime.now()
+                    if not original_s3_url:
+                        # Fallback to local URL if S3 upload fails
+                        original_url = f"{video_url_base}/{str(video_id)}/{filename}"
+                        logger.warning("S3 upload failed for original, using local URL")
+                    else:
+                        original_url = original_s3_url
+                        original_in_s3 = True
+                    
+                    # Zero-disk mode keeps no local original unless it is needed as the fallback URL
+                    if not original_s3_url or not settings.STREAM_TO_S3 or settings.KEEP_LOCAL_COPY:
+                        completed_dir = os.path.join(settings.COMPLETED_DIR, str(video_id))
+                        os.makedirs(completed_dir, exist_ok=True)
+                        # The upload has finished reading the source, so it is safe to move it now
+                        method = link_or_copy(
+                            input_path, os.path.join(completed_dir, filename),
+                            allow_rename=settings.MOVE_ORIGINAL
                         )
+                        logger.info(f"Placed original of video {video_id} in completed directory ({method})")
+                    
+                    if original_info:
+                        DatabaseService.create_video_qualities(video_id, [{
+                            'quality': 'original',
+                            'url': original_url,
+                            'file_size': original_info.get('file_size'),
+                            'bitrate': original_info.get('bitrate'),
+                            'resolution_width': original_info.get('width'),
+                            'resolution_height': original_info.get('height'),
+                            'codec': original_info.get('codec'),
+                            'container': original_info.get('container'),
+                            'duration': original_info.get('duration'),
+                            'status': 'ready',
+                            'fps': original_info.get('fps'),
+                            'pixel_format': original_info.get('pixel_format'),
+                            'color_space': original_info.get('color_space'),
+                            'color_range': original_info.get('color_range'),
+                            'audio_codec': original_info.get('audio_codec'),
+                            'audio_bitrate': original_info.get('audio_bitrate'),
+                            'audio_sample_rate': original_info.get('audio_sample_rate'),
+                            'audio_channels': original_info.get('audio_channels'),
+                            'aspect_ratio': original_info.get('aspect_ratio'),
+                            'frame_count': original_info.get('frame_count'),
+                            'processing_completed_at': datetime.now()
+                        }])
+                
+                # Only a complete ladder that made it to S3 can be reused for identical uploads
+                if (fingerprint and original_in_s3
+                        and all(r.get('status') == 'ready' for r in result.get('results', []))):
+                    DatabaseService.save_source_fingerprint(
+                        fingerprint, video_id, filename,
+                        original_info.get('file_size') if original_info else None
+                    )
             
             return result
         except Exception as e:
             logger.error(f"Error processing video {video_id}: {e}")
-            DatabaseService.update_video_status(video_id, 'draft')
+            DatabaseService.release_video_qualities(video_id)
+            # A forced re-encode of a published video keeps its previous renditions
+            video = DatabaseService.get_video_by_id(video_id) if force else None
+            if not (video and video.status == 'published'):
+                DatabaseService.update_video_status(video_id, 'draft')
             return {'success': False, 'error': str(e)}
     
     @staticmethod
@@ -355,6 +1476,7 @@ class CompressionService:
         
         Args:
             video_tasks: List of dicts with keys: video_id, filename, video_url_base
+                and optionally segmented and force
             max_workers: Maximum number of parallel workers (default: 4)
         
         Returns:
@@ -372,7 +1494,9 @@ class CompressionService:
                 result = CompressionService.process_pending_video(
                     video_id=task['video_id'],
                     filename=task['filename'],
-                    video_url_base=task.get('video_url_base', 'https://example.com/videos')
+                    video_url_base=task.get('video_url_base', 'https://example.com/videos'),
+                    segmented=task.get('segmented'),
+                    force=task.get('force', False)
                 )
                 return {
                     'video_id': str(task['video_id']),
@@ -391,6 +1515,9 @@ class CompressionService:
                     'qualities': []
                 }
         
+        # Encodes are admitted by EncodeScheduler; extra workers would only queue
+        max_workers = max(1, min(max_workers, settings.MAX_BATCH_WORKERS))
+        
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             future_to_task = {
                 executor.submit(process_single, task): task 
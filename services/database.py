@@ -1,17 +1,45 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from psycopg2.pool import ThreadedConnectionPool
-from typing import Optional, List, Dict, Any
+from psycopg2.extras import RealDictCursor, execute_batch, execute_values
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 import logging
 from uuid import UUID
 from datetime import datetime
 
 from app.config import settings
+from app.metrics import (
+    DB_POOL_EXHAUSTED,
+    DB_POOL_IN_USE,
+    DB_POOL_SIZE,
+    timed_db_write,
+)
 from models.video import Video, VideoQuality
+from models.job import Job
 
 logger = logging.getLogger(__name__)
 
 
+def load_tenant_weights() -> Dict[str, float]:
+    """Parse JOB_USER_WEIGHTS ("user_id:weight,...") into user_id -> weight, skipping invalid entries."""
+    weights = {}
+    for entry in settings.JOB_USER_WEIGHTS.split(','):
+        if not entry.strip():
+            continue
+        try:
+            user_id, weight = entry.split(':')
+            weight = float(weight)
+            if weight <= 0:
+                raise ValueError("weight must be positive")
+            weights[str(UUID(user_id.strip()))] = weight
+        except ValueError as e:
+            logger.warning(f"Ignoring JOB_USER_WEIGHTS entry {entry.strip()!r}: {e}")
+    return weights
+
+
+TENANT_WEIGHTS = load_tenant_weights()
+
+
 class DatabaseService:
     _pool: Optional[ThreadedConnectionPool] = None
     
@@ -27,23 +55,55 @@ class DatabaseService:
                 password=settings.POSTGRES_PASSWORD,
                 database=settings.POSTGRES_DB
             )
+            DB_POOL_SIZE.set(cls._pool.maxconn)
         return cls._pool
     
     @classmethod
     def get_connection(cls):
         pool = cls.get_pool()
-        return pool.getconn()
+        try:
+            # getconn never waits: it hands out a connection or raises PoolError at maxconn
+            conn = pool.getconn()
+        except PoolError:
+            DB_POOL_EXHAUSTED.inc()
+            raise
+        finally:
+            DB_POOL_IN_USE.set(len(pool._used))
+        return conn
     
     @classmethod
     def put_connection(cls, conn):
         pool = cls.get_pool()
-        pool.putconn(conn)
+        try:
+            pool.putconn(conn)
+        finally:
+            DB_POOL_IN_USE.set(len(pool._used))
     
     @classmethod
     def close_all(cls):
         if cls._pool:
             cls._pool.closeall()
             cls._pool = None
+            DB_POOL_IN_USE.set(0)
+    
+    @classmethod
+    @contextmanager
+    def transaction(cls) -> Iterator:
+        """
+        Check out one connection and yield a cursor whose statements commit together.
+        
+        Any exception rolls the whole transaction back and is re-raised.
+        """
+        conn = cls.get_connection()
+        try:
+            with conn.cursor() as cur:
+                yield cur
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cls.put_connection(conn)
     
     @staticmethod
     def get_video_by_id(video_id: UUID) -> Optional[Video]:
@@ -71,6 +131,7 @@ class DatabaseService:
             DatabaseService.put_connection(conn)
     
     @staticmethod
+    @timed_db_write
     def create_video_quality(video_id: UUID, quality: str, url: str, 
                             file_size: Optional[int] = None,
                             bitrate: Optional[int] = None,
@@ -112,7 +173,166 @@ class DatabaseService:
         finally:
             DatabaseService.put_connection(conn)
     
+    # Columns a rendition row can be written with; None leaves a column untouched on update
+    _QUALITY_FIELDS = [
+        'url', 'file_size', 'bitrate', 'resolution_width', 'resolution_height',
+        'codec', 'container', 'duration', 'status', 'fps', 'pixel_format',
+        'color_space', 'color_range', 'audio_codec', 'audio_bitrate',
+        'audio_sample_rate', 'audio_channels', 'aspect_ratio', 'frame_count',
+        'encoding_time', 'processing_started_at', 'processing_completed_at'
+    ]
+    
+    @staticmethod
+    @timed_db_write
+    def create_video_qualities(video_id: UUID, qualities: List[Dict[str, Any]],
+                               keep_ready: bool = False) -> Dict[str, VideoQuality]:
+        """
+        Create the rows for a whole rendition ladder with one multi-row insert.
+        
+        Existing rows for the same quality (left by an interrupted attempt) are
+        reset and reused, so retries never duplicate renditions.
+        
+        Args:
+            video_id: Video the renditions belong to
+            qualities: One dict per row with 'quality' plus any of _QUALITY_FIELDS;
+                status defaults to 'processing' and processing_started_at to now
+            keep_ready: Leave existing 'ready' rows (URL, status, default) as they
+                are, for finalize_video_qualities to replace, so a published video
+                stays playable while it is re-encoded
+        
+        Returns:
+            Created or reused rows keyed by quality, or an empty dict if the insert failed
+        """
+        if not qualities:
+            return {}
+        
+        now = datetime.now()
+        columns = ['video_id', 'quality'] + DatabaseService._QUALITY_FIELDS
+        # A reused row takes the new values wholesale; it only stays default if it is ready
+        if keep_ready:
+            assignments = ', '.join(
+                f"{field} = CASE WHEN video_qualities.status = 'ready' "
+                f"THEN video_qualities.{field} ELSE EXCLUDED.{field} END"
+                for field in DatabaseService._QUALITY_FIELDS
+            )
+            keep_default = "(video_qualities.status = 'ready' OR EXCLUDED.status = 'ready')"
+        else:
+            assignments = ', '.join(f"{field} = EXCLUDED.{field}" for field in DatabaseService._QUALITY_FIELDS)
+            keep_default = "EXCLUDED.status = 'ready'"
+        rows = []
+        for quality in qualities:
+            values = {'status': 'processing', 'processing_started_at': now}
+            values.update({k: v for k, v in quality.items() if v is not None})
+            rows.append(
+                [str(video_id), values['quality']]
+                + [values.get(field) for field in DatabaseService._QUALITY_FIELDS]
+            )
+        
+        try:
+            with DatabaseService.transaction() as cur:
+                created = execute_values(
+                    cur,
+                    f"""
+                    INSERT INTO video_qualities ({', '.join(columns)})
+                    VALUES %s
+                    ON CONFLICT (video_id, quality) DO UPDATE
+                    SET {assignments},
+                        is_default = video_qualities.is_default AND {keep_default},
+                        progress_percent = NULL,
+                        encode_fps = NULL,
+                        encode_speed = NULL,
+                        eta_seconds = NULL,
+                        progress_updated_at = NULL
+                    RETURNING id, video_id, quality, url, file_size, bitrate, 
+                              resolution_width, resolution_height, codec, container, 
+                              duration, is_default, status, created_at, updated_at
+                    """,
+                    rows,
+                    fetch=True
+                )
+            return {row[2]: VideoQuality.from_db_row(row) for row in created}
+        except Exception as e:
+            logger.error(f"Error creating video qualities for {video_id}: {e}")
+            return {}
+    
     @staticmethod
+    @timed_db_write
+    def finalize_video_qualities(video_id: UUID, updates: List[Dict[str, Any]],
+                                 default_quality: Optional[str] = None,
+                                 video_status: Optional[str] = None) -> bool:
+        """
+        Apply rendition results, the default quality and the video status in one transaction.
+        
+        Readers never see a published video without a default, or a default
+        pointing at a rendition that is not ready yet.
+        
+        Args:
+            video_id: Video the renditions belong to
+            updates: One dict per rendition with 'quality_id' plus any of _QUALITY_FIELDS
+            default_quality: Quality to mark as default; ignored unless that row is ready
+            video_status: New videos.status, or None to leave it unchanged
+        
+        Returns:
+            True if the transaction committed
+        """
+        fields = DatabaseService._QUALITY_FIELDS
+        assignments = ', '.join(f"{field} = COALESCE(%({field})s, {field})" for field in fields)
+        
+        try:
+            with DatabaseService.transaction() as cur:
+                if updates:
+                    execute_batch(
+                        cur,
+                        f"""
+                        UPDATE video_qualities
+                        SET {assignments}
+                        WHERE id = %(quality_id)s
+                        """,
+                        [
+                            {**dict.fromkeys(fields), **update, 'quality_id': str(update['quality_id'])}
+                            for update in updates
+                        ]
+                    )
+                
+                if default_quality:
+                    # Clear first: the one-default unique index is checked row by row
+                    cur.execute(
+                        """
+                        UPDATE video_qualities
+                        SET is_default = false
+                        WHERE video_id = %s AND is_default = true AND quality <> %s
+                          AND EXISTS (
+                              SELECT 1 FROM video_qualities
+                              WHERE video_id = %s AND quality = %s AND status = 'ready'
+                          )
+                        """,
+                        (str(video_id), default_quality, str(video_id), default_quality)
+                    )
+                    cur.execute(
+                        """
+                        UPDATE video_qualities
+                        SET is_default = true
+                        WHERE video_id = %s AND quality = %s AND status = 'ready'
+                        """,
+                        (str(video_id), default_quality)
+                    )
+                
+                if video_status:
+                    cur.execute(
+                        """
+                        UPDATE videos
+                        SET status = %s
+                        WHERE id = %s
+                        """,
+                        (video_status, str(video_id))
+                    )
+            return True
+        except Exception as e:
+            logger.error(f"Error finalizing video qualities for {video_id}: {e}")
+            return False
+    
+    @staticmethod
+    @timed_db_write
     def update_video_quality_status(quality_id: UUID, status: str) -> bool:
         conn = DatabaseService.get_connection()
         try:
@@ -135,6 +355,7 @@ class DatabaseService:
             DatabaseService.put_connection(conn)
     
     @staticmethod
+    @timed_db_write
     def update_video_quality(quality_id: UUID, url: Optional[str] = None,
                             file_size: Optional[int] = None,
                             bitrate: Optional[int] = None,
@@ -246,6 +467,72 @@ class DatabaseService:
         finally:
             DatabaseService.put_connection(conn)
     
+    @staticmethod
+    @timed_db_write
+    def update_video_qualities_progress(quality_ids: List[UUID],
+                                        progress_percent: Optional[float] = None,
+                                        encode_fps: Optional[float] = None,
+                                        encode_speed: Optional[float] = None,
+                                        eta_seconds: Optional[int] = None) -> bool:
+        if not quality_ids:
+            return False
+        
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE video_qualities
+                    SET progress_percent = %s,
+                        encode_fps = %s,
+                        encode_speed = %s,
+                        eta_seconds = %s,
+                        progress_updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ANY(%s::uuid[])
+                    """,
+                    (progress_percent, encode_fps, encode_speed, eta_seconds,
+                     [str(quality_id) for quality_id in quality_ids])
+                )
+                conn.commit()
+                return cur.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error updating video quality progress: {e}")
+            conn.rollback()
+            return False
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    def get_video_qualities_progress(video_id: UUID) -> Dict[str, Dict[str, Any]]:
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT quality, progress_percent, encode_fps, encode_speed,
+                           eta_seconds, progress_updated_at
+                    FROM video_qualities
+                    WHERE video_id = %s AND status = 'processing'
+                    """,
+                    (str(video_id),)
+                )
+                return {
+                    row[0]: {
+                        'percent': float(row[1]) if row[1] is not None else None,
+                        'fps': float(row[2]) if row[2] is not None else None,
+                        'speed': float(row[3]) if row[3] is not None else None,
+                        'eta_seconds': row[4],
+                        'updated_at': row[5].isoformat() if row[5] else None
+                    }
+                    for row in cur.fetchall()
+                }
+        except Exception as e:
+            logger.error(f"Error fetching video quality progress: {e}")
+            conn.rollback()
+            return {}
+        finally:
+            DatabaseService.put_connection(conn)
+    
     @staticmethod
     def get_video_qualities(video_id: UUID) -> List[VideoQuality]:
         conn = DatabaseService.get_connection()
@@ -283,6 +570,98 @@ class DatabaseService:
             DatabaseService.put_connection(conn)
     
     @staticmethod
+    def get_video_quality_states(video_id: UUID, lease_seconds: int) -> Dict[str, Dict[str, Any]]:
+        """
+        Current rows of a video, for resuming an interrupted attempt.
+        
+        Args:
+            video_id: Video to inspect
+            lease_seconds: A 'processing' row untouched for longer than this is
+                considered abandoned (progress writes keep live rows fresh)
+        
+        Returns:
+            Dict keyed by quality with status, file_size and 'active' (True for a
+            'processing' row still within its lease)
+        """
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT quality, status, file_size,
+                           status = 'processing'
+                           AND updated_at >= CURRENT_TIMESTAMP - (%s * INTERVAL '1 second')
+                    FROM video_qualities
+                    WHERE video_id = %s
+                    """,
+                    (lease_seconds, str(video_id))
+                )
+                return {
+                    row[0]: {'status': row[1], 'file_size': row[2], 'active': row[3]}
+                    for row in cur.fetchall()
+                }
+        except Exception as e:
+            logger.error(f"Error fetching video quality states: {e}")
+            conn.rollback()
+            return {}
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    @timed_db_write
+    def fail_stale_video_qualities(lease_seconds: int) -> int:
+        """Mark abandoned 'processing' rows failed when no job is left to finish them."""
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE video_qualities vq
+                    SET status = 'failed'
+                    WHERE vq.status = 'processing'
+                      AND vq.updated_at < CURRENT_TIMESTAMP - (%s * INTERVAL '1 second')
+                      AND NOT EXISTS (
+                          SELECT 1 FROM jobs j
+                          WHERE j.video_id = vq.video_id AND j.status IN ('queued', 'running')
+                      )
+                    """,
+                    (lease_seconds,)
+                )
+                conn.commit()
+                return cur.rowcount
+        except Exception as e:
+            logger.error(f"Error failing stale video qualities: {e}")
+            conn.rollback()
+            return 0
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    @timed_db_write
+    def release_video_qualities(video_id: UUID) -> int:
+        """Mark a video's 'processing' rows failed after its attempt aborted, so a retry can reclaim them at once."""
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE video_qualities
+                    SET status = 'failed'
+                    WHERE video_id = %s AND status = 'processing'
+                    """,
+                    (str(video_id),)
+                )
+                conn.commit()
+                return cur.rowcount
+        except Exception as e:
+            logger.error(f"Error releasing video qualities for {video_id}: {e}")
+            conn.rollback()
+            return 0
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    @timed_db_write
     def update_video_status(video_id: UUID, status: str) -> bool:
         conn = DatabaseService.get_connection()
         try:
@@ -305,6 +684,7 @@ class DatabaseService:
             DatabaseService.put_connection(conn)
     
     @staticmethod
+    @timed_db_write
     def set_default_quality(video_id: UUID, quality_id: UUID) -> bool:
         conn = DatabaseService.get_connection()
         try:
@@ -334,4 +714,567 @@ class DatabaseService:
             return False
         finally:
             DatabaseService.put_connection(conn)
-
+    
+    @staticmethod
+    def get_source_fingerprint(fingerprint: str) -> Optional[Dict[str, Any]]:
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT video_id, filename, file_size
+                    FROM source_fingerprints
+                    WHERE fingerprint = %s
+                    """,
+                    (fingerprint,)
+                )
+                row = cur.fetchone()
+                if row:
+                    return {'video_id': row[0], 'filename': row[1], 'file_size': row[2]}
+                return None
+        except Exception as e:
+            logger.error(f"Error fetching source fingerprint: {e}")
+            conn.rollback()
+            return None
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    @timed_db_write
+    def save_source_fingerprint(fingerprint: str, video_id: UUID, filename: str,
+                                file_size: Optional[int] = None) -> bool:
+        """Point a fingerprint at the latest video processed from that content."""
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO source_fingerprints (fingerprint, video_id, filename, file_size)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (fingerprint) DO UPDATE
+                    SET video_id = EXCLUDED.video_id,
+                        filename = EXCLUDED.filename,
+                        file_size = EXCLUDED.file_size
+                    """,
+                    (fingerprint, str(video_id), filename, file_size)
+                )
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error saving source fingerprint: {e}")
+            conn.rollback()
+            return False
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    @timed_db_write
+    def copy_video_qualities(source_video_id: UUID, video_id: UUID, urls: Dict[str, str],
+                             video_status: Optional[str] = None) -> int:
+        """
+        Clone the ready renditions of one video onto another in one transaction.
+        
+        All metadata (including which quality is the default) is copied in SQL;
+        only the URLs differ, since each video has its own S3 objects.
+        
+        Args:
+            source_video_id: Video whose renditions are copied
+            video_id: Video receiving the rows
+            urls: New URL for each quality to copy; other qualities are skipped
+            video_status: New videos.status, or None to leave it unchanged
+        
+        Returns:
+            Number of rows created (0 on error)
+        """
+        copied_fields = [
+            field for field in DatabaseService._QUALITY_FIELDS
+            if field not in ('url', 'status', 'processing_started_at', 'processing_completed_at')
+        ]
+        columns = ', '.join(copied_fields)
+        source_columns = ', '.join(f'vq.{field}' for field in copied_fields)
+        
+        assignments = ', '.join(
+            f"{field} = EXCLUDED.{field}"
+            for field in ['url'] + copied_fields
+            + ['is_default', 'status', 'processing_started_at', 'processing_completed_at']
+        )
+        
+        try:
+            with DatabaseService.transaction() as cur:
+                # Rows left by an interrupted attempt are overwritten; clear their
+                # default first since the one-default index is checked row by row
+                cur.execute(
+                    """
+                    UPDATE video_qualities
+                    SET is_default = false
+                    WHERE video_id = %s AND is_default = true
+                    """,
+                    (str(video_id),)
+                )
+                cur.execute(
+                    f"""
+                    INSERT INTO video_qualities
+                    (video_id, quality, url, {columns}, is_default, status,
+                     processing_started_at, processing_completed_at)
+                    SELECT %s, vq.quality, u.url, {source_columns}, vq.is_default, 'ready',
+                           CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+                    FROM video_qualities vq
+                    JOIN unnest(%s::text[], %s::text[]) AS u(quality, url) ON u.quality = vq.quality
+                    WHERE vq.video_id = %s AND vq.status = 'ready'
+                    ON CONFLICT (video_id, quality) DO UPDATE
+                    SET {assignments}
+                    """,
+                    (str(video_id), list(urls.keys()), list(urls.values()), str(source_video_id))
+                )
+                copied = cur.rowcount
+                
+                if video_status:
+                    cur.execute(
+                        """
+                        UPDATE videos
+                        SET status = %s
+                        WHERE id = %s
+                        """,
+                        (video_status, str(video_id))
+                    )
+            return copied
+        except Exception as e:
+            logger.error(f"Error copying qualities from {source_video_id} to {video_id}: {e}")
+            return 0
+    
+    @staticmethod
+    def get_video_complexity(video_id: UUID, filename: str) -> Optional[float]:
+        """Stored complexity factor of a video, if it was analysed from the same source file."""
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT complexity
+                    FROM video_complexity
+                    WHERE video_id = %s AND filename = %s
+                    """,
+                    (str(video_id), filename)
+                )
+                row = cur.fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Error fetching video complexity: {e}")
+            conn.rollback()
+            return None
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    @timed_db_write
+    def save_video_complexity(video_id: UUID, filename: str, analysis: Dict[str, Any]) -> bool:
+        """
+        Store the result of ComplexityAnalyzer.analyze() for a video.
+        
+        Args:
+            video_id: Video identifier
+            filename: Source file the analysis was run on
+            analysis: Dict with complexity, bits_per_pixel, samples and analysis_time
+        """
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO video_complexity (video_id, filename, complexity, bits_per_pixel,
+                                                  samples, analysis_time)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (video_id) DO UPDATE
+                    SET filename = EXCLUDED.filename,
+                        complexity = EXCLUDED.complexity,
+                        bits_per_pixel = EXCLUDED.bits_per_pixel,
+                        samples = EXCLUDED.samples,
+                        analysis_time = EXCLUDED.analysis_time
+                    """,
+                    (str(video_id), filename, analysis['complexity'], analysis.get('bits_per_pixel'),
+                     analysis.get('samples'), analysis.get('analysis_time'))
+                )
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error saving video complexity: {e}")
+            conn.rollback()
+            return False
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    def save_video_manifests(video_id: UUID, manifests: List[Dict[str, Any]]) -> bool:
+        """
+        Store a video's adaptive-streaming manifests, replacing earlier ones of the same format.
+        
+        Args:
+            video_id: Video identifier
+            manifests: Dicts with format ('hls' or 'dash'), url, qualities and segment_duration
+        """
+        if not manifests:
+            return True
+        
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO video_manifests (video_id, format, url, qualities, segment_duration)
+                    VALUES %s
+                    ON CONFLICT (video_id, format) DO UPDATE
+                    SET url = EXCLUDED.url,
+                        qualities = EXCLUDED.qualities,
+                        segment_duration = EXCLUDED.segment_duration
+                    """,
+                    [
+                        (str(video_id), m['format'], m['url'], m['qualities'], m.get('segment_duration'))
+                        for m in manifests
+                    ]
+                )
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error saving video manifests: {e}")
+            conn.rollback()
+            return False
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    _JOB_COLUMNS = """
+        id, video_id, filename, video_url_base, segmented, status, attempts,
+        max_attempts, error, worker_id, run_after, locked_at, completed_at,
+        created_at, updated_at, user_id, priority, force
+    """
+    
+    @staticmethod
+    @timed_db_write
+    def enqueue_job(video_id: UUID, filename: str, video_url_base: str,
+                    segmented: Optional[bool] = None, user_id: Optional[UUID] = None,
+                    priority: int = 0, force: bool = False) -> Tuple[Optional[Job], bool]:
+        """
+        Queue a compression job, coalescing onto the video's active job if there is one.
+        
+        Args:
+            video_id: Video to process
+            filename: Source file in the pending directory
+            video_url_base: Base URL for locally served renditions
+            segmented: Force segmented encoding on or off (None = automatic)
+            user_id: Owner of the video, the tenant the job is scheduled under
+            priority: Higher values are claimed first
+            force: Re-encode everything, ignoring ready renditions and identical
+                sources; also applied to an already queued job it coalesces onto
+        
+        Returns:
+            (job, created): the new or already queued/running job and whether it
+            was created by this call; (None, False) on error
+        """
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                # The active job can finish between the conflict and the lookup; retry once
+                for _ in range(2):
+                    cur.execute(
+                        f"""
+                        INSERT INTO jobs (video_id, filename, video_url_base, segmented, max_attempts,
+                                          user_id, priority, force)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                        ON CONFLICT (video_id) WHERE status IN ('queued', 'running') DO NOTHING
+                        RETURNING {DatabaseService._JOB_COLUMNS}
+                        """,
+                        (str(video_id), filename, video_url_base, segmented,
+                         settings.JOB_MAX_ATTEMPTS, str(user_id) if user_id else None, priority, force)
+                    )
+                    row = cur.fetchone()
+                    if row:
+                        conn.commit()
+                        return Job.from_db_row(row), True
+                    
+                    if force:
+                        # A job that has not started yet picks the force up; a running one is left alone
+                        cur.execute(
+                            "UPDATE jobs SET force = true WHERE video_id = %s AND status = 'queued'",
+                            (str(video_id),)
+                        )
+                    
+                    cur.execute(
+                        f"""
+                        SELECT {DatabaseService._JOB_COLUMNS}
+                        FROM jobs
+                        WHERE video_id = %s AND status IN ('queued', 'running')
+                        """,
+                        (str(video_id),)
+                    )
+                    row = cur.fetchone()
+                    conn.commit()
+                    if row:
+                        return Job.from_db_row(row), False
+                return None, False
+        except Exception as e:
+            logger.error(f"Error enqueueing job for video {video_id}: {e}")
+            conn.rollback()
+            return None, False
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    @timed_db_write
+    def claim_job(worker_id: str) -> Optional[Job]:
+        """
+        Atomically claim the next job; concurrent workers skip locked rows.
+        
+        Jobs are taken by priority, then from the owner with the fewest running
+        jobs per unit of JOB_USER_WEIGHTS weight (so tenants share workers in
+        proportion to their weight), then oldest first. Owners already at
+        JOB_MAX_RUNNING_PER_USER (scaled by their weight) are skipped.
+        """
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                if settings.JOB_MAX_RUNNING_PER_USER > 0:
+                    # Claims are serialised so concurrent workers can't overshoot the cap
+                    cur.execute("SELECT pg_advisory_xact_lock(hashtext('jobs_claim'))")
+                cur.execute(
+                    f"""
+                    UPDATE jobs
+                    SET status = 'running',
+                        attempts = attempts + 1,
+                        worker_id = %s,
+                        locked_at = CURRENT_TIMESTAMP
+                    WHERE id = (
+                        WITH running AS (
+                            SELECT user_id, COUNT(*) AS jobs
+                            FROM jobs
+                            WHERE status = 'running'
+                            GROUP BY user_id
+                        )
+                        SELECT j.id FROM jobs j
+                        LEFT JOIN running r ON r.user_id IS NOT DISTINCT FROM j.user_id
+                        LEFT JOIN unnest(%s::uuid[], %s::real[]) AS w(user_id, weight)
+                            ON w.user_id = j.user_id
+                        WHERE j.status = 'queued' AND j.run_after <= CURRENT_TIMESTAMP
+                          AND (%s = 0 OR COALESCE(r.jobs, 0) < %s * COALESCE(w.weight, 1))
+                        ORDER BY j.priority DESC,
+                                 COALESCE(r.jobs, 0) / COALESCE(w.weight, 1),
+                                 j.created_at
+                        FOR UPDATE OF j SKIP LOCKED
+                        LIMIT 1
+                    )
+                    RETURNING {DatabaseService._JOB_COLUMNS}
+                    """,
+                    (worker_id, list(TENANT_WEIGHTS), list(TENANT_WEIGHTS.values()),
+                     settings.JOB_MAX_RUNNING_PER_USER, settings.JOB_MAX_RUNNING_PER_USER)
+                )
+                row = cur.fetchone()
+                conn.commit()
+                if row:
+                    return Job.from_db_row(row)
+                return None
+        except Exception as e:
+            logger.error(f"Error claiming job: {e}")
+            conn.rollback()
+            return None
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    @timed_db_write
+    def heartbeat_job(job_id: UUID) -> bool:
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE jobs
+                    SET locked_at = CURRENT_TIMESTAMP
+                    WHERE id = %s AND status = 'running'
+                    """,
+                    (str(job_id),)
+                )
+                conn.commit()
+                return cur.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error updating job heartbeat: {e}")
+            conn.rollback()
+            return False
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    @timed_db_write
+    def complete_job(job_id: UUID) -> bool:
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE jobs
+                    SET status = 'completed',
+                        error = NULL,
+                        completed_at = CURRENT_TIMESTAMP
+                    WHERE id = %s
+                    """,
+                    (str(job_id),)
+                )
+                conn.commit()
+                return cur.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error completing job: {e}")
+            conn.rollback()
+            return False
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    @timed_db_write
+    def fail_job(job_id: UUID, error: str, retry_delay: int = 0) -> bool:
+        """Record a failure; the job is re-queued after retry_delay seconds until max_attempts is reached."""
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE jobs
+                    SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+                        error = %s,
+                        worker_id = NULL,
+                        locked_at = NULL,
+                        run_after = CURRENT_TIMESTAMP + (%s * INTERVAL '1 second'),
+                        completed_at = CASE WHEN attempts < max_attempts THEN NULL ELSE CURRENT_TIMESTAMP END
+                    WHERE id = %s
+                    """,
+                    (error, retry_delay, str(job_id))
+                )
+                conn.commit()
+                return cur.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error failing job: {e}")
+            conn.rollback()
+            return False
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    @timed_db_write
+    def defer_job(job_id: UUID, reason: str, delay: int) -> bool:
+        """Put a running job back in the queue without using up one of its attempts."""
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE jobs
+                    SET status = 'queued',
+                        attempts = GREATEST(attempts - 1, 0),
+                        error = %s,
+                        worker_id = NULL,
+                        locked_at = NULL,
+                        run_after = CURRENT_TIMESTAMP + (%s * INTERVAL '1 second')
+                    WHERE id = %s AND status = 'running'
+                    """,
+                    (reason, delay, str(job_id))
+                )
+                conn.commit()
+                return cur.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error deferring job: {e}")
+            conn.rollback()
+            return False
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    @timed_db_write
+    def claim_job_fingerprint(job_id: UUID, fingerprint: str) -> Optional[UUID]:
+        """
+        Record the source fingerprint of a running job unless another running job
+        is already processing identical content.
+        
+        Args:
+            job_id: Job that has just hashed its source
+            fingerprint: SHA-256 of the source file
+        
+        Returns:
+            ID of the running job that owns the fingerprint, or None if this job
+            now owns it (or on error, so processing goes ahead)
+        """
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                # Serialise jobs hashing the same content so exactly one of them wins
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (fingerprint,))
+                cur.execute(
+                    """
+                    SELECT id FROM jobs
+                    WHERE fingerprint = %s AND status = 'running' AND id <> %s
+                    LIMIT 1
+                    """,
+                    (fingerprint, str(job_id))
+                )
+                row = cur.fetchone()
+                if not row:
+                    cur.execute(
+                        "UPDATE jobs SET fingerprint = %s WHERE id = %s",
+                        (fingerprint, str(job_id))
+                    )
+                conn.commit()
+                return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Error claiming source fingerprint for job {job_id}: {e}")
+            conn.rollback()
+            return None
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    @timed_db_write
+    def requeue_stale_jobs(lease_seconds: int) -> int:
+        """Return running jobs whose worker stopped heart-beating to the queue."""
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE jobs
+                    SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+                        error = 'Worker lease expired',
+                        worker_id = NULL,
+                        locked_at = NULL
+                    WHERE status = 'running'
+                      AND locked_at < CURRENT_TIMESTAMP - (%s * INTERVAL '1 second')
+                    """,
+                    (lease_seconds,)
+                )
+                conn.commit()
+                return cur.rowcount
+        except Exception as e:
+            logger.error(f"Error requeueing stale jobs: {e}")
+            conn.rollback()
+            return 0
+        finally:
+            DatabaseService.put_connection(conn)
+    
+    @staticmethod
+    def get_job(job_id: UUID) -> Optional[Job]:
+        conn = DatabaseService.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""
+                    SELECT {DatabaseService._JOB_COLUMNS}
+                    FROM jobs
+                    WHERE id = %s
+                    """,
+                    (str(job_id),)
+                )
+                row = cur.fetchone()
+                if row:
+                    return Job.from_db_row(row)
+                return None
+        except Exception as e:
+            logger.error(f"Error fetching job {job_id}: {e}")
+            conn.rollback()
+            return None
+        finally:
+            DatabaseService.put_connection(conn)
@@ -0,0 +1,91 @@
+import os
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EncodeScheduler:
+    """
+    Process-wide admission control for ffmpeg encodes.
+    
+    Owns a CPU budget (ENCODE_CPU_BUDGET, default: all cores) and hands each
+    encode a thread count sized to its output resolution, shrinking grants when
+    the budget is nearly used up. At most MAX_CONCURRENT_ENCODES encodes run at
+    once regardless of how many jobs or batch workers are waiting.
+    """
+    _condition = threading.Condition()
+    _threads_in_use: int = 0
+    _active_encodes: int = 0
+    
+    # Max output pixels -> encoder threads; x264 gains little beyond these on small frames
+    _THREADS_BY_PIXELS = [
+        (426 * 240, 1),
+        (640 * 360, 2),
+        (854 * 480, 3),
+        (1280 * 720, 4),
+        (1920 * 1080, 6),
+        (2560 * 1440, 8),
+    ]
+    _MAX_THREADS = 12
+    
+    @classmethod
+    def get_cpu_budget(cls) -> int:
+        return settings.ENCODE_CPU_BUDGET or os.cpu_count() or 1
+    
+    @classmethod
+    def get_max_concurrent_encodes(cls) -> int:
+        return settings.MAX_CONCURRENT_ENCODES or max(1, cls.get_cpu_budget() // 4)
+    
+    @classmethod
+    def threads_for(cls, width: int, height: int) -> int:
+        pixels = width * height
+        for max_pixels, threads in cls._THREADS_BY_PIXELS:
+            if pixels <= max_pixels:
+                return threads
+        return cls._MAX_THREADS
+    
+    @classmethod
+    @contextmanager
+    def slot(cls, wanted_threads: int) -> Iterator[int]:
+        """
+        Block until an encode may start, then yield the number of threads it may use.
+        
+        Args:
+            wanted_threads: Threads the encode would ideally use
+        """
+        budget = cls.get_cpu_budget()
+        wanted = max(1, min(wanted_threads, budget))
+        
+        with cls._condition:
+            while (cls._active_encodes >= cls.get_max_concurrent_encodes()
+                   or budget - cls._threads_in_use < 1):
+                cls._condition.wait()
+            
+            granted = min(wanted, budget - cls._threads_in_use)
+            cls._threads_in_use += granted
+            cls._active_encodes += 1
+        
+        logger.debug(f"Encode slot granted {granted}/{wanted} threads "
+                     f"({cls._threads_in_use}/{budget} in use)")
+        try:
+            yield granted
+        finally:
+            with cls._condition:
+                cls._threads_in_use -= granted
+                cls._active_encodes -= 1
+                cls._condition.notify_all()
+    
+    @classmethod
+    def get_stats(cls) -> Dict:
+        with cls._condition:
+            return {
+                'cpu_budget': cls.get_cpu_budget(),
+                'threads_in_use': cls._threads_in_use,
+                'active_encodes': cls._active_encodes,
+                'max_concurrent_encodes': cls.get_max_concurrent_encodes()
+            }
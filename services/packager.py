@@ -0,0 +1,133 @@
+import os
+import time
+import subprocess
+import logging
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.metrics import PACKAGING_SECONDS
+from utils.ffmpeg_utils import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+
+class StreamPackager:
+    """
+    Adaptive-streaming packaging of the encoded renditions.
+    
+    The rendition MP4s are remuxed (no re-encode) into fragmented MP4
+    segments with one init segment per rendition. The DASH manifest and the
+    HLS master/media playlists all point at the same segments, so serving
+    both formats costs no extra storage. Segment boundaries line up across
+    renditions because every rendition is encoded with keyframes forced on
+    the same ADAPTIVE_SEGMENT_DURATION grid.
+    """
+    DASH_MANIFEST = 'manifest.mpd'
+    HLS_MASTER = 'master.m3u8'
+    
+    @staticmethod
+    def formats() -> List[str]:
+        """Configured output formats, in ADAPTIVE_STREAMING_FORMATS order."""
+        return [
+            fmt.strip() for fmt in settings.ADAPTIVE_STREAMING_FORMATS.split(',')
+            if fmt.strip() in ('hls', 'dash')
+        ]
+    
+    @staticmethod
+    def build_package_cmd(renditions: List[Dict], output_dir: str, formats: List[str],
+                          segment_duration: float, include_audio: bool = True) -> List[str]:
+        """
+        Build the ffmpeg command that segments every rendition in one run.
+        
+        Args:
+            renditions: Dicts with quality and path, lowest quality first
+            output_dir: Directory for the manifests and segments
+            formats: Any of 'hls' and 'dash'
+            segment_duration: Target segment length in seconds
+            include_audio: Package one audio track, taken from the first rendition
+        """
+        cmd = ['ffmpeg']
+        for rendition in renditions:
+            cmd.extend(['-i', rendition['path']])
+        for i in range(len(renditions)):
+            cmd.extend(['-map', f'{i}:v:0'])
+        
+        # Every rendition carries the same audio, so a single audio representation serves them all
+        adaptation_sets = 'id=0,streams=v'
+        if include_audio:
+            cmd.extend(['-map', '0:a:0'])
+            adaptation_sets += ' id=1,streams=a'
+        
+        cmd.extend([
+            '-c', 'copy',
+            '-f', 'dash',
+            '-seg_duration', str(segment_duration),
+            '-use_template', '1',
+            '-use_timeline', '1',
+            '-dash_segment_type', 'mp4',
+            '-init_seg_name', 'init_$RepresentationID$.m4s',
+            '-media_seg_name', 'chunk_$RepresentationID$_$Number%05d$.m4s',
+            '-adaptation_sets', adaptation_sets
+        ])
+        if 'hls' in formats:
+            cmd.extend(['-hls_playlist', '1', '-hls_master_name', StreamPackager.HLS_MASTER])
+        cmd.extend(['-y', os.path.join(output_dir, StreamPackager.DASH_MANIFEST)])
+        return cmd
+    
+    @staticmethod
+    def package(renditions: List[Dict], output_dir: str, source_info: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Package encoded renditions as fMP4 HLS and/or DASH.
+        
+        Args:
+            renditions: Dicts with quality and path (local rendition MP4), lowest quality first
+            output_dir: Directory for the manifests and segments
+            source_info: Probed source metadata (duration, audio_codec)
+        
+        Returns:
+            Dict with manifests (format -> manifest path relative to
+            output_dir), qualities, segment_duration and packaging_time, or
+            None if packaging failed
+        """
+        formats = StreamPackager.formats()
+        if not formats or not renditions:
+            return None
+        
+        source_info = source_info or {}
+        segment_duration = settings.ADAPTIVE_SEGMENT_DURATION
+        os.makedirs(output_dir, exist_ok=True)
+        cmd = StreamPackager.build_package_cmd(
+            renditions, output_dir, formats, segment_duration,
+            include_audio=bool(source_info.get('audio_codec'))
+        )
+        
+        start = time.time()
+        try:
+            run_ffmpeg(cmd, duration=source_info.get('duration'))
+        except subprocess.CalledProcessError as e:
+            logger.error(f"FFmpeg packaging error for {output_dir}: {e.stderr}")
+            return None
+        except Exception as e:
+            logger.error(f"Packaging error for {output_dir}: {e}")
+            return None
+        elapsed = time.time() - start
+        PACKAGING_SECONDS.observe(elapsed)
+        
+        manifests = {}
+        if 'hls' in formats:
+            manifests['hls'] = StreamPackager.HLS_MASTER
+        if 'dash' in formats:
+            manifests['dash'] = StreamPackager.DASH_MANIFEST
+        else:
+            # The DASH manifest is still written (it drives the segmenting) but not published
+            os.remove(os.path.join(output_dir, StreamPackager.DASH_MANIFEST))
+        
+        qualities = [r['quality'] for r in renditions]
+        logger.info(f"Packaged {', '.join(qualities)} as {', '.join(manifests)} "
+                    f"({segment_duration}s segments) in {elapsed:.1f}s")
+        return {
+            'manifests': manifests,
+            'qualities': qualities,
+            'segment_duration': segment_duration,
+            'packaging_time': round(elapsed, 2)
+        }
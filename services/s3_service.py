@@ -1,17 +1,34 @@
 import boto3
 import os
 import logging
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Optional
 from uuid import UUID
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError, BotoCoreError
 
 from app.config import settings
+from app.metrics import S3_UPLOAD_SECONDS
 
 logger = logging.getLogger(__name__)
 
 
+MB = 1024 * 1024
+
+# Manifests are uploaded last so a player never sees a playlist whose segments are still missing
+STREAM_CONTENT_TYPES = {
+    '.m4s': 'video/iso.segment',
+    '.mp4': 'video/mp4',
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.mpd': 'application/dash+xml'
+}
+MANIFEST_EXTENSIONS = ('.m3u8', '.mpd')
+
+
 class S3Service:
     _client: Optional[boto3.client] = None
+    _transfer_config: Optional[TransferConfig] = None
     
     @classmethod
     def get_client(cls):
@@ -25,10 +42,37 @@ class S3Service:
                 's3',
                 aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
                 aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_REGION
+                region_name=settings.AWS_REGION,
+                endpoint_url=settings.AWS_S3_ENDPOINT_URL or None,
+                # Enough connections for every uploader thread's multipart parts
+                config=Config(
+                    max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                    retries={'max_attempts': 5, 'mode': 'adaptive'},
+                    # S3-compatible stand-ins generally don't support virtual-hosted buckets
+                    s3={'addressing_style': 'path'} if settings.AWS_S3_ENDPOINT_URL else None
+                )
             )
         return cls._client
     
+    @classmethod
+    def get_transfer_config(cls) -> TransferConfig:
+        """Get multipart transfer settings tuned for large MP4 files."""
+        if cls._transfer_config is None:
+            cls._transfer_config = TransferConfig(
+                multipart_threshold=settings.S3_MULTIPART_THRESHOLD_MB * MB,
+                multipart_chunksize=settings.S3_MULTIPART_CHUNKSIZE_MB * MB,
+                max_concurrency=settings.S3_MAX_CONCURRENCY,
+                use_threads=True
+            )
+        return cls._transfer_config
+    
+    @staticmethod
+    def get_s3_key(video_id: UUID, filename: str, quality: str) -> str:
+        """Build the S3 key: videos/{video_id}/{filename}_{quality}.mp4"""
+        file_extension = os.path.splitext(filename)[1] or '.mp4'
+        base_filename = os.path.splitext(filename)[0]
+        return f"{settings.AWS_S3_VIDEOS_PREFIX}/{str(video_id)}/{base_filename}_{quality}{file_extension}"
+    
     @staticmethod
     def upload_file(local_file_path: str, video_id: UUID, filename: str, quality: str) -> Optional[str]:
         """
@@ -52,28 +96,27 @@ class S3Service:
             logger.error("S3 client not available")
             return None
         
-        # Generate S3 key: videos/{video_id}/{filename}_{quality}.mp4
-        file_extension = os.path.splitext(filename)[1] or '.mp4'
-        base_filename = os.path.splitext(filename)[0]
-        s3_key = f"{settings.AWS_S3_VIDEOS_PREFIX}/{str(video_id)}/{base_filename}_{quality}{file_extension}"
+        s3_key = S3Service.get_s3_key(video_id, filename, quality)
         
         try:
             # Upload file with public-read ACL
-            client.upload_file(
-                local_file_path,
-                settings.AWS_S3_BUCKET,
-                s3_key,
-                ExtraArgs={
-                    'ACL': 'public-read',
-                    'ContentType': 'video/mp4'
-                }
-            )
+            with S3_UPLOAD_SECONDS.labels(quality=quality, method='file').time():
+                client.upload_file(
+                    local_file_path,
+                    settings.AWS_S3_BUCKET,
+                    s3_key,
+                    ExtraArgs={
+                        'ACL': 'public-read',
+                        'ContentType': 'video/mp4'
+                    },
+                    Config=S3Service.get_transfer_config()
+                )
             
             # Generate public URL
             s3_url = f"{settings.AWS_S3_BASE_URL}/{s3_key}"
             logger.info(f"Successfully uploaded {s3_key} to S3")
             return s3_url
-            
+        
         except ClientError as e:
             logger.error(f"Error uploading {s3_key} to S3: {e}")
             return None
@@ -84,6 +127,109 @@ class S3Service:
             logger.error(f"Unexpected error uploading to S3: {e}")
             return None
     
+    @staticmethod
+    def upload_stream(stream: BinaryIO, video_id: UUID, filename: str, quality: str) -> Optional[str]:
+        """
+        Upload a non-seekable byte stream to S3 as a multipart upload.
+        
+        Parts are uploaded as they fill, so the whole file never needs to
+        exist on disk or in memory. If reading the stream raises, the
+        multipart upload is aborted and nothing is written to the key.
+        
+        Args:
+            stream: Object with a read() method, e.g. an ffmpeg output pipe
+            video_id: Video UUID
+            filename: Original filename
+            quality: Quality level (e.g., '720p')
+        
+        Returns:
+            S3 URL if successful, None otherwise
+        """
+        client = S3Service.get_client()
+        if not client:
+            logger.error("S3 client not available")
+            return None
+        
+        s3_key = S3Service.get_s3_key(video_id, filename, quality)
+        
+        try:
+            with S3_UPLOAD_SECONDS.labels(quality=quality, method='stream').time():
+                client.upload_fileobj(
+                    stream,
+                    settings.AWS_S3_BUCKET,
+                    s3_key,
+                    ExtraArgs={
+                        'ACL': 'public-read',
+                        'ContentType': 'video/mp4'
+                    },
+                    Config=S3Service.get_transfer_config()
+                )
+            
+            s3_url = f"{settings.AWS_S3_BASE_URL}/{s3_key}"
+            logger.info(f"Successfully streamed {s3_key} to S3")
+            return s3_url
+        
+        except ClientError as e:
+            logger.error(f"Error streaming {s3_key} to S3: {e}")
+            return None
+        except BotoCoreError as e:
+            logger.error(f"BotoCore error streaming to S3: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error streaming {s3_key} to S3: {e}")
+            return None
+    
+    @staticmethod
+    def copy_file(source_video_id: UUID, source_filename: str, video_id: UUID,
+                  filename: str, quality: str) -> Optional[str]:
+        """
+        Copy another video's rendition to this video's key without downloading it.
+        
+        Uses a server-side (multipart for large objects) copy, so the bytes never
+        leave S3.
+        
+        Args:
+            source_video_id: Video UUID the rendition belongs to
+            source_filename: Original filename of the source video
+            video_id: Video UUID to copy to
+            filename: Original filename of the target video
+            quality: Quality level
+        
+        Returns:
+            S3 URL of the copy if successful, None otherwise
+        """
+        client = S3Service.get_client()
+        if not client:
+            logger.error("S3 client not available")
+            return None
+        
+        source_key = S3Service.get_s3_key(source_video_id, source_filename, quality)
+        s3_key = S3Service.get_s3_key(video_id, filename, quality)
+        
+        try:
+            with S3_UPLOAD_SECONDS.labels(quality=quality, method='copy').time():
+                client.copy(
+                    {'Bucket': settings.AWS_S3_BUCKET, 'Key': source_key},
+                    settings.AWS_S3_BUCKET,
+                    s3_key,
+                    ExtraArgs={
+                        'ACL': 'public-read',
+                        'ContentType': 'video/mp4'
+                    },
+                    Config=S3Service.get_transfer_config()
+                )
+            
+            s3_url = f"{settings.AWS_S3_BASE_URL}/{s3_key}"
+            logger.info(f"Successfully copied {source_key} to {s3_key}")
+            return s3_url
+        
+        except ClientError as e:
+            logger.error(f"Error copying {source_key} to {s3_key}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error copying {source_key} in S3: {e}")
+            return None
+    
     @staticmethod
     def delete_file(video_id: UUID, filename: str, quality: str) -> bool:
         """
@@ -101,9 +247,7 @@ class S3Service:
         if not client:
             return False
         
-        file_extension = os.path.splitext(filename)[1] or '.mp4'
-        base_filename = os.path.splitext(filename)[0]
-        s3_key = f"{settings.AWS_S3_VIDEOS_PREFIX}/{str(video_id)}/{base_filename}_{quality}{file_extension}"
+        s3_key = S3Service.get_s3_key(video_id, filename, quality)
         
         try:
             client.delete_object(
@@ -136,9 +280,7 @@ class S3Service:
         if not client:
             return False
         
-        file_extension = os.path.splitext(filename)[1] or '.mp4'
-        base_filename = os.path.splitext(filename)[0]
-        s3_key = f"{settings.AWS_S3_VIDEOS_PREFIX}/{str(video_id)}/{base_filename}_{quality}{file_extension}"
+        s3_key = S3Service.get_s3_key(video_id, filename, quality)
         
         try:
             client.head_object(
@@ -154,4 +296,133 @@ class S3Service:
         except Exception as e:
             logger.error(f"Unexpected error checking S3 file: {e}")
             return False
+    
+    @staticmethod
+    def get_stream_prefix(video_id: UUID, filename: str) -> str:
+        """Build the S3 key prefix for packaged streams: videos/{video_id}/{filename}_stream"""
+        base_filename = os.path.splitext(filename)[0]
+        return f"{settings.AWS_S3_VIDEOS_PREFIX}/{str(video_id)}/{base_filename}_stream"
+    
+    @staticmethod
+    def upload_stream_package(local_dir: str, video_id: UUID, filename: str) -> Optional[str]:
+        """
+        Upload a packaged HLS/DASH directory (segments, init segments and manifests) to S3.
+        
+        Segments are uploaded in parallel (S3_MAX_CONCURRENCY at a time) and the
+        manifests only once every segment has landed.
+        
+        Args:
+            local_dir: Directory written by StreamPackager.package()
+            video_id: Video UUID
+            filename: Original filename
+        
+        Returns:
+            Base S3 URL of the package (manifest URLs are relative to it) if
+            successful, None otherwise
+        """
+        client = S3Service.get_client()
+        if not client:
+            logger.error("S3 client not available")
+            return None
+        
+        prefix = S3Service.get_stream_prefix(video_id, filename)
+        names = sorted(os.listdir(local_dir))
+        segments = [name for name in names if not name.endswith(MANIFEST_EXTENSIONS)]
+        manifests = [name for name in names if name.endswith(MANIFEST_EXTENSIONS)]
+        
+        def upload(name: str) -> None:
+            client.upload_file(
+                os.path.join(local_dir, name),
+                settings.AWS_S3_BUCKET,
+                f"{prefix}/{name}",
+                ExtraArgs={
+                    'ACL': 'public-read',
+                    'ContentType': STREAM_CONTENT_TYPES.get(
+                        os.path.splitext(name)[1], 'application/octet-stream'
+                    )
+                }
+            )
+        
+        try:
+            with S3_UPLOAD_SECONDS.labels(quality='stream', method='package').time():
+                with ThreadPoolExecutor(max_workers=max(1, settings.S3_MAX_CONCURRENCY),
+                                        thread_name_prefix="s3-package") as executor:
+                    # list() re-raises the first failed upload
+                    list(executor.map(upload, segments))
+                for name in manifests:
+                    upload(name)
+            
+            s3_url = f"{settings.AWS_S3_BASE_URL}/{prefix}"
+            logger.info(f"Successfully uploaded {len(names)} stream file(s) to {prefix}")
+            return s3_url
+        
+        except ClientError as e:
+            logger.error(f"Error uploading stream package to {prefix}: {e}")
+            return None
+        except BotoCoreError as e:
+            logger.error(f"BotoCore error uploading stream package: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error uploading stream package to {prefix}: {e}")
+            return None
+
+
+class _CountingReader:
+    """Wraps a stream, counting bytes read and optionally copying them to a local file."""
+    
+    def __init__(self, stream: BinaryIO, copy_to: Optional[BinaryIO] = None):
+        self._stream = stream
+        self._copy_to = copy_to
+        self.bytes_read = 0
+        self.eof = False
+    
+    def read(self, size: int = -1) -> bytes:
+        try:
+            data = self._stream.read(size)
+        except Exception:
+            # The producer failed; there is nothing left worth draining
+            self.eof = True
+            raise
+        if not data:
+            self.eof = True
+            return data
+        self.bytes_read += len(data)
+        if self._copy_to:
+            self._copy_to.write(data)
+        return data
 
+
+class S3StreamUpload:
+    """
+    Output sink that streams one ffmpeg output straight into S3.
+    
+    Pass instances to run_ffmpeg() as output sinks. Once ffmpeg finishes,
+    `url` holds the S3 URL (None if the upload failed) and `file_size` the
+    number of bytes produced. When local_copy_path is set the bytes are
+    also written there.
+    """
+    
+    def __init__(self, video_id: UUID, filename: str, quality: str,
+                 local_copy_path: Optional[str] = None):
+        self.video_id = video_id
+        self.filename = filename
+        self.quality = quality
+        self.local_copy_path = local_copy_path
+        self.url: Optional[str] = None
+        self.file_size: Optional[int] = None
+    
+    def __call__(self, stream: BinaryIO) -> Optional[str]:
+        local_copy = open(self.local_copy_path, 'wb') if self.local_copy_path else None
+        try:
+            reader = _CountingReader(stream, local_copy)
+            self.url = S3Service.upload_stream(reader, self.video_id, self.filename, self.quality)
+            
+            # Keep draining after a failed upload so ffmpeg can finish the other outputs
+            while not reader.eof:
+                reader.read(1024 * 1024)
+            
+            self.file_size = reader.bytes_read
+            return self.url
+        finally:
+            if local_copy:
+                local_copy.close()
@@ -0,0 +1,98 @@
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+from uuid import UUID
+
+from app.config import settings
+from app.metrics import UPLOAD_QUEUE_DEPTH
+from services.s3_service import S3Service
+
+logger = logging.getLogger(__name__)
+
+
+class UploadPipeline:
+    """
+    Process-wide S3 upload queue served by a pool of uploader threads.
+    
+    Encoders hand finished files to submit() and carry on; each upload
+    resolves a Future with the S3 URL (or None on failure). At most
+    UPLOAD_WORKERS uploads run at once and UPLOAD_QUEUE_SIZE more may wait,
+    after which submit() blocks so encoders cannot outrun the network
+    indefinitely.
+    """
+    _lock = threading.Lock()
+    _executor: Optional[ThreadPoolExecutor] = None
+    _slots: Optional[threading.BoundedSemaphore] = None
+    _pending: int = 0
+    
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        with cls._lock:
+            if cls._executor is None:
+                workers = max(1, settings.UPLOAD_WORKERS)
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=workers,
+                    thread_name_prefix="s3-upload"
+                )
+                cls._slots = threading.BoundedSemaphore(workers + max(0, settings.UPLOAD_QUEUE_SIZE))
+            return cls._executor
+    
+    @classmethod
+    def _upload(cls, local_file_path: str, video_id: UUID, filename: str, quality: str) -> Optional[str]:
+        try:
+            return S3Service.upload_file(local_file_path, video_id, filename, quality)
+        finally:
+            with cls._lock:
+                cls._pending -= 1
+            UPLOAD_QUEUE_DEPTH.dec()
+            cls._slots.release()
+    
+    @classmethod
+    def submit(cls, local_file_path: str, video_id: UUID, filename: str, quality: str) -> Future:
+        """
+        Queue a file for upload, blocking while the queue is full.
+        
+        Args:
+            local_file_path: Path to local file
+            video_id: Video UUID
+            filename: Original filename
+            quality: Quality level (e.g., '720p', 'original')
+        
+        Returns:
+            Future resolving to the S3 URL, or None if the upload failed
+        """
+        executor = cls.get_executor()
+        cls._slots.acquire()
+        with cls._lock:
+            cls._pending += 1
+        UPLOAD_QUEUE_DEPTH.inc()
+        logger.debug(f"Queued {quality} upload for video {video_id}")
+        return executor.submit(cls._upload, local_file_path, video_id, filename, quality)
+    
+    @staticmethod
+    def result(future: Optional[Future], quality: str) -> Optional[str]:
+        """Wait for an upload and return its S3 URL, logging instead of raising on failure."""
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            logger.error(f"Upload of {quality} failed: {e}")
+            return None
+    
+    @classmethod
+    def get_stats(cls) -> Dict:
+        with cls._lock:
+            return {
+                'upload_workers': max(1, settings.UPLOAD_WORKERS),
+                'pending_uploads': cls._pending
+            }
+    
+    @classmethod
+    def shutdown(cls) -> None:
+        with cls._lock:
+            executor = cls._executor
+            cls._executor = None
+        if executor:
+            executor.shutdown(wait=True)
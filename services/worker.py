@@ -0,0 +1,147 @@
+"""
+Compression worker: pulls jobs from the Postgres queue and processes them.
+
+Usage:
+    python -m services.worker [--concurrency N] [--poll-interval SECONDS]
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+from typing import Optional
+
+from prometheus_client import multiprocess, start_http_server
+
+from app.config import settings
+from app.metrics import get_registry
+from models.job import Job
+from services.database import DatabaseService
+from services.compression import CompressionService
+from services.upload_pipeline import UploadPipeline
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    
+    def __init__(self, concurrency: int, poll_interval: float):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+    
+    def stop(self) -> None:
+        logger.info("Stopping worker after in-flight jobs finish")
+        self._stop.set()
+    
+    def _heartbeat(self, job: Job, done: threading.Event) -> None:
+        interval = max(settings.JOB_LEASE_TIMEOUT / 3, 1)
+        while not done.wait(interval):
+            DatabaseService.heartbeat_job(job.id)
+    
+    def process_job(self, job: Job) -> None:
+        logger.info(f"Processing job {job.id} for video {job.video_id} (attempt {job.attempts})")
+        
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, done), daemon=True)
+        heartbeat.start()
+        
+        try:
+            result = CompressionService.process_pending_video(
+                video_id=job.video_id,
+                filename=job.filename,
+                video_url_base=job.video_url_base,
+                segmented=job.segmented,
+                job_id=job.id,
+                force=job.force
+            )
+            if result.get('success'):
+                DatabaseService.complete_job(job.id)
+                logger.info(f"Completed job {job.id}")
+            elif result.get('deferred'):
+                DatabaseService.defer_job(job.id, result['error'], settings.JOB_RETRY_DELAY)
+                logger.info(f"Deferred job {job.id}: {result['error']}")
+            else:
+                error = result.get('error') or 'Processing failed'
+                DatabaseService.fail_job(job.id, error, retry_delay=settings.JOB_RETRY_DELAY)
+                logger.warning(f"Job {job.id} failed: {error}")
+        except Exception as e:
+            logger.error(f"Error processing job {job.id}: {e}")
+            DatabaseService.fail_job(job.id, str(e), retry_delay=settings.JOB_RETRY_DELAY)
+        finally:
+            done.set()
+            heartbeat.join()
+    
+    def _run_loop(self) -> None:
+        while not self._stop.is_set():
+            job: Optional[Job] = DatabaseService.claim_job(self.worker_id)
+            if not job:
+                self._stop.wait(self.poll_interval)
+                continue
+            self.process_job(job)
+    
+    def _reap_stale_jobs(self) -> None:
+        while not self._stop.wait(settings.JOB_LEASE_TIMEOUT):
+            requeued = DatabaseService.requeue_stale_jobs(settings.JOB_LEASE_TIMEOUT)
+            if requeued:
+                logger.warning(f"Re-queued {requeued} job(s) with expired leases")
+            # Renditions of videos whose jobs gave up would otherwise stay 'processing' forever
+            abandoned = DatabaseService.fail_stale_video_qualities(settings.JOB_LEASE_TIMEOUT)
+            if abandoned:
+                logger.warning(f"Marked {abandoned} abandoned rendition(s) failed")
+    
+    def run(self) -> None:
+        logger.info(f"Worker {self.worker_id} started with concurrency {self.concurrency}")
+        
+        threads = [
+            threading.Thread(target=self._run_loop, name=f"worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        threads.append(threading.Thread(target=self._reap_stale_jobs, name="reaper", daemon=True))
+        
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            if not thread.daemon:
+                thread.join()
+        
+        UploadPipeline.shutdown()
+        DatabaseService.close_all()
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            # Drop this process's live gauges from the API's aggregated /metrics
+            multiprocess.mark_process_dead(os.getpid())
+        logger.info(f"Worker {self.worker_id} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lambrk compression worker")
+    parser.add_argument('--concurrency', type=int, default=settings.WORKER_CONCURRENCY,
+                        help="Number of jobs processed at once")
+    parser.add_argument('--poll-interval', type=float, default=settings.WORKER_POLL_INTERVAL,
+                        help="Seconds to wait when the queue is empty")
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=getattr(logging, settings.LOG_LEVEL),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+    
+    if settings.WORKER_METRICS_PORT:
+        start_http_server(settings.WORKER_METRICS_PORT, registry=get_registry())
+        logger.info(f"Serving worker metrics on port {settings.WORKER_METRICS_PORT}")
+    
+    worker = Worker(concurrency=args.concurrency, poll_interval=args.poll_interval)
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: worker.stop())
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,30 @@ cd "$PROJECT_DIR" || exit 1
 
 echo -e "${YELLOW}=== Stopping Lambrk Compression Service ===${NC}\n"
 
+# Stop the compression worker first so it can finish in-flight jobs
+if [ -f "compression_worker.pid" ]; then
+    WORKER_PID=$(cat compression_worker.pid)
+    if ps -p "$WORKER_PID" > /dev/null 2>&1; then
+        echo -e "${YELLOW}Stopping worker with PID: $WORKER_PID${NC}"
+        kill "$WORKER_PID"
+        
+        # The worker stops after its current jobs finish
+        for i in {1..30}; do
+            if ! ps -p "$WORKER_PID" > /dev/null 2>&1; then
+                break
+            fi
+            sleep 1
+        done
+        
+        if ps -p "$WORKER_PID" > /dev/null 2>&1; then
+            echo -e "${YELLOW}Worker did not stop gracefully, force killing...${NC}"
+            kill -9 "$WORKER_PID"
+        fi
+        echo -e "${GREEN}✓ Worker stopped${NC}"
+    fi
+    rm -f compression_worker.pid
+fi
+
 # Check if PID file exists
 if [ ! -f "compression_service.pid" ]; then
     echo -e "${YELLOW}⚠ PID file not found. Service may not be running.${NC}"
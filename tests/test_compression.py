@@ -0,0 +1,52 @@
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+from app.config import settings
+from models.video import VideoQuality
+from services.compression import CompressionService
+from services.database import DatabaseService
+from services.s3_service import S3Service
+
+
+def _ready_quality(video_id, quality):
+    now = datetime.now()
+    return VideoQuality(
+        id=uuid4(), video_id=video_id, quality=quality, url=f'https://cdn/{quality}.mp4',
+        file_size=100, bitrate=None, resolution_width=None, resolution_height=None,
+        codec=None, container=None, duration=None, is_default=quality == '720p',
+        status='ready', created_at=now, updated_at=now
+    )
+
+
+def _reuse(monkeypatch, adaptive_streaming):
+    monkeypatch.setattr(settings, 'ADAPTIVE_STREAMING', adaptive_streaming)
+    monkeypatch.setattr(settings, 'ADAPTIVE_STREAMING_FORMATS', 'hls,dash')
+    source_video_id = uuid4()
+    match = {'video_id': source_video_id, 'filename': 'source.mp4'}
+    qualities = [_ready_quality(source_video_id, q) for q in ('360p', '720p')]
+    copy_file = MagicMock(side_effect=lambda *args: f'https://cdn/copy/{args[-1]}.mp4')
+    copy_rows = MagicMock(return_value=len(qualities))
+    
+    with patch.object(DatabaseService, 'get_source_fingerprint', MagicMock(return_value=match)), \
+            patch.object(DatabaseService, 'get_video_qualities', MagicMock(return_value=qualities)), \
+            patch.object(DatabaseService, 'copy_video_qualities', copy_rows), \
+            patch.object(S3Service, 'copy_file', copy_file):
+        result = CompressionService.reuse_identical_source(uuid4(), 'upload.mp4', 'a' * 64)
+    return result, copy_file, copy_rows
+
+
+def test_reuse_skipped_when_video_needs_stream_package(monkeypatch):
+    result, copy_file, copy_rows = _reuse(monkeypatch, adaptive_streaming=True)
+    
+    assert result is None
+    copy_file.assert_not_called()
+    copy_rows.assert_not_called()
+
+
+def test_reuse_copies_renditions_without_adaptive_streaming(monkeypatch):
+    result, copy_file, copy_rows = _reuse(monkeypatch, adaptive_streaming=False)
+    
+    assert result['success'] is True
+    assert copy_file.call_count == 2
+    copy_rows.assert_called_once()
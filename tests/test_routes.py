@@ -0,0 +1,51 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+from api import routes
+from app.config import settings
+from services.async_database import AsyncDatabaseService
+
+
+def _submit(tmp_path, monkeypatch, video_status, force):
+    monkeypatch.setattr(settings, 'PENDING_DIR', str(tmp_path))
+    (tmp_path / 'video.mp4').write_bytes(b'')
+    video_id = uuid4()
+    video = SimpleNamespace(id=video_id, status=video_status, user_id=None)
+    job = SimpleNamespace(id=uuid4(), status='queued', filename='video.mp4')
+    latest = SimpleNamespace(id=uuid4(), status='completed', filename='video.mp4')
+    
+    with patch.object(AsyncDatabaseService, 'get_video_by_id', AsyncMock(return_value=video)), \
+            patch.object(AsyncDatabaseService, 'get_latest_job', AsyncMock(return_value=latest)), \
+            patch.object(AsyncDatabaseService, 'enqueue_job', AsyncMock(return_value=(job, True))) as enqueue, \
+            patch.object(AsyncDatabaseService, 'update_video_status', AsyncMock(return_value=True)) as update_status:
+        response = asyncio.run(routes.compress_video(routes.CompressionRequest(
+            video_id=str(video_id), filename='video.mp4', force=force
+        )))
+    return response, job, enqueue, update_status
+
+
+def test_force_on_published_video_keeps_it_published(tmp_path, monkeypatch):
+    response, job, enqueue, update_status = _submit(tmp_path, monkeypatch, 'published', force=True)
+    
+    assert response.message == "Compression job queued"
+    assert response.job_id == str(job.id)
+    assert enqueue.await_args.kwargs['force'] is True
+    update_status.assert_not_awaited()
+
+
+def test_published_video_without_force_is_not_requeued(tmp_path, monkeypatch):
+    response, job, enqueue, update_status = _submit(tmp_path, monkeypatch, 'published', force=False)
+    
+    assert response.message == "Video already processed"
+    enqueue.assert_not_awaited()
+    update_status.assert_not_awaited()
+
+
+def test_new_job_marks_draft_video_processing(tmp_path, monkeypatch):
+    response, job, enqueue, update_status = _submit(tmp_path, monkeypatch, 'draft', force=False)
+    
+    assert response.message == "Compression job queued"
+    update_status.assert_awaited_once()
+    assert update_status.await_args.args[1] == 'processing'
@@ -0,0 +1,31 @@
+from app.config import settings
+from utils.video_utils import cap_quality_config, get_quality_config, parse_bitrate
+
+
+def test_cap_quality_config_clamps_maxrate_to_low_source_bitrate(monkeypatch):
+    monkeypatch.setattr(settings, 'CAP_TO_SOURCE_BITRATE', True)
+    source_bitrate = 800
+    
+    capped = cap_quality_config(get_quality_config('720p'), source_bitrate)
+    
+    assert parse_bitrate(capped['bitrate']) <= source_bitrate
+    assert parse_bitrate(capped['maxrate']) <= source_bitrate
+    assert capped['source_bitrate'] == source_bitrate
+
+
+def test_cap_quality_config_clamps_maxrate_when_bitrate_fits(monkeypatch):
+    monkeypatch.setattr(settings, 'CAP_TO_SOURCE_BITRATE', True)
+    config = get_quality_config('480p')
+    source_bitrate = parse_bitrate(config['bitrate']) + 100
+    
+    capped = cap_quality_config(config, source_bitrate)
+    
+    assert capped['bitrate'] == config['bitrate']
+    assert parse_bitrate(capped['maxrate']) <= source_bitrate
+
+
+def test_cap_quality_config_disabled(monkeypatch):
+    monkeypatch.setattr(settings, 'CAP_TO_SOURCE_BITRATE', False)
+    config = get_quality_config('720p')
+    
+    assert cap_quality_config(config, 800) == config
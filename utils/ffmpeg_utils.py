@@ -0,0 +1,205 @@
+import os
+import subprocess
+import threading
+from collections import deque
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+import logging
+
+from app.config import settings
+from app.metrics import FFMPEG_PROCESSES
+
+logger = logging.getLogger(__name__)
+
+
+def parse_progress(fields: Dict[str, str], duration: Optional[float] = None) -> Dict:
+    """
+    Convert one block of ffmpeg `-progress` key=value fields into progress metrics.
+    
+    Returns:
+        Dict with out_time (seconds), frame, fps, speed (multiple of realtime),
+        percent and eta_seconds (None when unknown)
+    """
+    out_time = None
+    out_time_us = fields.get('out_time_us') or fields.get('out_time_ms')
+    if out_time_us and out_time_us.lstrip('-').isdigit():
+        out_time = max(int(out_time_us), 0) / 1_000_000
+    
+    try:
+        fps = float(fields.get('fps', ''))
+    except ValueError:
+        fps = None
+    
+    try:
+        speed = float(fields.get('speed', '').rstrip('x'))
+    except ValueError:
+        speed = None
+    
+    frame = fields.get('frame')
+    
+    percent = None
+    eta_seconds = None
+    if duration and out_time is not None:
+        percent = min(out_time / duration * 100, 100.0)
+        if speed:
+            eta_seconds = int(max(duration - out_time, 0) / speed)
+    if fields.get('progress') == 'end':
+        percent = 100.0
+        eta_seconds = 0
+    
+    return {
+        'out_time': out_time,
+        'frame': int(frame) if frame and frame.isdigit() else None,
+        'fps': fps,
+        'speed': speed,
+        'percent': round(percent, 2) if percent is not None else None,
+        'eta_seconds': eta_seconds
+    }
+
+
+def _drain_stderr(stream, tail: deque) -> None:
+    for line in stream:
+        tail.append(line.rstrip('\n'))
+
+
+class PipeOutput:
+    """
+    Readable end of one ffmpeg output pipe.
+    
+    Reaching EOF waits for ffmpeg to exit and raises IOError if it failed, so
+    a consumer never mistakes a truncated output for a complete one.
+    """
+    
+    def __init__(self, stream: BinaryIO, process: subprocess.Popen):
+        self._stream = stream
+        self._process = process
+    
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        if not data and self._process.wait() != 0:
+            raise IOError(f"ffmpeg exited with status {self._process.returncode} before finishing this output")
+        return data
+
+
+def _consume_output(sink: Callable[[PipeOutput], Any], read_fd: int,
+                    process: subprocess.Popen, outcome: Dict) -> None:
+    with os.fdopen(read_fd, 'rb') as stream:
+        try:
+            outcome['result'] = sink(PipeOutput(stream, process))
+        except BaseException as e:
+            outcome['error'] = e
+            # Nobody is reading this pipe any more; stop ffmpeg before it blocks on it
+            process.kill()
+
+
+def run_ffmpeg(cmd: List[str], duration: Optional[float] = None,
+               progress_callback: Optional[Callable[[Dict], None]] = None,
+               output_sinks: Optional[Dict[str, Callable[[PipeOutput], Any]]] = None) -> Dict[str, Any]:
+    """
+    Run an ffmpeg command, streaming `-progress` output instead of buffering it.
+    
+    Only the last FFMPEG_STDERR_LINES lines of stderr are kept. On a non-zero
+    exit a CalledProcessError is raised with that tail as its stderr, so
+    callers can keep handling failures like subprocess.run(check=True).
+    
+    Args:
+        cmd: ffmpeg command, starting with the ffmpeg executable
+        duration: Source duration in seconds, used for percent complete and ETA
+        progress_callback: Called with parse_progress() output for every progress block
+        output_sinks: Maps an output target in cmd to a callable that consumes
+            its bytes; the target is replaced with a dedicated pipe:N and each
+            sink runs in its own thread
+    
+    Returns:
+        Each sink's return value, keyed by output target
+    """
+    full_cmd = [cmd[0], '-nostats', '-progress', 'pipe:1'] + cmd[1:]
+    stderr_tail: deque = deque(maxlen=settings.FFMPEG_STDERR_LINES)
+    
+    # stdout carries progress, so streamed outputs get their own descriptors
+    read_fds = {}
+    write_fds = []
+    for target in output_sinks or {}:
+        read_fd, write_fd = os.pipe()
+        read_fds[target] = read_fd
+        write_fds.append(write_fd)
+        full_cmd = [f'pipe:{write_fd}' if arg == target else arg for arg in full_cmd]
+    
+    try:
+        process = subprocess.Popen(
+            full_cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            pass_fds=write_fds
+        )
+    except BaseException:
+        for fd in read_fds.values():
+            os.close(fd)
+        raise
+    finally:
+        # Only ffmpeg holds the write ends now, so sinks see EOF when it exits
+        for fd in write_fds:
+            os.close(fd)
+    
+    FFMPEG_PROCESSES.inc()
+    
+    stderr_reader = threading.Thread(
+        target=_drain_stderr,
+        args=(process.stderr, stderr_tail),
+        daemon=True
+    )
+    stderr_reader.start()
+    
+    outcomes: Dict[str, Dict] = {}
+    sink_threads = []
+    for target, read_fd in read_fds.items():
+        outcomes[target] = {}
+        sink_thread = threading.Thread(
+            target=_consume_output,
+            args=(output_sinks[target], read_fd, process, outcomes[target]),
+            daemon=True
+        )
+        sink_thread.start()
+        sink_threads.append(sink_thread)
+    
+    try:
+        fields: Dict[str, str] = {}
+        for line in process.stdout:
+            key, sep, value = line.strip().partition('=')
+            if not sep:
+                continue
+            fields[key] = value
+            if key == 'progress':
+                if progress_callback:
+                    try:
+                        progress_callback(parse_progress(fields, duration))
+                    except Exception as e:
+                        logger.warning(f"Progress callback failed: {e}")
+                fields = {}
+        
+        returncode = process.wait()
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        FFMPEG_PROCESSES.dec()
+        stderr_reader.join()
+        for sink_thread in sink_threads:
+            sink_thread.join()
+        process.stdout.close()
+        process.stderr.close()
+    
+    sink_errors = [outcome['error'] for outcome in outcomes.values() if 'error' in outcome]
+    
+    if returncode != 0:
+        raise subprocess.CalledProcessError(
+            returncode, full_cmd, stderr='\n'.join(stderr_tail)
+        ) from (sink_errors[0] if sink_errors else None)
+    
+    if sink_errors:
+        raise sink_errors[0]
+    
+    return {target: outcome.get('result') for target, outcome in outcomes.items()}
@@ -0,0 +1,94 @@
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import os
+import shutil
+import sys
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def file_sha256(file_path: str, chunk_size: int = HASH_CHUNK_SIZE) -> Optional[str]:
+    """
+    Hash a file in fixed-size chunks so memory use stays flat for any file size.
+    
+    Returns:
+        Hex SHA-256 digest, or None if the file could not be read
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    except OSError as e:
+        logger.error(f"Error hashing {file_path}: {e}")
+        return None
+    return digest.hexdigest()
+
+
+# Linux FICLONE ioctl: _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+
+def _reflink(src: str, dst: str) -> bool:
+    """Copy-on-write clone (btrfs/XFS via FICLONE, APFS via clonefile). False if unsupported."""
+    if sys.platform == 'darwin':
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            return libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) == 0
+        except (OSError, AttributeError):
+            return False
+    
+    if not sys.platform.startswith('linux'):
+        return False
+    
+    try:
+        import fcntl
+        with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+            fcntl.ioctl(dst_file.fileno(), _FICLONE, src_file.fileno())
+        return True
+    except OSError:
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        return False
+
+
+def link_or_copy(src: str, dst: str, allow_rename: bool = False) -> str:
+    """
+    Place src at dst as cheaply as the filesystem allows.
+    
+    Tries, in order: a hardlink, a copy-on-write reflink, a rename (only if
+    allow_rename, which removes src) and finally a full copy. The first three
+    are metadata-only when src and dst share a filesystem.
+    
+    Returns:
+        How dst was created: 'exists', 'hardlink', 'reflink', 'rename' or 'copy'
+    """
+    if os.path.exists(dst):
+        return 'exists'
+    
+    try:
+        os.link(src, dst)
+        return 'hardlink'
+    except OSError:
+        pass
+    
+    if _reflink(src, dst):
+        return 'reflink'
+    
+    if allow_rename:
+        try:
+            os.rename(src, dst)
+            return 'rename'
+        except OSError:
+            pass
+    
+    # copy2 already uses the kernel's zero-copy paths (copy_file_range/fcopyfile) where it can
+    shutil.copy2(src, dst)
+    return 'copy'
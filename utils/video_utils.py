@@ -2,11 +2,21 @@ import subprocess
 import json
 import os
 import platform
-from typing import Dict, Optional, Tuple
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 import logging
 
+from app.config import settings
+from app.metrics import PROBE_SECONDS
+
 logger = logging.getLogger(__name__)
 
+# In-memory LRU of ffprobe results keyed by (path, size, mtime, inode)
+_video_info_cache: "OrderedDict[Tuple, Dict]" = OrderedDict()
+_video_info_cache_lock = threading.Lock()
+
 
 def is_apple_silicon() -> bool:
     """Check if running on Apple Silicon (M1/M2/M3)."""
@@ -20,7 +30,88 @@ def get_hardware_encoder() -> Tuple[str, str]:
     return 'libx264', 'software'
 
 
+def _video_info_cache_key(video_path: str) -> Optional[Tuple]:
+    try:
+        stat = os.stat(video_path)
+    except OSError:
+        return None
+    return (os.path.realpath(video_path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+def _disk_cache_path(key: Tuple) -> str:
+    digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    return os.path.join(settings.PROBE_CACHE_DIR, f"{digest}.json")
+
+
+def _read_disk_cache(key: Tuple) -> Optional[Dict]:
+    if not settings.PROBE_CACHE_DIR:
+        return None
+    try:
+        with open(_disk_cache_path(key), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_disk_cache(key: Tuple, info: Dict) -> None:
+    if not settings.PROBE_CACHE_DIR:
+        return
+    try:
+        os.makedirs(settings.PROBE_CACHE_DIR, exist_ok=True)
+        cache_path = _disk_cache_path(key)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(info, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write video info cache: {e}")
+
+
+def _store_video_info(key: Tuple, info: Dict) -> None:
+    with _video_info_cache_lock:
+        _video_info_cache[key] = info
+        _video_info_cache.move_to_end(key)
+        while len(_video_info_cache) > settings.PROBE_CACHE_SIZE:
+            _video_info_cache.popitem(last=False)
+
+
+def clear_video_info_cache() -> None:
+    """Drop all in-memory ffprobe results (the on-disk cache is left untouched)."""
+    with _video_info_cache_lock:
+        _video_info_cache.clear()
+
+
 def get_video_info(video_path: str) -> Optional[Dict]:
+    """
+    Get video metadata, reusing a cached ffprobe result while the file is unchanged.
+    
+    Results are cached in memory (LRU, PROBE_CACHE_SIZE entries) and, when
+    PROBE_CACHE_DIR is set, on disk. The cache key includes size, mtime and
+    inode so a rewritten file is always probed again.
+    """
+    key = _video_info_cache_key(video_path)
+    if key is None or settings.PROBE_CACHE_SIZE <= 0:
+        return _probe_video_info(video_path)
+    
+    with _video_info_cache_lock:
+        info = _video_info_cache.get(key)
+        if info is not None:
+            _video_info_cache.move_to_end(key)
+            return dict(info)
+    
+    info = _read_disk_cache(key)
+    if info is None:
+        info = _probe_video_info(video_path)
+        if info is None:
+            return None
+        _write_disk_cache(key, info)
+    
+    _store_video_info(key, info)
+    return dict(info)
+
+
+@PROBE_SECONDS.time()
+def _probe_video_info(video_path: str) -> Optional[Dict]:
     try:
         cmd = [
             'ffprobe',
@@ -125,7 +216,9 @@ def get_video_info(video_path: str) -> Optional[Dict]:
         return None
 
 
-QUALITY_CONFIGS = {
+# 'height' is the short side of the rendition, so portrait sources get the same
+# ladder as landscape ones. Names are fixed by the video_qualities.quality CHECK.
+DEFAULT_QUALITY_CONFIGS = {
     '144p': {
         'height': 144,
         'bitrate': '200k',
@@ -177,55 +270,245 @@ QUALITY_CONFIGS = {
 }
 
 
+_QUALITY_CONFIG_KEYS = ('height', 'bitrate', 'maxrate', 'bufsize')
+
+
+def load_quality_configs() -> Dict[str, Dict]:
+    """
+    Build the rendition ladder from configuration.
+    
+    QUALITY_LADDER_FILE (a JSON object of quality -> {height, bitrate, maxrate,
+    bufsize}) replaces the built-in ladder, and QUALITY_LADDER limits it to the
+    listed qualities. Invalid entries are logged and skipped.
+    
+    Returns:
+        Quality configs ordered by short side, lowest first
+    """
+    configs = DEFAULT_QUALITY_CONFIGS
+    if settings.QUALITY_LADDER_FILE:
+        try:
+            with open(settings.QUALITY_LADDER_FILE, 'r') as f:
+                configs = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load quality ladder from {settings.QUALITY_LADDER_FILE}: {e}; "
+                         f"using the built-in ladder")
+            configs = DEFAULT_QUALITY_CONFIGS
+    
+    ladder = {}
+    for quality, config in configs.items():
+        if quality not in DEFAULT_QUALITY_CONFIGS:
+            logger.error(f"Ignoring unknown quality {quality} in the quality ladder")
+            continue
+        if not isinstance(config, dict) or any(key not in config for key in _QUALITY_CONFIG_KEYS):
+            logger.error(f"Ignoring quality {quality}: needs {', '.join(_QUALITY_CONFIG_KEYS)}")
+            continue
+        ladder[quality] = {key: config[key] for key in _QUALITY_CONFIG_KEYS}
+    
+    if settings.QUALITY_LADDER:
+        enabled = [q.strip() for q in settings.QUALITY_LADDER.split(',') if q.strip()]
+        ladder = {quality: config for quality, config in ladder.items() if quality in enabled}
+    
+    if not ladder:
+        logger.error("Quality ladder is empty; using the built-in ladder")
+        ladder = DEFAULT_QUALITY_CONFIGS
+    return dict(sorted(ladder.items(), key=lambda item: int(item[1]['height'])))
+
+
+QUALITY_CONFIGS = load_quality_configs()
+
+
 def get_quality_config(quality: str) -> Optional[Dict]:
     return QUALITY_CONFIGS.get(quality)
 
 
-def get_supported_qualities(original_height: int, original_width: int) -> list:
+def parse_bitrate(value: str) -> int:
+    """Convert an FFmpeg bitrate string such as '3000k' or '6M' to kbps."""
+    value = value.strip().lower()
+    if value.endswith('k'):
+        return int(float(value[:-1]))
+    if value.endswith('m'):
+        return int(float(value[:-1]) * 1000)
+    return int(float(value)) // 1000
+
+
+def can_stream_copy(video_info: Dict, quality: str, target_width: int, target_height: int) -> bool:
+    """
+    Check whether the source already satisfies a quality's spec and can be remuxed.
+    
+    The source must be H.264 yuv420p at exactly the target resolution, its audio
+    (if any) must be AAC, and its video bitrate must not exceed the quality's maxrate.
+    """
+    config = get_quality_config(quality)
+    if not config or not video_info:
+        return False
+    
+    if video_info.get('codec') != 'h264' or video_info.get('pixel_format') != 'yuv420p':
+        return False
+    
+    if (video_info.get('width'), video_info.get('height')) != (target_width, target_height):
+        return False
+    
+    if video_info.get('audio_codec') not in (None, 'aac'):
+        return False
+    
+    video_bitrate = source_video_bitrate(video_info)
+    if not video_bitrate:
+        return False
+    return video_bitrate <= parse_bitrate(config['maxrate'])
+
+
+def source_video_bitrate(video_info: Optional[Dict]) -> Optional[int]:
+    """Video bitrate of a probed source in kbps (container bitrate minus audio), or None if unknown."""
+    if not video_info or not video_info.get('bitrate'):
+        return None
+    video_bitrate = video_info['bitrate'] - (video_info.get('audio_bitrate') or 0)
+    return video_bitrate if video_bitrate > 0 else None
+
+
+def scale_quality_config(config: Dict, factor: Optional[float]) -> Dict:
+    """Copy of a quality config with bitrate, maxrate and bufsize multiplied by a complexity factor."""
+    if not factor or factor == 1:
+        return config
+    scaled = dict(config)
+    for key in ('bitrate', 'maxrate', 'bufsize'):
+        scaled[key] = f"{max(1, int(parse_bitrate(config[key]) * factor))}k"
+    return scaled
+
+
+def rendition_config(quality: str, source_info: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Rate control for one rendition of a source.
+    
+    The quality's config is scaled by the source's complexity factor (set on
+    source_info['complexity'] by complexity analysis), then capped at the
+    source's video bitrate.
+    """
+    config = get_quality_config(quality)
+    if not config:
+        return None
+    config = scale_quality_config(config, (source_info or {}).get('complexity'))
+    return cap_quality_config(config, source_video_bitrate(source_info))
+
+
+def cap_quality_config(config: Dict, source_bitrate: Optional[int]) -> Dict:
     """
-    Get supported qualities up to the original video resolution.
-    Only creates qualities that are equal to or lower than the original.
-    Maintains aspect ratio and orientation.
+    Limit a quality's rate control to the source's video bitrate.
+    
+    Encoding above the source bitrate only makes the output bigger, so bitrate,
+    maxrate and bufsize are scaled down together (keeping their ratios) when
+    the quality asks for more than the source has, and maxrate never exceeds
+    the source bitrate. The returned config also carries 'source_bitrate' for
+    renditions encoded at source size.
+    """
+    if not source_bitrate or not settings.CAP_TO_SOURCE_BITRATE:
+        return config
+    
+    capped = dict(config, source_bitrate=source_bitrate)
+    bitrate = parse_bitrate(config['bitrate'])
+    if bitrate > source_bitrate:
+        factor = source_bitrate / bitrate
+        for key in ('bitrate', 'maxrate', 'bufsize'):
+            capped[key] = f"{max(1, int(parse_bitrate(config[key]) * factor))}k"
+    if parse_bitrate(capped['maxrate']) > source_bitrate:
+        capped['maxrate'] = f"{source_bitrate}k"
+    return capped
+
+
+def plan_ladder(width: int, height: int, source_bitrate: Optional[int] = None,
+                complexity: Optional[float] = None) -> List[Dict]:
     """
-    supported = []
-    # Determine the maximum quality based on original resolution
-    max_quality_height = min(original_height, 2160)  # Cap at 4K max
+    Pick the renditions to encode for a source.
+    
+    A quality is included when its short side fits within the source's short
+    side, so a 1080x1920 portrait video gets the same ladder as a 1920x1080
+    one. Qualities that would come out at the same dimensions as a lower one
+    are dropped, since they would only duplicate it.
     
-    # Quality order from lowest to highest
-    quality_order = ['144p', '240p', '360p', '480p', '720p', '1080p', '1440p', '2160p']
+    With a known source bitrate, each quality's bitrate is capped at it
+    (cap_quality_config) and a quality is dropped unless it is at least
+    RENDITION_MIN_SAVINGS smaller than the next quality kept above it.
     
-    for quality in quality_order:
-        config = QUALITY_CONFIGS[quality]
-        # Only add qualities that are <= original resolution
-        if config['height'] <= original_height:
-            supported.append(quality)
+    Args:
+        width: Source width
+        height: Source height
+        source_bitrate: Source video bitrate in kbps (see source_video_bitrate)
+        complexity: Bitrate scale factor from complexity analysis
     
-    return supported
+    Returns:
+        List of {'quality', 'width', 'height', 'bitrate'} dicts, lowest first;
+        bitrate is the capped target in kbps
+    """
+    short_side = min(width, height)
+    ladder = []
+    seen = set()
+    
+    for quality, config in QUALITY_CONFIGS.items():
+        if config['height'] > short_side:
+            continue
+        dimensions = calculate_resolution(width, height, config['height'])
+        if dimensions in seen:
+            continue
+        seen.add(dimensions)
+        ladder.append({
+            'quality': quality,
+            'width': dimensions[0],
+            'height': dimensions[1],
+            'bitrate': parse_bitrate(cap_quality_config(
+                scale_quality_config(config, complexity), source_bitrate
+            )['bitrate'])
+        })
+    
+    if not source_bitrate or not settings.CAP_TO_SOURCE_BITRATE:
+        return ladder
+    
+    # Walk down from the top rung; capped rungs near the source bitrate add nothing
+    kept = []
+    for rung in reversed(ladder):
+        if kept and rung['bitrate'] > kept[-1]['bitrate'] * (1 - settings.RENDITION_MIN_SAVINGS):
+            logger.info(f"Skipping {rung['quality']}: {rung['bitrate']}k is not meaningfully "
+                        f"smaller than {kept[-1]['quality']} for a {source_bitrate}k source")
+            continue
+        kept.append(rung)
+    return kept[::-1]
+
+
+def get_supported_qualities(original_height: int, original_width: int,
+                            source_bitrate: Optional[int] = None,
+                            complexity: Optional[float] = None) -> list:
+    """
+    Get the qualities to encode for a source, lowest first (see plan_ladder).
+    Never includes a quality above the source's short side.
+    """
+    return [
+        rung['quality']
+        for rung in plan_ladder(original_width, original_height, source_bitrate, complexity)
+    ]
+
+
+def _even(value: float) -> int:
+    return max(2, int(round(value / 2)) * 2)
 
 
 def calculate_resolution(width: int, height: int, target_height: int) -> Tuple[int, int]:
     """
-    Calculate resolution maintaining aspect ratio and orientation.
-    Never upscales - if original is smaller, returns original dimensions.
+    Calculate the output resolution for a quality, keeping aspect ratio and orientation.
+    
+    target_height is the short side of the output: landscape sources are scaled
+    to that height, portrait sources to that width. Never upscales - if the
+    source's short side is not larger, returns the original dimensions.
     Ensures dimensions are even numbers (required by most codecs).
     """
+    short_side = min(width, height)
+    
     # Never upscale - if target is larger than original, use original
-    if target_height >= height:
+    if target_height >= short_side:
         # Ensure even dimensions
         final_width = width if width % 2 == 0 else width + 1
         final_height = height if height % 2 == 0 else height + 1
         return final_width, final_height
     
-    # Calculate new dimensions maintaining aspect ratio
-    aspect_ratio = width / height
-    new_height = target_height
-    new_width = int(new_height * aspect_ratio)
-    
-    # Ensure dimensions are even (required by H.264 and most codecs)
-    if new_width % 2 != 0:
-        new_width += 1
-    if new_height % 2 != 0:
-        new_height += 1
-    
-    return new_width, new_height
-
+    # Scale the long side by the same factor as the short side
+    scale = target_height / short_side
+    if width >= height:
+        return _even(width * scale), _even(target_height)
+    return _even(target_height), _even(height * scale)